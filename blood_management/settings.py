@@ -10,6 +10,9 @@ INSTALLED_APPS = [
     'rest_framework','corsheaders','django_filters','core',
 ]
 MIDDLEWARE = [
+    # first, so it times (and sees the queries of) everything below it
+    'core.profiling.PerformanceMiddleware',
+    'core.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -54,7 +57,10 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # keyset pagination on indexed columns; pass ?count=1 for a capped total
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 from datetime import timedelta
 SIMPLE_JWT = {'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),'REFRESH_TOKEN_LIFETIME': timedelta(days=1)}
@@ -93,6 +99,69 @@ if os.environ.get('SMTP_HOST'):
     EMAIL_USE_TLS = os.environ.get('SMTP_USE_TLS', 'True') == 'True'
     EMAIL_USE_SSL = os.environ.get('SMTP_USE_SSL', 'False') == 'True'
     DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', DEFAULT_FROM_EMAIL)
+
+# Outbound mail queue: views enqueue messages and `manage.py process_mail_queue`
+# delivers them in batches over a single connection. Failed messages are retried
+# with exponential backoff (MAIL_QUEUE_RETRY_DELAY * 2^n seconds) and marked dead
+# after MAIL_QUEUE_MAX_ATTEMPTS.
+MAIL_QUEUE_BATCH_SIZE = int(os.environ.get('MAIL_QUEUE_BATCH_SIZE', 100))
+MAIL_QUEUE_MAX_ATTEMPTS = int(os.environ.get('MAIL_QUEUE_MAX_ATTEMPTS', 5))
+MAIL_QUEUE_RETRY_DELAY = int(os.environ.get('MAIL_QUEUE_RETRY_DELAY', 60))
+# A new request queues one donor alert; process_mail_queue expands it into one
+# message per donor, DONOR_ALERT_CHUNK_SIZE donors per pass.
+DONOR_ALERT_CHUNK_SIZE = int(os.environ.get('DONOR_ALERT_CHUNK_SIZE', 1000))
+# Per-view latency and SQL profiling (core.profiling); percentiles are served at
+# /api/admin/perf/. Set PERF_TRACE_SAMPLE_RATE (0-1) and/or PERF_SLOW_REQUEST_MS
+# to log full request traces, written to PERF_TRACE_FILE when it is set.
+PERF_SAMPLE_SIZE = int(os.environ.get('PERF_SAMPLE_SIZE', 1000))
+PERF_TRACE_SAMPLE_RATE = float(os.environ.get('PERF_TRACE_SAMPLE_RATE', 0))
+PERF_SLOW_REQUEST_MS = float(os.environ['PERF_SLOW_REQUEST_MS']) if os.environ.get('PERF_SLOW_REQUEST_MS') else None
+if os.environ.get('PERF_TRACE_FILE'):
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {'perf_traces': {'class': 'logging.FileHandler', 'filename': os.environ['PERF_TRACE_FILE']}},
+        'loggers': {'core.perf': {'handlers': ['perf_traces'], 'level': 'INFO', 'propagate': False}},
+    }
+# Prometheus metrics at /metrics (core.metrics). Each process writes its values
+# to its own file in METRICS_DIR every METRICS_FLUSH_INTERVAL seconds and the
+# endpoint merges them; clear the directory on deploy. With METRICS_TOKEN set
+# scrapers must send "Authorization: Bearer <token>".
+if os.environ.get('METRICS_DIR'):
+    METRICS_DIR = os.environ['METRICS_DIR']
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Shared cache, so that every worker and management command sees the same
+# entries (verification codes, inventory totals, core.caching version stamps).
+# REDIS_URL selects Redis (needs the redis package); otherwise a file-based
+# cache in CACHE_DIR (default: cache/ next to the database, so two checkouts
+# on one machine do not share entries). Tests get an in-memory cache, cleared before each test
+# by the test runner.
+if os.environ.get('REDIS_URL'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['REDIS_URL']}}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+    }}
+# the test runner swaps in a local-memory cache (core.tests.runner)
+TEST_RUNNER = 'core.tests.runner.CacheIsolatedRunner'
+# Live dashboard updates at /live/ (core.live). They need an ASGI server, so
+# they are off unless LIVE_UPDATES=True; under WSGI /live/ answers 204. The
+# default broker reaches subscribers in this process only; with several
+# workers use core.live.CacheBroker on Redis.
+LIVE_UPDATES = os.environ.get('LIVE_UPDATES', 'False') == 'True'
+LIVE_BROKER = os.environ.get('LIVE_BROKER', 'core.live.LocalBroker')
+LIVE_KEEPALIVE = float(os.environ.get('LIVE_KEEPALIVE', 15))
+LIVE_POLL_INTERVAL = float(os.environ.get('LIVE_POLL_INTERVAL', 1))
+# Dashboard counters (core.stats): fresh for STATS_TTL seconds, then served stale
+# for up to STATS_STALE_TTL more while one request refreshes them in the background.
+STATS_TTL = int(os.environ.get('STATS_TTL', 30))
+STATS_STALE_TTL = int(os.environ.get('STATS_STALE_TTL', 300))
+# Search (core.search): typo matches need this trigram similarity on SQLite, taken
+# from the best SEARCH_CANDIDATES index hits. PostgreSQL uses pg_trgm's thresholds.
+SEARCH_SIMILARITY = float(os.environ.get('SEARCH_SIMILARITY', 0.3))
+SEARCH_CANDIDATES = int(os.environ.get('SEARCH_CANDIDATES', 200))
 # Login redirect settings to match frontend URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
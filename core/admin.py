@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, BloodBank, BloodInventory, DonationRequest, Donation
+from .models import User, BloodBank, BloodInventory, DonationRequest, Donation, OutboundEmail, InventoryReservation, DonorAlert
 # Restrict access to the Django admin UI to Django superusers only.
 # By default Django allows any user with is_staff=True to log in to the admin.
 # We override the AdminSite.has_permission method so only is_superuser users
@@ -39,3 +39,16 @@ admin.site.register(BloodBank)
 admin.site.register(BloodInventory)
 admin.site.register(DonationRequest)
 admin.site.register(Donation)
+admin.site.register(InventoryReservation)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+
+
+@admin.register(DonorAlert)
+class DonorAlertAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'request', 'queued', 'done', 'created_at')
+    list_filter = ('done',)
@@ -0,0 +1,247 @@
+"""Inventory allocation for approved requests and donations.
+
+Approving a request reserves its units from ``BloodInventory``: banks in the
+request's city first, then the exact blood group before compatible ones, then
+the banks holding the most stock. Each bank row is decremented with a
+conditional ``UPDATE ... SET units = units - n WHERE units >= n`` so concurrent
+approvals only contend on the rows they actually touch, and can never drive a
+row below zero. If the request cannot be covered in full the whole approval is
+rolled back.
+
+Approving donations does the reverse: units are credited with one
+``UPDATE ... SET units = units + n`` per bank and blood group, however many
+donations are approved at once.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import caching, inventory, live, metrics, rollups
+from .matching import compatible_groups
+from .mailqueue import enqueue_many
+from .models import BloodInventory, Donation, DonationRequest, InventoryReservation
+
+CANDIDATE_BATCH = 50
+
+
+class AllocationError(Exception):
+    pass
+
+
+class AlreadyProcessed(AllocationError):
+    pass
+
+
+class InsufficientInventory(AllocationError):
+    pass
+
+
+def _candidates(dr):
+    groups = compatible_groups(dr.blood_group)
+    qs = BloodInventory.objects.filter(blood_group__in=groups, units__gt=0)
+    city_key = dr.city_key
+    ranks = [Case(*[When(blood_group=g, then=Value(i)) for i, g in enumerate(groups)], output_field=IntegerField())]
+    if city_key:
+        ranks.insert(0, Case(When(blood_bank__city_key=city_key, then=Value(0)), default=Value(1), output_field=IntegerField()))
+    return qs.order_by(*ranks, '-units', 'pk').values_list('pk', 'blood_bank_id', 'blood_group', 'units', 'blood_bank__city_key')
+
+
+def _take(pk, wanted, available):
+    """Atomically take up to ``wanted`` units from one row. Returns the units taken."""
+    take = min(wanted, available)
+    while take > 0:
+        if BloodInventory.objects.filter(pk=pk, units__gte=take).update(units=F('units') - take):
+            return take
+        # another approval got there first; retry with what is left
+        available = BloodInventory.objects.filter(pk=pk).values_list('units', flat=True).first() or 0
+        take = min(wanted, available)
+    return 0
+
+
+def _reserve(dr):
+    """Take ``dr.units`` from inventory. Returns unsaved reservations and summary deltas."""
+    needed = dr.units
+    seen, reservations = [], []
+    deltas = defaultdict(int)
+    qs = _candidates(dr)
+    while needed > 0:
+        batch = list(qs.exclude(pk__in=seen)[:CANDIDATE_BATCH])
+        if not batch:
+            break
+        for pk, bank_id, group, units, city_key in batch:
+            seen.append(pk)
+            taken = _take(pk, needed, units)
+            if taken:
+                needed -= taken
+                deltas[(group, city_key)] -= taken
+                reservations.append(InventoryReservation(request=dr, blood_bank_id=bank_id, blood_group=group, units=taken))
+            if needed == 0:
+                break
+    if needed > 0:
+        raise InsufficientInventory(f'Not enough {dr.blood_group}-compatible units in stock ({dr.units - needed}/{dr.units}).')
+    return reservations, deltas
+
+
+def approve(dr, approved_by):
+    """Approve ``dr`` and reserve its units. Returns the reservations made."""
+    with transaction.atomic():
+        claimed = DonationRequest.objects.filter(pk=dr.pk, status='pending').update(status='approved', approved_by=approved_by)
+        if not claimed:
+            raise AlreadyProcessed('Already processed.')
+        reservations, deltas = _reserve(dr)
+        InventoryReservation.objects.bulk_create(reservations)
+        inventory.apply_deltas(deltas)
+        rollups.move_requests([(dr.created_at, 'pending', 'approved')])
+        caching.bump(DonationRequest)
+        dr.status = dr._loaded_status = 'approved'
+        dr.approved_by = approved_by
+        live.publish_requests([dr], 'pending')
+    metrics.inc('donation_requests_processed_total', outcome='approved')
+    return reservations
+
+
+def _status_mail(dr, verb):
+    return (f'Request {verb}: {dr.blood_group}',
+            f'Your request for {dr.units} unit(s) of {dr.blood_group} has been {verb}.',
+            [dr.requester.email])
+
+
+def approve_requests(ids, approved_by):
+    """
+    Approve many pending requests. Each one still needs its own reservation,
+    but the status change, the reservation rows, the summary update and the
+    notifications are written in bulk. Returns ``{'approved', 'insufficient',
+    'skipped'}`` id lists.
+    """
+    ids = list(dict.fromkeys(ids))
+    approved, insufficient, reservations = [], [], []
+    deltas = defaultdict(int)
+    with transaction.atomic():
+        pending = list(
+            DonationRequest.objects.select_for_update(of=('self',)).filter(pk__in=ids, status='pending')
+            .select_related('requester').order_by('created_at', 'pk')
+        )
+        for dr in pending:
+            try:
+                with transaction.atomic():
+                    taken, delta = _reserve(dr)
+            except InsufficientInventory:
+                insufficient.append(dr)
+                continue
+            approved.append(dr)
+            reservations += taken
+            for key, units in delta.items():
+                deltas[key] += units
+
+        DonationRequest.objects.filter(pk__in=[dr.pk for dr in approved]).update(status='approved', approved_by=approved_by)
+        InventoryReservation.objects.bulk_create(reservations, batch_size=1000)
+        inventory.apply_deltas(deltas)
+        rollups.move_requests([(dr.created_at, 'pending', 'approved') for dr in approved])
+        caching.bump(DonationRequest)
+        live.publish_requests(approved, 'pending', 'approved')
+        enqueue_many([_status_mail(dr, 'approved') for dr in approved])
+    metrics.inc('donation_requests_processed_total', len(approved), outcome='approved')
+
+    done = {dr.pk for dr in approved} | {dr.pk for dr in insufficient}
+    return {
+        'approved': [dr.pk for dr in approved],
+        'insufficient': [dr.pk for dr in insufficient],
+        'skipped': [pk for pk in ids if pk not in done],
+    }
+
+
+def reject_requests(ids, rejected_by):
+    """Reject many pending requests with a single UPDATE. Returns ``{'rejected', 'skipped'}`` id lists."""
+    ids = list(dict.fromkeys(ids))
+    with transaction.atomic():
+        pending = list(
+            DonationRequest.objects.select_for_update(of=('self',)).filter(pk__in=ids, status='pending')
+            .select_related('requester')
+        )
+        DonationRequest.objects.filter(pk__in=[dr.pk for dr in pending]).update(status='rejected', approved_by=rejected_by)
+        rollups.move_requests([(dr.created_at, 'pending', 'rejected') for dr in pending])
+        caching.bump(DonationRequest)
+        live.publish_requests(pending, 'pending', 'rejected')
+        enqueue_many([_status_mail(dr, 'rejected') for dr in pending])
+    metrics.inc('donation_requests_processed_total', len(pending), outcome='rejected')
+    rejected = {dr.pk for dr in pending}
+    return {'rejected': [pk for pk in ids if pk in rejected], 'skipped': [pk for pk in ids if pk not in rejected]}
+
+
+def release(dr):
+    """Return the units reserved for ``dr`` to their banks."""
+    with transaction.atomic():
+        reservations = list(dr.reservations.select_related('blood_bank'))
+        deltas = defaultdict(int)
+        for r in reservations:
+            if r.blood_bank is None:
+                continue
+            updated = BloodInventory.objects.filter(blood_bank=r.blood_bank, blood_group=r.blood_group).update(units=F('units') + r.units)
+            if not updated:
+                BloodInventory.objects.create(blood_bank=r.blood_bank, blood_group=r.blood_group, units=r.units)
+                continue  # the post_save signal already counted it
+            deltas[(r.blood_group, r.blood_bank.city_key)] += r.units
+        dr.reservations.all().delete()
+        inventory.apply_deltas(deltas)
+
+
+def reject(dr, rejected_by):
+    """Reject ``dr``, giving back any units reserved when it was approved."""
+    with transaction.atomic():
+        dr = DonationRequest.objects.select_for_update().get(pk=dr.pk)
+        if dr.status == 'approved':
+            release(dr)
+        dr.status = 'rejected'
+        dr.approved_by = rejected_by
+        dr.save()
+    metrics.inc('donation_requests_processed_total', outcome='rejected')
+    return dr
+
+
+def approve_donations(ids, approved_by):
+    """
+    Approve the given donations and credit their units to inventory.
+    Returns ``{'approved': [...ids], 'skipped': [...ids]}``; already approved
+    or unknown ids are skipped.
+    """
+    ids = list(dict.fromkeys(ids))
+    with transaction.atomic():
+        rows = list(
+            Donation.objects.select_for_update(of=('self',)).filter(pk__in=ids, approved=False)
+            .values_list('pk', 'blood_bank_id', 'blood_bank__city_key', 'blood_bank__name', 'blood_group', 'units',
+                         'donor__username', 'donor__email', 'date')
+        )
+        approved = [r[0] for r in rows]
+        if not approved:
+            return {'approved': [], 'skipped': ids}
+
+        credit = defaultdict(int)
+        deltas = defaultdict(int)
+        for pk, bank_id, city_key, _, group, units, _, _, _ in rows:
+            if bank_id is not None:
+                credit[(bank_id, group)] += units
+                deltas[(group, city_key)] += units
+
+        missing = []
+        for (bank_id, group), units in credit.items():
+            if not BloodInventory.objects.filter(blood_bank_id=bank_id, blood_group=group).update(units=F('units') + units):
+                missing.append(BloodInventory(blood_bank_id=bank_id, blood_group=group, units=units))
+        BloodInventory.objects.bulk_create(missing)
+        inventory.apply_deltas(deltas)
+
+        Donation.objects.filter(pk__in=approved).update(approved=True, approved_by=approved_by)
+        caching.bump(Donation)
+        rollups.add_donations((date, group, bank_id, units) for _, bank_id, _, _, group, units, _, _, date in rows)
+
+        enqueue_many([
+            ('Your donation has been approved',
+             f"Hi {username}, your donation of {units} unit(s) of {group} "
+             f"to {bank_name or 'the selected blood bank'} has been approved.",
+             [email])
+            for _, _, _, bank_name, group, units, username, email, _ in rows
+        ])
+
+    metrics.inc('donations_approved_total', len(approved))
+    approved_set = set(approved)
+    return {'approved': approved, 'skipped': [pk for pk in ids if pk not in approved_set]}
@@ -0,0 +1,105 @@
+"""Async JSON endpoints for ASGI deployments.
+
+Async counterparts of the read-heavy endpoints: admin stats, analytics data,
+donor search and "my requests". While a query runs the worker's event loop
+serves other requests instead of holding a thread. Served over WSGI they
+still work, but they are no faster than the sync views.
+
+DRF views cannot be async, so these are plain Django views returning
+``JsonResponse``. They accept the session or a JWT bearer token, the same
+credentials the API takes, except HTTP Basic.
+
+Independent queries are started together with ``asyncio.gather``. Django
+still runs each ORM call on the request's database thread, one after another,
+so this mostly overlaps cache reads and keeps each aggregate independent.
+When the ORM gains native async drivers the queries will overlap too.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import rollups, search, stats
+from .matching import city_filter, matching_donors
+from .models import DonationRequest, User
+from .pagination import akeyset_page
+from .serializers import DonationRequestSerializer
+
+PAGE_SIZE = 20
+DONOR_FIELDS = ('id', 'username', 'blood_group', 'city', 'email')
+
+
+async def _user(request):
+    user = await request.auser()
+    if user.is_authenticated or 'HTTP_AUTHORIZATION' not in request.META:
+        return user
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else user
+
+
+def async_api(role=None):
+    """Authenticate an async view (session or JWT) and, given ``role``, require it."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            user = await _user(request)
+            if user is None or not user.is_authenticated:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            if role and user.role != role:
+                return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+            request.user = user
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _page_body(page, results):
+    return {'next': page.next_cursor, 'previous': page.previous_cursor, 'results': results}
+
+
+@async_api(role='admin')
+async def admin_stats(request):
+    """Same body as ``GET /api/admin/stats/``."""
+    return JsonResponse((await stats.adashboard_stats()).api())
+
+
+@async_api(role='admin')
+async def analytics(request):
+    """The data behind the analytics dashboard's charts."""
+    counts, trend = await asyncio.gather(stats.adashboard_stats(), sync_to_async(rollups.donation_trend)(days=30))
+    return JsonResponse({
+        'inventory': counts.inventory,
+        'donation_trend': [{'day': str(row['day']), 'count': row['count']} for row in trend],
+        'donor_distribution': counts.donor_distribution(),
+        'request_status': counts.request_status_totals(),
+    })
+
+
+@async_api()
+async def search_donors(request):
+    """Donors for ``blood_group``/``city``/``exact``/``q``, ranked as on the search page; keyset paged with ``after``/``before``."""
+    q_city = request.GET.get('city', '')
+    qs = matching_donors(request.GET.get('blood_group', ''), q_city, exact=request.GET.get('exact') == '1')
+    if q_city:
+        qs = qs.filter(**city_filter(q_city))
+    if q := request.GET.get('q', '').strip():
+        qs = await sync_to_async(search.filter_queryset)(qs, q.split(), search.FIELDS[User])
+    page = await akeyset_page(qs.only(*DONOR_FIELDS), after=request.GET.get('after'),
+                              before=request.GET.get('before'), size=PAGE_SIZE)
+    return JsonResponse(_page_body(page, [{f: getattr(d, f) for f in DONOR_FIELDS} for d in page]))
+
+
+@async_api()
+async def my_requests(request):
+    """The user's requests, newest first (``GET /api/requests/mine/``)."""
+    qs = DonationRequest.objects.filter(requester=request.user).select_related('requester').order_by('-id')
+    page = await akeyset_page(qs, after=request.GET.get('after'), before=request.GET.get('before'), size=PAGE_SIZE)
+    return JsonResponse(_page_body(page, DonationRequestSerializer(page, many=True).data))
@@ -0,0 +1,243 @@
+"""Benchmarks for the API and frontend hot paths.
+
+Each case is one request made with the Django test client against a synthetic
+dataset from ``core.dataset``. For every dataset size the case is run once to
+warm caches and then ``repeat`` times; we record wall-clock timings and the
+number of SQL queries. ``compare`` diffs two result sets so a change that adds
+queries or slows a path down can be flagged against a stored baseline.
+
+A case can also name the queries behind it (``plan``). On SQLite their
+``EXPLAIN QUERY PLAN`` is checked for full table scans and for sorts
+(``USE TEMP B-TREE``), which cost time proportional to the table rather than
+the page. Any such plan is recorded as ``unindexed`` and reported by
+``compare`` even without a baseline entry.
+
+``run_concurrent`` compares the sync endpoints with their async variants
+(``core.async_views``). It fires ``total`` requests, ``concurrency`` at a time,
+through the ASGI test client. In one process against the test database,
+queries from every request share one database thread. The numbers therefore
+show dispatch overhead and how well the event loop keeps up, not the gain
+from overlapping slow I/O. Measure that against PostgreSQL under uvicorn with
+an external load generator.
+
+``manage.py benchmark`` runs this in a throwaway test database.
+"""
+import asyncio
+import platform
+import re
+import statistics
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import django
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import dataset
+from .matching import city_filter, matching_donors
+from .models import DonationRequest
+
+Case = namedtuple('Case', 'name method url data user reset plan', defaults=(None, None))
+REQUESTER = 'bench-requester'
+
+CASES = [
+    Case('search_donors', 'get', lambda: reverse('search-donors') + '?blood_group=O-&city=Dhaka', None, 'admin',
+         plan=lambda: matching_donors('O-', 'Dhaka').filter(**city_filter('Dhaka'))),
+    Case('search_donors_nearby', 'get', lambda: reverse('search-donors') + '?blood_group=AB%2B&lat=23.81&lon=90.41', None, 'admin',
+         plan=lambda: matching_donors('AB+', lat=23.81, lon=90.41)),
+    Case('donor_dashboard', 'get', lambda: reverse('donor-dashboard'), None, 'donor'),
+    Case('admin_dashboard', 'get', lambda: reverse('admin-dashboard'), None, 'admin'),
+    Case('analytics_dashboard', 'get', lambda: reverse('analytics-dashboard'), None, 'admin'),
+    Case('api_requests_list', 'get', lambda: '/api/requests/', None, 'admin'),
+    # one pending request per user is allowed, so the previous run's is closed first
+    Case('api_requests_create', 'post', lambda: '/api/requests/', {'blood_group': 'O-', 'units': 1, 'city': 'Dhaka'}, 'requester',
+         lambda: DonationRequest.objects.filter(requester__username=REQUESTER, status='pending').update(status='rejected')),
+    Case('api_inventory_list', 'get', lambda: '/api/inventory/', None, 'admin'),
+    Case('api_admin_stats', 'get', lambda: reverse('admin-stats'), None, 'admin'),
+]
+DEFAULT_SIZES = [100, 1000, 10000]
+
+AsyncCase = namedtuple('AsyncCase', 'name sync_url async_url user')
+ASYNC_CASES = [
+    AsyncCase('admin_stats', lambda: reverse('admin-stats'), lambda: reverse('async-admin-stats'), 'admin'),
+    AsyncCase('requests_mine', lambda: '/api/requests/mine/', lambda: reverse('async-my-requests'), 'hospital'),
+]
+
+
+# SQLite plan lines that read or sort the whole table
+_UNINDEXED = re.compile(r'\bSCAN core_\w+$|USE TEMP B-TREE')
+
+
+def unindexed(qs):
+    """Plan lines of ``qs`` that scan or sort a whole table (SQLite only; elsewhere always empty)."""
+    if connection.vendor != 'sqlite':
+        return []
+    lines = (line.strip() for line in qs.explain().splitlines())
+    return [line for line in lines if _UNINDEXED.search(line)]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def dataset_sizes(users):
+    """Table sizes derived from the number of users."""
+    return {'users': users, 'banks': max(5, users // 100), 'donations': users * 2, 'requests': max(10, users // 2)}
+
+
+def _clients(client_class=Client):
+    User = get_user_model()
+    users = {role: User.objects.filter(role=role).order_by('pk').first() for role in ('admin', 'donor', 'hospital')}
+    users['requester'] = User.objects.create(username=REQUESTER, email=f'{REQUESTER}@example.test', role='hospital', city='Dhaka')
+    clients = {}
+    for name, user in users.items():
+        clients[name] = client_class()
+        if user is not None:
+            clients[name].force_login(user)
+    return clients
+
+
+@contextmanager
+def _dataset(size, seed):
+    """Generate the dataset for ``size`` users; rolled back on exit so sizes do not add up."""
+    try:
+        with transaction.atomic():
+            dataset.generate(seed=seed, **dataset_sizes(size))
+            cache.clear()
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def time_case(case, client, repeat):
+    if repeat < 1:
+        raise ValueError('repeat must be at least 1')
+
+    def call():
+        if case.method == 'post':
+            return client.post(case.url(), case.data, content_type='application/json')
+        return client.get(case.url())
+
+    if case.reset:
+        case.reset()
+    call()  # warm-up: caches, template loading, connection setup
+    timings = []
+    for _ in range(repeat):
+        if case.reset:
+            case.reset()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            resp = call()
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'case': case.name,
+        'status': resp.status_code,
+        'queries': len(ctx.captured_queries),
+        'median_ms': round(statistics.median(timings), 2),
+        'min_ms': round(timings[0], 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'unindexed': unindexed(case.plan()) if case.plan else [],
+    }
+
+
+def run(sizes=None, repeat=5, seed=0, cases=None, progress=None):
+    """
+    Benchmark every case at each size. Each size's dataset is generated inside
+    a transaction that is rolled back afterwards, so sizes do not add up.
+    """
+    cases = [c for c in CASES if not cases or c.name in cases]
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        with _dataset(size, seed):
+            clients = _clients()
+            for case in cases:
+                row = {'size': size, **time_case(case, clients[case.user], repeat)}
+                results.append(row)
+                if progress:
+                    progress(row)
+    cache.clear()
+    return {'meta': _meta(seed=seed, repeat=repeat), 'results': results}
+
+
+def _meta(**extra):
+    return {'python': platform.python_version(), 'django': django.get_version(), 'database': connection.vendor, **extra}
+
+
+def time_concurrent(url, client, concurrency, total):
+    """``total`` GETs of ``url``, at most ``concurrency`` in flight; throughput and latency percentiles."""
+    if concurrency < 1 or total < 1:
+        raise ValueError('concurrency and total must be at least 1')
+    async def fire():
+        gate = asyncio.Semaphore(concurrency)
+        timings, statuses = [], set()
+
+        async def one():
+            async with gate:
+                started = time.perf_counter()
+                resp = await client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses.add(resp.status_code)
+
+        await client.get(url)  # warm-up
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - started, sorted(timings), statuses
+
+    elapsed, timings, statuses = async_to_sync(fire)()
+    return {
+        'status': max(statuses),
+        'requests_per_second': round(total / elapsed, 1),
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+    }
+
+
+def run_concurrent(sizes=None, concurrency=20, total=200, seed=0, progress=None):
+    """Sync endpoint vs its async variant for every ``ASYNC_CASES`` entry at each size."""
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        with _dataset(size, seed):
+            clients = _clients(AsyncClient)
+            for case in ASYNC_CASES:
+                for mode, url in (('sync', case.sync_url()), ('async', case.async_url())):
+                    row = {'case': case.name, 'mode': mode, 'size': size,
+                           **time_concurrent(url, clients[case.user], concurrency, total)}
+                    results.append(row)
+                    if progress:
+                        progress(row)
+    cache.clear()
+    return {'meta': _meta(seed=seed, concurrency=concurrency, total=total), 'results': results}
+
+
+def compare(current, baseline, threshold=0.25, floor_ms=2.0):
+    """
+    Regressions in ``current`` relative to ``baseline``: any case that runs
+    more queries, or whose median is more than ``threshold`` slower (ignoring
+    differences under ``floor_ms``), plus every unindexed plan. Returns a list
+    of messages.
+    """
+    before = {(r['case'], r['size']): r for r in baseline['results']}
+    problems = []
+    for r in current['results']:
+        old = before.get((r['case'], r['size']))
+        label = f"{r['case']} @ {r['size']}"
+        if r.get('unindexed'):
+            problems.append(f"{label}: unindexed plan: {'; '.join(r['unindexed'])}")
+        if old is None:
+            continue
+        if r['queries'] > old['queries']:
+            problems.append(f"{label}: {old['queries']} -> {r['queries']} queries")
+        slower = r['median_ms'] - old['median_ms']
+        if slower > floor_ms and slower > old['median_ms'] * threshold:
+            problems.append(f"{label}: {old['median_ms']}ms -> {r['median_ms']}ms")
+        if r['status'] != old['status']:
+            problems.append(f"{label}: status {old['status']} -> {r['status']}")
+    return problems
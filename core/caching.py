@@ -0,0 +1,99 @@
+"""Cache-aside helpers with per-model version stamps.
+
+Every cached value's key includes a version stamp for each model it was built
+from. Saving or deleting one of those models (``core.signals``) gives the model
+a new stamp once the transaction commits, so the old entries are never read
+again and simply expire. No list of keys has to be kept, and invalidation is
+one cache write no matter how many pages, filters or users the data was cached
+for.
+
+Stamps are random tokens rather than counters so that two processes bumping
+the same model at once cannot lose an update. Code that writes with
+``QuerySet.update`` or ``bulk_create`` skips the signals and must call
+``bump`` itself.
+
+The cache must be shared between processes (see ``CACHES`` in settings) or
+other workers keep serving their own copies until the timeout.
+"""
+import functools
+import hashlib
+import uuid
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.translation import get_language
+
+VERSION_PREFIX = 'ver'
+DEFAULT_TIMEOUT = 5 * 60
+_MISSING = object()
+
+
+def _version_key(model):
+    return f'{VERSION_PREFIX}:{model._meta.label_lower}'
+
+
+def _token():
+    return uuid.uuid4().hex[:12]
+
+
+def versions(*models):
+    """The current stamps of ``models`` joined into one string."""
+    keys = [_version_key(m) for m in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # first use or evicted: whoever adds first wins
+            cache.add(key, _token(), None)
+            found[key] = cache.get(key)
+    return '.'.join(str(found[k]) for k in keys)
+
+
+def bump(*models):
+    """Give ``models`` new stamps when the current transaction commits."""
+    def apply():
+        cache.set_many({_version_key(m): _token() for m in models}, None)
+    transaction.on_commit(apply)
+
+
+def make_key(prefix, *parts, models=()):
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'{prefix}:{versions(*models)}:{digest}' if models else f'{prefix}:{digest}'
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT):
+    """Read ``key``; on a miss store and return ``compute()`` (``None`` included)."""
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def cached_view(*models, timeout=DEFAULT_TIMEOUT, per_user=True):
+    """
+    Cache a view's rendered HTML for GET requests, keyed on the full path,
+    the active language, the user (unless ``per_user`` is false) and the stamps
+    of ``models``. Requests with flash messages waiting are not served from or
+    written to the cache, since the page would show (or swallow) them. Only
+    the body and content type are stored; cookies and other headers are not.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+            user = request.user.pk if per_user else None
+            key = make_key(f'view:{view.__module__}.{view.__name__}', request.get_full_path(),
+                           get_language(), user, models=models)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,208 @@
+"""City names typed in English or Bangla, reduced to one indexed key.
+
+``normalize_city`` turns "Dhaka", " dhaka ", "DHAKA" and "ঢাকা" into the same
+``city_key`` ('dhaka'). Users, banks and requests store that key, so city
+filters are equality lookups on an index. Known cities (the 64 districts in
+``CITIES``) map to the key of their canonical English name from any listed
+spelling or from Bangla. Other Bangla input is romanized by ``transliterate``,
+roughly the way place names are usually spelled. Other Latin input is just
+cleaned.
+
+The registration, profile, bank and request forms store known cities under
+their canonical name (``canonical_city``); the admin user form saves what the
+admin typed, and the key still matches.
+"""
+import unicodedata
+
+# canonical name, Bangla name, other spellings in use
+CITIES = [
+    # Dhaka division
+    ('Dhaka', 'ঢাকা', ('Dacca',)),
+    ('Gazipur', 'গাজীপুর', ()),
+    ('Narayanganj', 'নারায়ণগঞ্জ', ('Narayangonj',)),
+    ('Narsingdi', 'নরসিংদী', ('Narsingdhi',)),
+    ('Manikganj', 'মানিকগঞ্জ', ('Manikgonj',)),
+    ('Munshiganj', 'মুন্সীগঞ্জ', ('Munshigonj',)),
+    ('Tangail', 'টাঙ্গাইল', ()),
+    ('Kishoreganj', 'কিশোরগঞ্জ', ('Kishorgonj', 'Kishoregonj')),
+    ('Faridpur', 'ফরিদপুর', ()),
+    ('Gopalganj', 'গোপালগঞ্জ', ('Gopalgonj',)),
+    ('Madaripur', 'মাদারীপুর', ()),
+    ('Rajbari', 'রাজবাড়ী', ()),
+    ('Shariatpur', 'শরীয়তপুর', ()),
+    # Chattogram division
+    ('Chattogram', 'চট্টগ্রাম', ('Chittagong', 'Chottogram')),
+    ("Cox's Bazar", 'কক্সবাজার', ()),
+    ('Cumilla', 'কুমিল্লা', ('Comilla',)),
+    ('Feni', 'ফেনী', ()),
+    ('Noakhali', 'নোয়াখালী', ()),
+    ('Lakshmipur', 'লক্ষ্মীপুর', ('Laxmipur', 'Lakshipur')),
+    ('Chandpur', 'চাঁদপুর', ()),
+    ('Brahmanbaria', 'ব্রাহ্মণবাড়িয়া', ()),
+    ('Rangamati', 'রাঙ্গামাটি', ()),
+    ('Khagrachhari', 'খাগড়াছড়ি', ('Khagrachari',)),
+    ('Bandarban', 'বান্দরবান', ()),
+    # Rajshahi division
+    ('Rajshahi', 'রাজশাহী', ()),
+    ('Bogura', 'বগুড়া', ('Bogra',)),
+    ('Pabna', 'পাবনা', ()),
+    ('Sirajganj', 'সিরাজগঞ্জ', ('Sirajgonj',)),
+    ('Natore', 'নাটোর', ()),
+    ('Naogaon', 'নওগাঁ', ()),
+    ('Chapainawabganj', 'চাঁপাইনবাবগঞ্জ', ('Chapai Nawabganj', 'Nawabganj')),
+    ('Joypurhat', 'জয়পুরহাট', ('Jaipurhat',)),
+    # Khulna division
+    ('Khulna', 'খুলনা', ()),
+    ('Jashore', 'যশোর', ('Jessore',)),
+    ('Satkhira', 'সাতক্ষীরা', ()),
+    ('Bagerhat', 'বাগেরহাট', ()),
+    ('Kushtia', 'কুষ্টিয়া', ()),
+    ('Jhenaidah', 'ঝিনাইদহ', ('Jhenaida',)),
+    ('Magura', 'মাগুরা', ()),
+    ('Narail', 'নড়াইল', ()),
+    ('Chuadanga', 'চুয়াডাঙ্গা', ()),
+    ('Meherpur', 'মেহেরপুর', ()),
+    # Barishal division
+    ('Barishal', 'বরিশাল', ('Barisal',)),
+    ('Patuakhali', 'পটুয়াখালী', ()),
+    ('Bhola', 'ভোলা', ()),
+    ('Pirojpur', 'পিরোজপুর', ()),
+    ('Jhalokati', 'ঝালকাঠি', ('Jhalakathi', 'Jhalokathi')),
+    ('Barguna', 'বরগুনা', ()),
+    # Sylhet division
+    ('Sylhet', 'সিলেট', ()),
+    ('Moulvibazar', 'মৌলভীবাজার', ('Maulvibazar', 'Moulvi Bazar')),
+    ('Habiganj', 'হবিগঞ্জ', ('Habigonj',)),
+    ('Sunamganj', 'সুনামগঞ্জ', ('Sunamgonj',)),
+    # Rangpur division
+    ('Rangpur', 'রংপুর', ()),
+    ('Dinajpur', 'দিনাজপুর', ()),
+    ('Kurigram', 'কুড়িগ্রাম', ()),
+    ('Gaibandha', 'গাইবান্ধা', ()),
+    ('Nilphamari', 'নীলফামারী', ()),
+    ('Lalmonirhat', 'লালমনিরহাট', ()),
+    ('Thakurgaon', 'ঠাকুরগাঁও', ()),
+    ('Panchagarh', 'পঞ্চগড়', ()),
+    # Mymensingh division
+    ('Mymensingh', 'ময়মনসিংহ', ()),
+    ('Jamalpur', 'জামালপুর', ()),
+    ('Sherpur', 'শেরপুর', ()),
+    ('Netrokona', 'নেত্রকোণা', ('Netrakona',)),
+]
+
+# romanization of Bangla script
+_CONSONANTS = {
+    'ক': 'k', 'খ': 'kh', 'গ': 'g', 'ঘ': 'gh', 'ঙ': 'ng', 'চ': 'ch', 'ছ': 'chh', 'জ': 'j', 'ঝ': 'jh', 'ঞ': 'n',
+    'ট': 't', 'ঠ': 'th', 'ড': 'd', 'ঢ': 'dh', 'ণ': 'n', 'ত': 't', 'থ': 'th', 'দ': 'd', 'ধ': 'dh', 'ন': 'n',
+    'প': 'p', 'ফ': 'f', 'ব': 'b', 'ভ': 'bh', 'ম': 'm', 'য': 'j', 'র': 'r', 'ল': 'l', 'শ': 'sh', 'ষ': 'sh',
+    'স': 's', 'হ': 'h', '\u09dc': 'r', '\u09dd': 'rh', '\u09df': 'y',  # ড় ঢ় য়
+}
+_VOWELS = {'অ': 'a', 'আ': 'a', 'ই': 'i', 'ঈ': 'i', 'উ': 'u', 'ঊ': 'u', 'ঋ': 'ri', 'এ': 'e', 'ঐ': 'oi', 'ও': 'o', 'ঔ': 'ou'}
+_VOWEL_SIGNS = {'া': 'a', 'ি': 'i', 'ী': 'i', 'ু': 'u', 'ূ': 'u', 'ৃ': 'ri', 'ে': 'e', 'ৈ': 'oi', 'ো': 'o', 'ৌ': 'ou'}
+_SIGNS = {'ং': 'ng', 'ঃ': 'h', 'ঁ': '', 'ৎ': 't'}
+_HASANTA = '্'
+# NFKC splits these into letter + nukta
+_NUKTA = {'\u09a1\u09bc': '\u09dc', '\u09a2\u09bc': '\u09dd', '\u09af\u09bc': '\u09df'}
+
+
+def _clean(value):
+    """NFKC + casefold, punctuation and symbols dropped, whitespace collapsed."""
+    value = unicodedata.normalize('NFKC', value).casefold()
+    # by category, so Bangla vowel signs and hasanta (combining marks) survive
+    value = ''.join(c for c in value if unicodedata.category(c)[0] not in 'PS')
+    return ' '.join(value.split())
+
+
+def _has_bangla(value):
+    return any('ঀ' <= c <= '৿' for c in value)
+
+
+def _inherent_vowel(text, i, after_vowel):
+    """Whether the consonant at ``text[i]`` is pronounced with its inherent 'a'."""
+    nxt = text[i + 1] if i + 1 < len(text) else ''
+    if nxt in _VOWEL_SIGNS or nxt == _HASANTA:
+        return False
+    if nxt in _SIGNS:
+        return nxt != 'ৎ'
+    if nxt in _VOWELS:
+        return True
+    if nxt not in _CONSONANTS:
+        return False  # end of word
+    starts_cluster = i + 2 < len(text) and text[i + 2] == _HASANTA
+    # dropped between a vowel and a single consonant: খুলনা -> khulna
+    return i == 0 or text[i - 1] == ' ' or starts_cluster or not after_vowel
+
+
+def transliterate(value):
+    """Romanize Bangla script in ``value`` (approximately); anything else is kept."""
+    for pair, letter in _NUKTA.items():
+        value = value.replace(pair, letter)
+    out = []
+    for i, c in enumerate(value):
+        if c in _CONSONANTS:
+            after_vowel = bool(out) and out[-1][-1:] in ('a', 'e', 'i', 'o', 'u')
+            out.append(_CONSONANTS[c] + ('a' if _inherent_vowel(value, i, after_vowel) else ''))
+        elif c in _VOWEL_SIGNS:
+            out.append(_VOWEL_SIGNS[c])
+        elif c in _VOWELS:
+            out.append(_VOWELS[c])
+        elif c in _SIGNS:
+            out.append(_SIGNS[c])
+        elif c == _HASANTA:
+            pass
+        elif c.isdigit():
+            out.append(str(unicodedata.digit(c)))  # ০-৯
+        else:
+            out.append(c)
+    return ''.join(out)
+
+
+def _build_index():
+    index, names = {}, {}
+    for name, bangla, spellings in CITIES:
+        key = _clean(name)
+        names[key] = (name, bangla)
+        for variant in (name, bangla, transliterate(_clean(bangla)), *spellings):
+            variant = _clean(variant)
+            index[variant] = index[variant.replace(' ', '')] = key
+    return index, names
+
+
+# every known spelling (and its spaceless form) -> canonical key; canonical key -> (name, Bangla name)
+_INDEX, _NAMES = _build_index()
+
+
+def normalize_city(value: str) -> str:
+    """
+    Reduce a free-text city to a key that can be compared with ``=``.
+    - unicode NFKC + casefold, so 'DHAKA' and 'Dhaka' collapse
+    - punctuation dropped and whitespace collapsed ("Cox's  Bazar" -> "coxs bazar")
+    - known cities in any listed spelling or in Bangla -> their canonical key
+      ('Chittagong', 'চট্টগ্রাম' -> 'chattogram')
+    - other Bangla romanized
+    """
+    if not value:
+        return ''
+    key = _clean(value)
+    if _has_bangla(key):
+        key = _INDEX.get(key) or _clean(transliterate(key))
+    return _INDEX.get(key) or _INDEX.get(key.replace(' ', '')) or key
+
+
+def is_known_city(key):
+    return key in _NAMES
+
+
+def canonical_city(value: str) -> str:
+    """The canonical English name for a known city, otherwise ``value`` with whitespace tidied."""
+    value = ' '.join((value or '').split())
+    known = _NAMES.get(normalize_city(value))
+    return known[0] if known else value
+
+
+def city_name(value, language='en'):
+    """Display name of a city in ``language`` ('en' or 'bn'); unknown cities are returned as given."""
+    known = _NAMES.get(normalize_city(value))
+    if not known:
+        return value
+    return known[1] if language == 'bn' else known[0]
@@ -0,0 +1,15 @@
+"""Helpers shared by the modules that read optional settings or label requests."""
+from django.conf import settings
+
+
+def setting(name, default):
+    """``settings.<name>``, or ``default`` when the project does not set it."""
+    return getattr(settings, name, default)
+
+
+def view_name(request):
+    """The resolved view's URL name (or dotted path), ``'unresolved'`` before/without URL resolution."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
@@ -0,0 +1,217 @@
+"""Synthetic, reproducible datasets for benchmarking.
+
+``generate`` fills the database with users, blood banks, inventory, requests
+and donations drawn from a seeded ``random.Random``: the same seed, sizes and chunk
+size give the same rows. Blood groups follow the distribution observed in
+Bangladeshi donor populations and cities are weighted by population, so
+selective filters (O-, a small city) behave like they would in production.
+
+Everything is written with ``bulk_create`` (or, for tables with generated
+``auto_now_add`` timestamps, the same bulk INSERT) a chunk at a time, each chunk in
+its own transaction, and only the ids of banks and users (which later tables
+point at) are kept, as compact arrays, so memory and the size of an open
+transaction stay small at millions of rows. Signals do not fire for bulk
+inserts; the inventory summary and the analytics rollups are rebuilt at the
+end.
+"""
+import copy
+import random
+import time
+from array import array
+from datetime import datetime, time as dt_time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import caching, inventory, rollups, search
+from .cities import normalize_city
+from .matching import geo_cell
+from .models import BLOOD_GROUPS, BloodBank, BloodInventory, Donation, DonationRequest
+
+# share of the population per group
+GROUP_WEIGHTS = {'B+': 31.0, 'O+': 29.0, 'A+': 24.0, 'AB+': 9.0, 'O-': 2.0, 'B-': 2.0, 'A-': 2.0, 'AB-': 1.0}
+# city, population weight, centre
+CITIES = [
+    ('Dhaka', 35, (23.81, 90.41)),
+    ('Chattogram', 15, (22.36, 91.78)),
+    ('Gazipur', 6, (24.00, 90.42)),
+    ('Khulna', 6, (22.85, 89.54)),
+    ('Rajshahi', 6, (24.37, 88.60)),
+    ('Narayanganj', 5, (23.62, 90.50)),
+    ('Sylhet', 5, (24.90, 91.87)),
+    ('Cumilla', 5, (23.46, 91.18)),
+    ('Mymensingh', 5, (24.75, 90.41)),
+    ('Rangpur', 4, (25.74, 89.28)),
+    ('Barishal', 4, (22.70, 90.35)),
+    ('Cox\'s Bazar', 2, (21.43, 92.01)),
+    ('Bogura', 2, (24.85, 89.37)),
+]
+GROUPS = [g for g, _ in BLOOD_GROUPS]
+STATUSES = [('pending', 20), ('approved', 60), ('rejected', 20)]
+PASSWORD = 'donorpass'
+PREFIX = 'gen'
+
+
+class _Generator:
+    def __init__(self, seed, chunk_size, days, until, progress):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.days = days
+        self.until = until
+        self.progress = progress or (lambda table, rows, seconds: None)
+
+    def weighted(self, choices, weights, n):
+        return self.rng.choices(choices, weights=weights, k=n)
+
+    def moment(self):
+        return self.until - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def write(self, model, total, build, keep_pks=False, dates=()):
+        """
+        Insert ``total`` rows built ``chunk_size`` at a time by ``build(start, n)``,
+        committing each chunk. Returns the new pks if ``keep_pks``. ``dates`` are
+        ``auto_now_add`` fields whose generated values are inserted as they are.
+        """
+        started = time.monotonic()
+        pks = array('q')
+        fields = _insert_fields(model, dates) if dates else None
+        for start in range(0, total, self.chunk_size):
+            rows = build(start, min(self.chunk_size, total - start))
+            with transaction.atomic():
+                if fields:
+                    batch = max(1, connection.ops.bulk_batch_size(fields, rows))
+                    for i in range(0, len(rows), batch):
+                        model._base_manager._insert(rows[i:i + batch], fields=fields)
+                else:
+                    model.objects.bulk_create(rows, batch_size=self.chunk_size)
+            if keep_pks:
+                pks.extend(r.pk for r in rows)
+        self.progress(model._meta.model_name, total, time.monotonic() - started)
+        return pks
+
+
+def _insert_fields(model, dates):
+    """
+    The fields ``bulk_create`` would insert, with copies of the ``dates``
+    fields that keep the value on the instance instead of stamping the
+    current time. The model's own fields are left untouched.
+    """
+    fields = []
+    for field in model._meta.local_concrete_fields:
+        if field.primary_key and field.db_returning:
+            continue
+        if field.name in dates:
+            field = copy.copy(field)
+            field.auto_now = field.auto_now_add = False
+        fields.append(field)
+    return fields
+
+
+def generate(users=1000, banks=50, donations=5000, requests=1000, seed=0, days=365, until=None,
+             chunk_size=5000, progress=None):
+    """
+    Insert a synthetic dataset; returns ``{table: rows}``. Usernames start
+    with ``gen-`` and all generated accounts share the password ``donorpass``.
+    Meant for an empty (benchmark) database; chunks are committed as they
+    are written, so an interrupted run leaves a partial dataset behind.
+    """
+    User = get_user_model()
+    until = until or timezone.make_aware(datetime.combine(timezone.localdate(), dt_time.min))
+    g = _Generator(seed, chunk_size, days, until, progress)
+    rng = g.rng
+    city_names = [c[0] for c in CITIES]
+    city_weights = [c[1] for c in CITIES]
+    group_weights = [GROUP_WEIGHTS[x] for x in GROUPS]
+    password = make_password(PASSWORD)  # hashed once, shared by every account
+
+    admin = User.objects.create(username=f'{PREFIX}-admin', email=f'{PREFIX}-admin@example.test', role='admin', password=password,
+                                date_joined=until)
+
+    # banks: each city's banks remembered so donations go to a local bank
+    bank_city = bytearray()
+
+    def build_banks(start, n):
+        out = []
+        for i, city in enumerate(g.weighted(range(len(CITIES)), city_weights, n), start):
+            bank_city.append(city)
+            name = city_names[city]
+            out.append(BloodBank(name=f'{name} Blood Bank {i + 1}', city=name, city_key=normalize_city(name),
+                                 address=f'{rng.randint(1, 300)} Road {rng.randint(1, 40)}', contact=f'0{rng.randint(10**9, 10**10 - 1)}'))
+        return out
+    bank_pks = g.write(BloodBank, banks, build_banks, keep_pks=True)
+    banks_by_city = [[pk for pk, c in zip(bank_pks, bank_city) if c == city] for city in range(len(CITIES))]
+
+    # one inventory row per bank and group, stock roughly proportional to demand
+    def build_inventory(start, n):
+        return [
+            BloodInventory(blood_bank_id=bank_pks[(start + i) // 8], blood_group=GROUPS[(start + i) % 8],
+                           units=int(rng.expovariate(1 / (GROUP_WEIGHTS[GROUPS[(start + i) % 8]] + 1))))
+            for i in range(n)
+        ]
+    g.write(BloodInventory, len(bank_pks) * 8, build_inventory)
+
+    # users: ~3% hospitals, the rest donors; most donors share a location
+    user_group, user_city, hospitals = bytearray(), bytearray(), []
+
+    def build_users(start, n):
+        out = []
+        groups = g.weighted(range(8), group_weights, n)
+        cities = g.weighted(range(len(CITIES)), city_weights, n)
+        for i, group, city in zip(range(start, start + n), groups, cities):
+            user_group.append(group)
+            user_city.append(city)
+            name, _, (lat, lon) = CITIES[city]
+            if rng.random() < 0.6:
+                lat, lon = lat + rng.uniform(-0.15, 0.15), lon + rng.uniform(-0.15, 0.15)
+            else:
+                lat = lon = None
+            role = 'hospital' if rng.random() < 0.03 else 'donor'
+            if role == 'hospital':
+                hospitals.append(i)
+            out.append(User(
+                username=f'{PREFIX}-{i}', email=f'{PREFIX}-{i}@example.test', password=password,
+                role=role, phone=f'88019{i:08d}',
+                blood_group=GROUPS[group], city=name, city_key=normalize_city(name),
+                latitude=lat, longitude=lon, geo_cell=geo_cell(lat, lon), date_joined=g.moment(),
+            ))
+        return out
+    user_pks = g.write(User, users, build_users, keep_pks=True)
+    requesters = [user_pks[i] for i in hospitals] or user_pks
+    hospital_set = set(hospitals) if len(hospitals) < len(user_pks) else set()
+
+    def build_requests(start, n):
+        statuses = g.weighted([s for s, _ in STATUSES], [w for _, w in STATUSES], n)
+        groups = g.weighted(GROUPS, group_weights, n)
+        cities = g.weighted(city_names, city_weights, n)
+        return [
+            DonationRequest(requester_id=rng.choice(requesters), blood_group=group, units=rng.randint(1, 4),
+                            city=city, city_key=normalize_city(city), status=status, created_at=g.moment(),
+                            approved_by_id=None if status == 'pending' else admin.pk)
+            for status, group, city in zip(statuses, groups, cities)
+        ]
+    g.write(DonationRequest, requests if user_pks else 0, build_requests, dates=['created_at'])
+
+    def build_donations(start, n):
+        out = []
+        for _ in range(n):
+            u = rng.randrange(len(user_pks))
+            while u in hospital_set:
+                u = rng.randrange(len(user_pks))
+            local = banks_by_city[user_city[u]] or bank_pks
+            approved = rng.random() < 0.85
+            out.append(Donation(donor_id=user_pks[u], blood_bank_id=rng.choice(local) if local else None,
+                                blood_group=GROUPS[user_group[u]], units=1, date=g.moment(),
+                                approved=approved, approved_by_id=admin.pk if approved else None))
+        return out
+    g.write(Donation, donations if user_pks else 0, build_donations, dates=['date'])
+
+    started = time.monotonic()
+    inventory.rebuild()
+    rollups.rebuild()
+    search.rebuild()
+    caching.bump(BloodBank, BloodInventory, Donation, DonationRequest, User)
+    g.progress('summaries', 0, time.monotonic() - started)
+    return {'banks': len(bank_pks), 'inventory': len(bank_pks) * 8, 'users': len(user_pks) + 1,
+            'requests': requests if user_pks else 0, 'donations': donations if user_pks else 0}
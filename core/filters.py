@@ -0,0 +1,34 @@
+"""API filter sets: city filters compare the indexed, normalized ``city_key``."""
+import django_filters
+from django.contrib.auth import get_user_model
+
+from .cities import normalize_city
+from .models import DonationRequest
+
+User = get_user_model()
+
+
+class CityFilter(django_filters.CharFilter):
+    """``?city=`` in any spelling or script ("Chittagong", "চট্টগ্রাম") as an equality on ``city_key``."""
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        return qs.filter(**{self.field_name: normalize_city(value)})
+
+
+class UserFilter(django_filters.FilterSet):
+    city = CityFilter(field_name='city_key')
+
+    class Meta:
+        model = User
+        fields = ['role', 'blood_group']
+
+
+class DonationRequestFilter(django_filters.FilterSet):
+    city = CityFilter(field_name='city_key')
+    requester__city = CityFilter(field_name='requester__city_key')
+
+    class Meta:
+        model = DonationRequest
+        fields = ['status', 'blood_group']
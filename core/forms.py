@@ -1,11 +1,14 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from .models import DonationRequest, BLOOD_GROUPS, BloodBank
+from .cities import canonical_city
 
 User = get_user_model()
 
 import re
 
+NON_DIGITS = re.compile(r"\D+")
+
 def normalize_phone(phone: str) -> str:
     """
     Normalize phone numbers to a digits-only form for uniqueness checks.
@@ -16,7 +19,7 @@ def normalize_phone(phone: str) -> str:
     """
     if not phone:
         return ''
-    digits = re.sub(r"\D+", "", phone)
+    digits = NON_DIGITS.sub("", phone)
     if digits.startswith('0'):
         # common local format like 017xxxxxxxx -> 88017xxxxxxxx
         digits = '88' + digits
@@ -25,7 +28,12 @@ def normalize_phone(phone: str) -> str:
         digits = '88' + digits
     return digits
 
-class RegisterForm(forms.ModelForm):
+class CityMixin:
+    """Known cities are stored under their canonical name, whatever spelling or script was typed."""
+    def clean_city(self):
+        return canonical_city(self.cleaned_data.get('city', ''))
+
+class RegisterForm(CityMixin, forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput, min_length=6)
     role = forms.ChoiceField(choices=[('donor','Donor'),('hospital','Hospital')], initial='donor')
     class Meta:
@@ -65,7 +73,7 @@ class RegisterForm(forms.ModelForm):
             user.save()
         return user
 
-class ProfileForm(forms.ModelForm):
+class ProfileForm(CityMixin, forms.ModelForm):
     class Meta:
         model = User
         fields = ('first_name','last_name','phone','city','blood_group','profile_photo')
@@ -78,7 +86,7 @@ class ProfileForm(forms.ModelForm):
         return cleaned
 
 
-class BloodBankForm(forms.ModelForm):
+class BloodBankForm(CityMixin, forms.ModelForm):
     class Meta:
         model = BloodBank
         fields = ('name','city','address','contact')
@@ -90,7 +98,7 @@ class AdminUserForm(forms.ModelForm):
         model = User
         fields = ('username','email','first_name','last_name','role','phone','city','blood_group')
 
-class DonationRequestForm(forms.ModelForm):
+class DonationRequestForm(CityMixin, forms.ModelForm):
     class Meta:
         model = DonationRequest
         fields = ('blood_group','units','city')
@@ -1,5 +1,6 @@
 from django.urls import path
 from . import frontend_views
+from .live import live_feed
 from django.contrib.auth import views as auth_views
 
 urlpatterns = [
@@ -19,12 +20,15 @@ urlpatterns = [
     path('site-admin/donors/<int:pk>/edit/', frontend_views.edit_donor, name='edit-donor'),
     path('site-admin/requests/', frontend_views.manage_requests, name='manage-requests'),
     path('site-admin/requests/<int:pk>/reject/', frontend_views.reject_request, name='reject-request'),
+    path('site-admin/requests/bulk/', frontend_views.bulk_update_requests, name='bulk-update-requests'),
     path('profile/', frontend_views.profile_view, name='profile'),
     path('request/new/', frontend_views.create_request, name='create-request'),
     path('requests/<int:pk>/approve/', frontend_views.approve_request, name='approve-request'),
     path('search/', frontend_views.search_donors, name='search-donors'),
     path('my-requests/', frontend_views.my_requests, name='my-requests'),
     path('analytics/', frontend_views.analytics_dashboard, name='analytics-dashboard'),
+    # server-sent events for the dashboards (needs ASGI)
+    path('live/', live_feed, name='live-feed'),
     path('set-language/', frontend_views.set_language, name='set_language'),
     # Password reset feature removed — no routes provided for forgotten passwords.
     # Keep a 'resend-confirmation' route to avoid template reverse errors;
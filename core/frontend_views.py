@@ -5,19 +5,42 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from .models import User, BloodBank, BloodInventory, DonationRequest, Donation
 from .forms import RegisterForm, ProfileForm, DonationRequestForm
 from .forms import BloodBankForm, AdminUserForm
-from django.db.models import Sum, Count
-from django.core.mail import send_mail
+from .mailqueue import enqueue_mail
+from .notifications import alert_donors
+from .matching import matching_donors, city_filter
+from .cities import normalize_city
+from .inventory import inventory_totals
+from .pagination import keyset_page, approximate_count
+from . import allocation, caching, rollups, search, stats
 from django.conf import settings
 from django.urls import reverse
 from django.core import signing
-from django.utils import timezone
-from datetime import timedelta
 from django.core.cache import cache
 from django.utils.translation import activate
 from django.http import HttpResponseRedirect
 import random
 import json
 
+# rows shown by the dashboards (the full lists are paginated)
+DASHBOARD_ROWS = 20
+LIST_PAGE_SIZE = 50
+# requester too: the related manager checks it on every row it returns
+REQUEST_COLUMNS = ('requester', 'created_at', 'blood_group', 'units', 'city', 'status')
+
+
+def _paged(request, qs, size=LIST_PAGE_SIZE):
+    """A keyset page of ``qs`` from the request's cursor plus the context ``_pager.html`` needs."""
+    page = keyset_page(qs, after=request.GET.get('after'), before=request.GET.get('before'), size=size)
+    params = request.GET.copy()
+    for key in ('after', 'before'):
+        params.pop(key, None)
+    return page, {
+        'next_cursor': page.next_cursor, 'previous_cursor': page.previous_cursor,
+        'is_paginated': bool(page.next_cursor or page.previous_cursor), 'base_query': params.urlencode(),
+    }
+
+
+@caching.cached_view(User)
 def home(request):
     return render(request, 'core/home.html')
 
@@ -126,18 +149,23 @@ def logout_view(request):
 def donor_dashboard(request):
     if request.user.role != 'donor':
         return redirect('home')
-    # Show all donations approved by admin, newest first
-    donations = request.user.donations.filter(approved=True).order_by('-date')
-    requests_qs = request.user.requests.all().order_by('-created_at')
-    available = BloodInventory.objects.values('blood_group').annotate(total=Sum('units'))
-    return render(request, 'core/donor_dashboard.html', {'donations': donations, 'available': available, 'requests': requests_qs})
+    # Latest donations approved by admin, newest first. Everything stays lazy
+    # so sections served from the fragment cache run no queries.
+    approved = request.user.donations.filter(approved=True)
+    donations = (approved.select_related('blood_bank').order_by('-date')
+                 .only('donor', 'date', 'blood_group', 'units', 'approved', 'blood_bank__name', 'blood_bank__city')[:DASHBOARD_ROWS])
+    requests_qs = request.user.requests.order_by('-created_at').only(*REQUEST_COLUMNS)[:DASHBOARD_ROWS]
+    return render(request, 'core/donor_dashboard.html', {
+        'donations': donations, 'donation_count': approved.count,
+        'available': inventory_totals(), 'requests': requests_qs,
+    })
 
 
 @login_required
 def hospital_dashboard(request):
     if request.user.role != 'hospital':
         return redirect('home')
-    requests_qs = request.user.requests.all().order_by('-created_at')
+    requests_qs = request.user.requests.order_by('-created_at').only(*REQUEST_COLUMNS)[:DASHBOARD_ROWS]
     return render(request, 'core/hospital_dashboard.html', {
         'requests': requests_qs,
     })
@@ -145,21 +173,22 @@ def hospital_dashboard(request):
 @login_required
 @user_passes_test(lambda u: u.role=='admin')
 def admin_dashboard(request):
-    total_donors = User.objects.filter(role='donor').count()
-    total_requests = DonationRequest.objects.count()
-    pending = DonationRequest.objects.filter(status='pending')
-    inventory = BloodInventory.objects.values('blood_group').annotate(total_units=Sum('units'))
+    counts = stats.dashboard_stats()
+    # oldest first: those have waited longest
+    pending_rows = (DonationRequest.objects.filter(status='pending').select_related('requester').order_by('created_at')
+                    .only('blood_group', 'units', 'city', 'created_at', 'requester__username', 'requester__email')[:DASHBOARD_ROWS])
     return render(request, 'core/admin_dashboard.html', {
-        'total_donors': total_donors, 'total_requests': total_requests,
-        'pending': pending, 'inventory': inventory
+        'total_donors': counts.total_donors, 'total_requests': counts.total_requests,
+        'pending': pending_rows, 'pending_count': counts.pending_requests, 'inventory': counts.inventory,
+        'stats_at': counts.computed_at,  # the inventory fragment is cached per stats snapshot
     })
 
 
 @login_required
 @user_passes_test(lambda u: u.role=='admin')
 def manage_banks(request):
-    banks = BloodBank.objects.all()
-    return render(request, 'core/admin_banks.html', {'banks': banks})
+    banks, pager = _paged(request, BloodBank.objects.order_by('name', 'id').only('name', 'city', 'contact'))
+    return render(request, 'core/admin_banks.html', {'banks': banks, **pager})
 
 
 @login_required
@@ -191,8 +220,9 @@ def delete_bank(request, pk):
 @login_required
 @user_passes_test(lambda u: u.role=='admin')
 def manage_donors(request):
-    donors = User.objects.filter(role='donor')
-    return render(request, 'core/admin_donors.html', {'donors': donors})
+    donors = User.objects.filter(role='donor').order_by('username').only('username', 'blood_group', 'city', 'email', 'phone')
+    donors, pager = _paged(request, donors)
+    return render(request, 'core/admin_donors.html', {'donors': donors, **pager})
 
 
 @login_required
@@ -218,8 +248,11 @@ def edit_donor(request, pk):
 @login_required
 @user_passes_test(lambda u: u.role=='admin')
 def manage_requests(request):
-    reqs = DonationRequest.objects.all().order_by('-created_at')
-    return render(request, 'core/admin_requests.html', {'reqs': reqs})
+    # newest first; ids follow creation order and page on the primary key
+    reqs = (DonationRequest.objects.select_related('requester').order_by('-id')
+            .only('blood_group', 'units', 'city', 'status', 'requester__username'))
+    reqs, pager = _paged(request, reqs)
+    return render(request, 'core/admin_requests.html', {'reqs': reqs, **pager})
 
 
 @login_required
@@ -227,12 +260,34 @@ def manage_requests(request):
 def reject_request(request, pk):
     req = get_object_or_404(DonationRequest, pk=pk)
     if req.status == 'pending':
-        req.status = 'rejected'
-        req.approved_by = request.user
-        req.save()
+        allocation.reject(req, request.user)
         messages.success(request, 'Request rejected.')
     return redirect('manage-requests')
 
+@login_required
+@user_passes_test(lambda u: u.role=='admin')
+def bulk_update_requests(request):
+    """Approve or reject the requests ticked on the manage requests page."""
+    if request.method != 'POST':
+        return redirect('manage-requests')
+    ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+    action = request.POST.get('action')
+    if not ids:
+        messages.info(request, 'No requests selected.')
+    elif action == 'approve':
+        result = allocation.approve_requests(ids, request.user)
+        messages.success(request, f"{len(result['approved'])} request(s) approved.")
+        if result['insufficient']:
+            messages.error(request, f"{len(result['insufficient'])} request(s) left pending: not enough compatible units in stock.")
+        if result['skipped']:
+            messages.info(request, f"{len(result['skipped'])} request(s) were already processed.")
+    elif action == 'reject':
+        result = allocation.reject_requests(ids, request.user)
+        messages.success(request, f"{len(result['rejected'])} request(s) rejected.")
+        if result['skipped']:
+            messages.info(request, f"{len(result['skipped'])} request(s) were already processed.")
+    return redirect('manage-requests')
+
 @login_required
 def profile_view(request):
     if request.method == 'POST':
@@ -258,12 +313,9 @@ def create_request(request):
             subject = f"New blood request: {dr.blood_group} x{dr.units}"
             body = f"A new blood request has been submitted by {request.user.username} for {dr.units} unit(s) of {dr.blood_group} in {dr.city}."
             # notify requester
-            send_mail(subject, f"Your request has been received.\n\n{body}", settings.DEFAULT_FROM_EMAIL, [request.user.email], fail_silently=True)
+            enqueue_mail(subject, f"Your request has been received.\n\n{body}", [request.user.email])
             # notify donors of same group
-            donors = User.objects.filter(role='donor', blood_group=dr.blood_group).exclude(email='')
-            donor_emails = [d.email for d in donors if d.email]
-            if donor_emails:
-                send_mail(f"Donor Alert: {dr.blood_group} needed", body, settings.DEFAULT_FROM_EMAIL, donor_emails, fail_silently=True)
+            alert_donors(dr, body)
             return redirect('donor-dashboard')
     else:
         form = DonationRequestForm()
@@ -274,62 +326,73 @@ def create_request(request):
 def approve_request(request, pk):
     req = get_object_or_404(DonationRequest, pk=pk)
     if req.status == 'pending':
-        req.status = 'approved'
-        req.approved_by = request.user
-        req.save()
-        # optionally update inventory (not implemented complex matching)
-        messages.success(request, 'Request approved.')
+        try:
+            allocation.approve(req, request.user)
+        except allocation.InsufficientInventory as exc:
+            messages.error(request, str(exc))
+        except allocation.AlreadyProcessed:
+            pass
+        else:
+            messages.success(request, 'Request approved.')
     return redirect('admin-dashboard')
 
-def search_donors(request):
-    from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+SEARCH_COLUMNS = ('username', 'blood_group', 'city', 'email')
+SEARCH_CACHE_TIMEOUT = 60
 
+
+def search_donors(request):
     q_bg = request.GET.get('blood_group', '')
     q_city = request.GET.get('city', '')
-
-    qs = User.objects.filter(
-        role='donor', is_active=True, is_superuser=False, is_staff=False
-    ).order_by('username')
-
-    # Filter by selected options
-    if q_bg:
-        qs = qs.filter(blood_group=q_bg)
+    q_exact = request.GET.get('exact') == '1'
+    q = request.GET.get('q', '').strip()
+    try:
+        lat = float(request.GET['lat'])
+        lon = float(request.GET['lon'])
+    except (KeyError, ValueError):
+        lat = lon = None
+
+    # Donors able to give to the selected group, exact matches first,
+    # then same city / nearest (see core.matching)
+    qs = matching_donors(q_bg, q_city, lat=lat, lon=lon, exact=q_exact)
     if q_city:
-        qs = qs.filter(city__icontains=q_city)
+        qs = qs.filter(**city_filter(q_city))
+    if q:
+        # name / city / phone through the search index (core.search)
+        qs = search.filter_queryset(qs, q.split(), search.FIELDS[User])
 
     # Blood group choices for the dropdown
     blood_groups = User._meta.get_field('blood_group').choices
 
-    # Pagination
-    page = request.GET.get('page', 1)
-    per_page = 10
-    paginator = Paginator(qs, per_page)
-    try:
-        page_obj = paginator.page(page)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+    after, before = request.GET.get('after'), request.GET.get('before')
 
-    # Results meta for template
-    try:
-        start_index = page_obj.start_index()
-        end_index = page_obj.end_index()
-    except Exception:
-        start_index = 0
-        end_index = 0
+    def results():
+        # Keyset pagination: deep pages cost the same as the first one
+        # only what the template shows, so cached rows carry no password hashes
+        page = keyset_page(qs.only(*SEARCH_COLUMNS), after=after, before=before, size=10)
+        total, estimate = approximate_count(qs)
+        return {
+            'donors': list(page),
+            'next_cursor': page.next_cursor, 'previous_cursor': page.previous_cursor,
+            'total_count': total, 'count_is_estimate': estimate,
+        }
+
+    key = caching.make_key('search', q_bg, normalize_city(q_city), q_exact, q, lat, lon, after, before, models=[User])
+    found = caching.get_or_compute(key, results, SEARCH_CACHE_TIMEOUT)
+
+    # query string without the cursor, for the next/previous links
+    params = request.GET.copy()
+    for key in ('after', 'before', 'page'):
+        params.pop(key, None)
 
     context = {
-        'donors': page_obj,  # keep existing name for loop compatibility
-        'page_obj': page_obj,
-        'paginator': paginator,
-        'is_paginated': paginator.num_pages > 1,
+        **found,
         'blood_groups': blood_groups,
         'q_bg': q_bg,
         'q_city': q_city,
-        'total_count': paginator.count,
-        'start_index': start_index,
-        'end_index': end_index,
+        'q_exact': q_exact,
+        'q': q,
+        'base_query': params.urlencode(),
+        'is_paginated': bool(found['next_cursor'] or found['previous_cursor']),
     }
     return render(request, 'core/search.html', context)
 
@@ -337,31 +400,28 @@ def search_donors(request):
 @login_required
 @user_passes_test(lambda u: u.role=='admin')
 def analytics_dashboard(request):
-    """Admin analytics page with charts for blood availability and donation trends."""
+    """Admin analytics page with charts for blood availability and donation trends.
+
+    Reads only the shared dashboard stats and the daily donation rollup.
+    """
+    counts = stats.dashboard_stats()
+
     # Blood availability by group
-    inventory_data = BloodInventory.objects.values('blood_group').annotate(total=Sum('units')).order_by('blood_group')
-    inventory_labels = [item['blood_group'] for item in inventory_data]
-    inventory_values = [item['total'] for item in inventory_data]
+    inventory_labels = [item['blood_group'] for item in counts.inventory]
+    inventory_values = [item['total_units'] for item in counts.inventory]
     
     # Donation trends (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    donations_over_time = Donation.objects.filter(date__gte=thirty_days_ago, approved=True)\
-        .extra(select={'day': 'date(date)'})\
-        .values('day')\
-        .annotate(count=Count('id'))\
-        .order_by('day')
+    donations_over_time = rollups.donation_trend(days=30)
     donation_labels = [str(item['day']) for item in donations_over_time]
     donation_values = [item['count'] for item in donations_over_time]
     
     # Blood group distribution of donors
-    donor_distribution = User.objects.filter(role='donor').values('blood_group')\
-        .annotate(count=Count('id'))\
-        .order_by('blood_group')
+    donor_distribution = counts.donor_distribution()
     donor_labels = [item['blood_group'] if item['blood_group'] else 'Unknown' for item in donor_distribution]
     donor_values = [item['count'] for item in donor_distribution]
     
     # Request status breakdown
-    request_status = DonationRequest.objects.values('status').annotate(count=Count('id'))
+    request_status = counts.request_status_totals()
     status_labels = [item['status'].capitalize() for item in request_status]
     status_values = [item['count'] for item in request_status]
     
@@ -392,5 +452,5 @@ def set_language(request):
 @login_required
 def my_requests(request):
     """A simple page for users to track the status of their blood requests."""
-    requests_qs = request.user.requests.all().order_by('-created_at')
-    return render(request, 'core/my_requests.html', {'requests': requests_qs})
+    requests_qs, pager = _paged(request, request.user.requests.order_by('-id').only(*REQUEST_COLUMNS))
+    return render(request, 'core/my_requests.html', {'requests': requests_qs, **pager})
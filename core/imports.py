@@ -0,0 +1,255 @@
+"""Bulk import of blood banks, inventory and donors.
+
+Rows are dicts (from CSV, a JSON array or NDJSON). They are validated and
+written a chunk at a time: one lookup query and one or two writes per chunk,
+however many rows it holds. Inventory and donors are upserted with
+``bulk_create(update_conflicts=True)`` on their natural keys (bank + group,
+username); banks have no unique key, so they are matched on name and
+normalized city and split into ``bulk_update`` / ``bulk_create``.
+
+Bulk writes skip ``save()`` and the signals, so ``city_key`` / ``geo_cell`` are
+filled in here and the inventory summary and donor rollups are rebuilt once the
+import finishes.
+"""
+import csv
+import json
+import time
+from collections import defaultdict, namedtuple
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from . import caching, inventory, rollups, search
+from .cities import normalize_city
+from .forms import normalize_phone
+from .matching import geo_cell
+from .models import BLOOD_GROUPS, BloodBank, BloodInventory
+
+CHUNK_SIZE = getattr(settings, 'IMPORT_CHUNK_SIZE', 2000)
+MAX_ERRORS = 100
+GROUPS = {g for g, _ in BLOOD_GROUPS}
+FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+ImportResult = namedtuple('ImportResult', 'rows imported failed errors seconds rate')
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def format_for(filename):
+    for ext, fmt in FORMATS.items():
+        if filename.lower().endswith(ext):
+            return fmt
+    raise ImportFormatError(f'Cannot tell the format of {filename!r}; use .csv, .json or .ndjson.')
+
+
+def read_rows(stream, fmt):
+    """Iterate the rows of a text stream. CSV and NDJSON are read lazily."""
+    if fmt == 'csv':
+        return csv.DictReader(stream)
+    if fmt == 'ndjson':
+        return (json.loads(line) for line in stream if line.strip())
+    if fmt == 'json':
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise ImportFormatError('Expected a JSON array of objects.')
+        return iter(data)
+    raise ImportFormatError(f'Unknown format {fmt!r}.')
+
+
+def _text(row, key):
+    value = row.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def _number(row, key, cast):
+    value = _text(row, key)
+    return cast(value) if value else None
+
+
+def _import_banks(chunk):
+    errors, banks = [], {}
+    for n, row in chunk:
+        name, city = _text(row, 'name'), _text(row, 'city')
+        if not name or not city:
+            errors.append((n, 'name and city are required'))
+            continue
+        key = (name, normalize_city(city))
+        banks[key] = BloodBank(name=name, city=city, city_key=key[1],
+                               address=_text(row, 'address'), contact=_text(row, 'contact'))
+    existing = {}
+    for bank in BloodBank.objects.filter(name__in={k[0] for k in banks}, city_key__in={k[1] for k in banks}).order_by('pk'):
+        existing.setdefault((bank.name, bank.city_key), bank)
+    updates, creates = [], []
+    for key, bank in banks.items():
+        if key in existing:
+            old = existing[key]
+            old.city, old.address, old.contact = bank.city, bank.address, bank.contact
+            updates.append(old)
+        else:
+            creates.append(bank)
+    BloodBank.objects.bulk_update(updates, ['city', 'address', 'contact'])
+    BloodBank.objects.bulk_create(creates)
+    search.index(updates + creates)
+    return len(banks), errors
+
+
+def _import_inventory(chunk):
+    errors, parsed = [], []
+    for n, row in chunk:
+        group = _text(row, 'blood_group').upper()
+        try:
+            units = _number(row, 'units', int)
+            bank_id = _number(row, 'blood_bank', int)
+        except ValueError:
+            errors.append((n, 'units and blood_bank must be integers'))
+            continue
+        bank_name, bank_city = _text(row, 'bank_name'), normalize_city(_text(row, 'bank_city'))
+        if group not in GROUPS:
+            errors.append((n, f'unknown blood group {group!r}'))
+        elif units is None or units < 0:
+            errors.append((n, 'units must be zero or more'))
+        elif bank_id is None and not (bank_name and bank_city):
+            errors.append((n, 'give blood_bank (id) or bank_name and bank_city'))
+        else:
+            parsed.append((n, bank_id, (bank_name, bank_city), group, units))
+
+    ids, by_name = set(), {}
+    names = {name for _, bank_id, (name, _), _, _ in parsed if bank_id is None}
+    for pk, name, city_key in BloodBank.objects.filter(
+        Q(pk__in={p[1] for p in parsed if p[1] is not None}) | Q(name__in=names)
+    ).order_by('pk').values_list('pk', 'name', 'city_key'):
+        ids.add(pk)
+        by_name.setdefault((name, city_key), pk)
+
+    rows = {}
+    for n, bank_id, name_key, group, units in parsed:
+        if bank_id is None:
+            bank_id = by_name.get(name_key)
+        elif bank_id not in ids:
+            bank_id = None
+        if bank_id is None:
+            errors.append((n, 'blood bank not found'))
+            continue
+        rows[(bank_id, group)] = BloodInventory(blood_bank_id=bank_id, blood_group=group, units=units)
+    BloodInventory.objects.bulk_create(
+        rows.values(), update_conflicts=True, unique_fields=['blood_bank', 'blood_group'], update_fields=['units'],
+    )
+    return len(rows), errors
+
+
+# donor columns that may be updated on re-import, when present in the file
+DONOR_FIELDS = {
+    'email': ['email'], 'phone': ['phone'], 'first_name': ['first_name'], 'last_name': ['last_name'],
+    'blood_group': ['blood_group'], 'city': ['city', 'city_key'],
+    'latitude': ['latitude', 'geo_cell'], 'longitude': ['longitude', 'geo_cell'],
+}
+
+
+def _import_donors(chunk):
+    User = get_user_model()
+    errors, donors = [], {}
+    for n, row in chunk:
+        username, email = _text(row, 'username'), _text(row, 'email').lower()
+        phone = normalize_phone(_text(row, 'phone')) or None
+        group = _text(row, 'blood_group').upper() or None
+        try:
+            validate_email(email)
+            lat, lon = _number(row, 'latitude', float), _number(row, 'longitude', float)
+        except (ValidationError, ValueError):
+            errors.append((n, 'invalid email or coordinates'))
+            continue
+        if not username:
+            errors.append((n, 'username is required'))
+        elif group is not None and group not in GROUPS:
+            errors.append((n, f'unknown blood group {group!r}'))
+        else:
+            city = _text(row, 'city')
+            donors[username] = (n, User(
+                username=username, email=email, phone=phone, role='donor', blood_group=group,
+                first_name=_text(row, 'first_name'), last_name=_text(row, 'last_name'),
+                city=city, city_key=normalize_city(city), latitude=lat, longitude=lon, geo_cell=geo_cell(lat, lon),
+            ))
+
+    # emails and phones are unique too: reject rows that would take one from another account
+    emails = {u.email: name for name, (_, u) in donors.items()}
+    phones = {u.phone: name for name, (_, u) in donors.items() if u.phone}
+    roles = {}
+    for username, email, phone, role in User.objects.filter(
+        Q(username__in=donors) | Q(email__in=emails) | Q(phone__in=phones)
+    ).values_list('username', 'email', 'phone', 'role'):
+        roles[username] = role
+        for owner in (emails.get(email), phones.get(phone)):
+            if owner and owner != username and owner in donors:
+                errors.append((donors.pop(owner)[0], 'email or phone belongs to another account'))
+    for name, (n, user) in list(donors.items()):
+        if roles.get(name, 'donor') != 'donor':
+            errors.append((donors.pop(name)[0], 'username belongs to a non-donor account'))
+        elif emails.get(user.email) != name or (user.phone and phones.get(user.phone) != name):
+            errors.append((donors.pop(name)[0], 'duplicate email or phone in this file'))
+
+    # existing donors only get the columns their row actually has; rows from
+    # one file normally share a header, so this is a single upsert
+    by_columns = defaultdict(list)
+    unusable = make_password(None)
+    rows = dict(chunk)
+    for n, user in donors.values():
+        user.password = unusable
+        by_columns[frozenset(rows[n].keys() & DONOR_FIELDS.keys())].append(user)
+    for columns, users in by_columns.items():
+        update_fields = sorted({f for col in columns for f in DONOR_FIELDS[col]} | {'email'})
+        User.objects.bulk_create(users, update_conflicts=True, unique_fields=['username'], update_fields=update_fields)
+        search.index(users)
+    return len(donors), errors
+
+
+IMPORTERS = {'banks': _import_banks, 'inventory': _import_inventory, 'donors': _import_donors}
+# derived tables to rebuild after a bulk load
+REFRESH = {'inventory': inventory.rebuild, 'donors': rollups.rebuild_donors}
+# cache version stamps to bump (bulk writes skip the signals)
+MODELS = {'banks': BloodBank, 'inventory': BloodInventory, 'donors': get_user_model()}
+
+
+def import_rows(kind, rows, chunk_size=None, progress=None):
+    """
+    Import an iterable of row dicts as ``kind`` ('banks', 'inventory' or 'donors').
+    Each chunk is its own transaction. ``progress(rows, imported, seconds)`` is
+    called after every chunk. Returns an ``ImportResult``; ``errors`` holds the
+    first ``MAX_ERRORS`` ``(row number, message)`` pairs.
+    """
+    if kind not in IMPORTERS:
+        raise ImportFormatError(f'Unknown import {kind!r}; expected one of {", ".join(IMPORTERS)}.')
+    importer = IMPORTERS[kind]
+    chunk_size = chunk_size or CHUNK_SIZE
+    numbered = enumerate(rows, start=1)
+    total = imported = failed = 0
+    errors = []
+    start = time.monotonic()
+    while chunk := list(islice(numbered, chunk_size)):
+        total += len(chunk)
+        bad = [(n, 'row must be an object') for n, row in chunk if not isinstance(row, dict)]
+        chunk = [(n, row) for n, row in chunk if isinstance(row, dict)]
+        try:
+            with transaction.atomic():
+                done, rejected = importer(chunk) if chunk else (0, [])
+        except IntegrityError as exc:
+            done, rejected = 0, [(n, f'chunk rejected: {exc}') for n, _ in chunk]
+        imported += done
+        failed += len(bad) + len(rejected)
+        errors += sorted(bad + rejected)[:MAX_ERRORS - len(errors)]
+        if progress:
+            progress(total, imported, time.monotonic() - start)
+
+    if imported and kind in REFRESH:
+        REFRESH[kind]()
+    if imported:
+        caching.bump(MODELS[kind])
+    seconds = time.monotonic() - start
+    return ImportResult(total, imported, failed, errors, round(seconds, 3), round(total / seconds, 1) if seconds else 0.0)
@@ -0,0 +1,89 @@
+"""Materialized inventory totals.
+
+``InventorySummary`` holds units per blood group nationwide and per city. It is
+kept in step with ``BloodInventory`` by applying deltas in the same transaction
+as the inventory change (see ``core.signals``); code that changes inventory with
+``QuerySet.update`` must call ``apply_deltas`` itself. Dashboards read the
+nationwide rows through the cache, so a page view costs at most one query over
+eight rows instead of an aggregate over the inventory table.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+
+from . import caching, live, metrics
+from .models import BloodBank, BloodInventory, InventorySummary
+
+CACHE_KEY = 'inventory:totals'
+CACHE_TIMEOUT = 60 * 60
+
+
+def apply_deltas(deltas):
+    """
+    Apply ``{(blood_group, city_key): delta}`` to the summary, nationwide and per city.
+    """
+    totals = defaultdict(int)
+    for (group, city_key), delta in deltas.items():
+        if delta:
+            totals[(group, city_key)] += delta
+            totals[(group, InventorySummary.ALL)] += delta
+    if not totals:
+        return
+    with transaction.atomic():
+        for (group, city_key), delta in totals.items():
+            updated = InventorySummary.objects.filter(city_key=city_key, blood_group=group).update(units=F('units') + delta)
+            if not updated:
+                _, created = InventorySummary.objects.get_or_create(city_key=city_key, blood_group=group, defaults={'units': delta})
+                if not created:
+                    InventorySummary.objects.filter(city_key=city_key, blood_group=group).update(units=F('units') + delta)
+        transaction.on_commit(invalidate)
+        # every inventory write ends up here, including QuerySet.update ones
+        caching.bump(BloodInventory)
+        live.publish('inventory', {g: d for (g, c), d in totals.items() if c == InventorySummary.ALL})
+
+
+def rebuild():
+    """Recompute the whole summary from BloodInventory (after bulk loads)."""
+    rows = defaultdict(int)
+    for row in BloodInventory.objects.values('blood_group', 'blood_bank__city_key').annotate(total=Sum('units')):
+        rows[(row['blood_group'], row['blood_bank__city_key'])] += row['total']
+        rows[(row['blood_group'], InventorySummary.ALL)] += row['total']
+    with transaction.atomic():
+        InventorySummary.objects.all().delete()
+        InventorySummary.objects.bulk_create(
+            [InventorySummary(blood_group=g, city_key=c, units=u) for (g, c), u in rows.items()],
+            batch_size=1000,
+        )
+        transaction.on_commit(invalidate)
+        caching.bump(BloodInventory)
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
+
+
+def inventory_totals():
+    """Nationwide ``[{'blood_group', 'total_units'}]`` ordered by group, served from cache."""
+    totals = cache.get(CACHE_KEY)
+    if totals is None:
+        totals = [
+            {'blood_group': g, 'total_units': u}
+            for g, u in InventorySummary.objects.filter(city_key=InventorySummary.ALL)
+            .order_by('blood_group').values_list('blood_group', 'units')
+        ]
+        cache.set(CACHE_KEY, totals, CACHE_TIMEOUT)
+        metrics.set_inventory(totals)
+    return totals
+
+
+def city_totals(city_key):
+    return list(
+        InventorySummary.objects.filter(city_key=city_key).order_by('blood_group')
+        .values('blood_group', total_units=F('units'))
+    )
+
+
+def bank_city_key(bank_id):
+    return BloodBank.objects.filter(pk=bank_id).values_list('city_key', flat=True).first() or ''
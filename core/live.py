@@ -0,0 +1,207 @@
+"""Live updates for dashboards over server-sent events.
+
+``GET /live/`` is an async view that keeps the connection open and writes one
+SSE message per event: requests created, approved or rejected, and changes
+to nationwide inventory. ``static/js/live.js`` applies them to the page, so
+admins and hospitals no longer reload dashboards to see them. Admins receive
+every request event; other users only those for their own requests.
+
+Events are published after the transaction that caused them commits.
+``LIVE_BROKER`` selects the broker:
+
+* ``core.live.LocalBroker`` (the default) fans out inside this process. It is
+  enough for a single ASGI worker.
+* ``core.live.CacheBroker`` goes through the shared cache, so it reaches
+  subscribers in every worker. Subscribers poll every ``LIVE_POLL_INTERVAL``
+  seconds. Use it with Redis, where ``incr`` is atomic.
+
+Another broker (Redis pub/sub, say) needs only ``publish(event)`` and a
+``subscribe()`` that returns an object with ``async next(timeout)`` and
+``close()``.
+
+The stream never ends, so the site must be served over ASGI (uvicorn,
+daphne): under WSGI Django would consume it in full and hold the worker
+forever. Pages only open it when ``LIVE_UPDATES`` is on, and the view answers
+204 (which tells ``EventSource`` not to reconnect) when it is off or the
+request did not come through ASGI.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .conf import setting
+
+
+class _QueueSubscription:
+    def __init__(self, broker, size):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=size)
+
+    def put(self, event):
+        # runs on the subscriber's loop; a slow client loses its oldest events
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def next(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Fan-out to the subscribers of this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.put, event)
+            except RuntimeError:  # loop closed under us
+                self.unsubscribe(sub)
+
+    def subscribe(self):
+        sub = _QueueSubscription(self, setting('LIVE_QUEUE_SIZE', 100))
+        with self.lock:
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+
+class _CacheSubscription:
+    def __init__(self, broker):
+        self.broker = broker
+        self.seen = None  # events published before the first read are not replayed
+        self.pending = deque()
+
+    async def next(self, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        if self.seen is None:
+            self.seen = await cache.aget(self.broker.SEQ_KEY, 0)
+        while not self.pending:
+            seq = await cache.aget(self.broker.SEQ_KEY, 0)
+            if seq > self.seen:
+                # events that expired before we read them are skipped
+                keys = [self.broker.event_key(n) for n in range(self.seen + 1, seq + 1)]
+                found = await cache.aget_many(keys)
+                self.pending.extend(found[k] for k in keys if k in found)
+                self.seen = seq
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(setting('LIVE_POLL_INTERVAL', 1.0), remaining))
+        return self.pending.popleft()
+
+    def close(self):
+        pass
+
+
+class CacheBroker:
+    """Events numbered with ``cache.incr`` and kept for ``LIVE_EVENT_TTL`` seconds."""
+    SEQ_KEY = 'live:seq'
+
+    def event_key(self, n):
+        return f'live:event:{n}'
+
+    def publish(self, event):
+        cache.add(self.SEQ_KEY, 0, None)
+        n = cache.incr(self.SEQ_KEY)
+        cache.set(self.event_key(n), event, setting('LIVE_EVENT_TTL', 60))
+
+    def subscribe(self):
+        return _CacheSubscription(self)
+
+
+@lru_cache(maxsize=None)
+def broker():
+    return import_string(setting('LIVE_BROKER', 'core.live.LocalBroker'))()
+
+
+def publish(kind, data):
+    """Publish ``{'type': kind, 'data': data}`` once the current transaction commits."""
+    event = {'type': kind, 'data': json.loads(json.dumps(data, cls=DjangoJSONEncoder))}
+    transaction.on_commit(lambda: broker().publish(event))
+
+
+def request_event(dr, previous=None, status=None):
+    """
+    The ``request`` event for ``dr``: ``previous`` is its status before the
+    change (None when new), ``status`` overrides ``dr.status`` for callers
+    that changed it with ``QuerySet.update``.
+    """
+    from .models import DonationRequest
+
+    return {
+        'id': dr.pk, 'status': status or dr.status, 'previous': previous,
+        'blood_group': dr.blood_group, 'units': dr.units, 'city': dr.city,
+        'created_at': timezone.localtime(dr.created_at) if dr.created_at else None, 'requester_id': dr.requester_id,
+        'requester': dr.requester.username if DonationRequest.requester.is_cached(dr) else '',
+    }
+
+
+def publish_requests(requests, previous, status=None):
+    for dr in requests:
+        publish('request', request_event(dr, previous, status))
+
+
+def visible(event, user):
+    if event['type'] == 'request':
+        return user.role == 'admin' or event['data']['requester_id'] == user.pk
+    return True
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+async def _stream(user):
+    sub = broker().subscribe()
+    keepalive = setting('LIVE_KEEPALIVE', 15)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            event = await sub.next(keepalive)
+            if event is None:
+                yield ': keepalive\n\n'  # also lets the server notice a closed connection
+            elif visible(event, user):
+                yield format_event(event)
+    finally:
+        sub.close()
+
+
+async def live_feed(request):
+    """``GET /live/``: the event stream for the signed-in user."""
+    if not setting('LIVE_UPDATES', False) or not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    response = StreamingHttpResponse(_stream(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: do not buffer the stream
+    return response
@@ -0,0 +1,172 @@
+"""Persistent outbound mail queue.
+
+Views call ``enqueue_mail`` instead of ``send_mail`` so that no SMTP round-trip
+happens inside the request/response cycle. The ``process_mail_queue`` management
+command calls ``drain`` which delivers due messages in batches over a single
+mail connection, retrying failures with exponential backoff and marking a
+message ``dead`` once it runs out of attempts. ``fan_out`` queues one message
+per recipient for large alerts; donor alerts are expanded through it by
+``core.notifications.expand_alerts`` from the same command.
+"""
+import logging
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from . import metrics
+from .conf import setting
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_mail(subject, body, recipient_list, from_email=None):
+    """Queue a message for delivery. Returns the OutboundEmail or None if there are no recipients."""
+    recipients = [r for r in recipient_list if r]
+    if not recipients:
+        return None
+    metrics.inc('mail_enqueued_total')
+    return OutboundEmail.objects.create(
+        subject=subject[:255],
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=','.join(recipients),
+    )
+
+
+def enqueue_many(messages, from_email=None):
+    """Queue ``(subject, body, recipient_list)`` tuples with a single bulk insert."""
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    rows = [
+        OutboundEmail(subject=subject[:255], body=body, from_email=from_email, recipients=','.join(r for r in recipients if r))
+        for subject, body, recipients in messages
+        if any(recipients)
+    ]
+    metrics.inc('mail_enqueued_total', len(rows))
+    return OutboundEmail.objects.bulk_create(rows, batch_size=1000)
+
+
+FanoutResult = namedtuple('FanoutResult', 'recipients chunks seconds rate')
+
+
+def fan_out(subject, body, recipients, from_email=None, chunk_size=None):
+    """Queue one message per recipient, writing rows in chunks.
+
+    ``recipients`` can be any iterable of addresses; pass
+    ``qs.values_list('email', flat=True).iterator(chunk_size=...)`` so that
+    only one chunk of addresses is held in memory at a time.
+    """
+    chunk_size = chunk_size or setting('DONOR_ALERT_CHUNK_SIZE', 1000)
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    subject = subject[:255]
+    started = time.monotonic()
+    total = chunks = 0
+    batch = []
+
+    def flush():
+        OutboundEmail.objects.bulk_create(batch, batch_size=chunk_size)
+        batch.clear()
+
+    for address in recipients:
+        if not address:
+            continue
+        batch.append(OutboundEmail(subject=subject, body=body, from_email=from_email, recipients=address))
+        total += 1
+        if len(batch) >= chunk_size:
+            flush()
+            chunks += 1
+    if batch:
+        flush()
+        chunks += 1
+
+    metrics.inc('mail_enqueued_total', total)
+    seconds = time.monotonic() - started
+    result = FanoutResult(total, chunks, seconds, total / seconds if seconds else float(total))
+    logger.info('Fan-out "%s": %d recipients in %d chunk(s), %.2fs (%.0f/s)',
+                subject, result.recipients, result.chunks, result.seconds, result.rate)
+    return result
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt: base * 2^(attempts-1), capped."""
+    base = setting('MAIL_QUEUE_RETRY_DELAY', 60)
+    cap = setting('MAIL_QUEUE_MAX_RETRY_DELAY', 60 * 60)
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), cap))
+
+
+def _claim(batch_size):
+    """Mark up to ``batch_size`` due messages as ``sending`` and return the ones this call marked."""
+    now = timezone.now()
+    # messages left in 'sending' by a crashed worker become due again
+    stale = now - timedelta(seconds=setting('MAIL_QUEUE_LOCK_TIMEOUT', 10 * 60))
+    OutboundEmail.objects.filter(status='sending', locked_at__lt=stale).update(status='pending', locked_at=None)
+
+    with transaction.atomic():
+        qs = OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        ids = list(qs.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        # without SKIP LOCKED another worker may have picked the same ids:
+        # only rows still pending are taken, and only those come back
+        OutboundEmail.objects.filter(id__in=ids, status='pending').update(status='sending', locked_at=now)
+    return list(OutboundEmail.objects.filter(id__in=ids, status='sending', locked_at=now).order_by('id'))
+
+
+def _mark_failed(item, error):
+    item.attempts += 1
+    item.last_error = str(error)[:2000]
+    item.locked_at = None
+    if item.attempts >= setting('MAIL_QUEUE_MAX_ATTEMPTS', 5):
+        item.status = 'dead'
+        logger.warning('Mail %s dead-lettered after %s attempts: %s', item.pk, item.attempts, error)
+    else:
+        item.status = 'pending'
+        item.next_attempt_at = timezone.now() + retry_delay(item.attempts)
+    item.save(update_fields=['attempts', 'last_error', 'locked_at', 'status', 'next_attempt_at'])
+
+
+def drain(batch_size=None, connection=None):
+    """Deliver one batch of due messages. Returns ``(sent, failed)`` counts."""
+    batch_size = batch_size or setting('MAIL_QUEUE_BATCH_SIZE', 100)
+    items = _claim(batch_size)
+    if not items:
+        return 0, 0
+
+    conn = connection or get_connection(fail_silently=False)
+    try:
+        conn.open()
+    except Exception as exc:
+        for item in items:
+            _mark_failed(item, exc)
+        metrics.inc('mail_failed_total', len(items))
+        return 0, len(items)
+
+    # all messages in the batch share one open connection, like send_mass_mail
+    sent_ids, failed = [], 0
+    try:
+        for item in items:
+            msg = EmailMessage(item.subject, item.body, item.from_email or settings.DEFAULT_FROM_EMAIL,
+                               item.recipients.split(','), connection=conn)
+            try:
+                msg.send()
+            except Exception as exc:
+                _mark_failed(item, exc)
+                failed += 1
+            else:
+                sent_ids.append(item.pk)
+    finally:
+        conn.close()
+
+    if sent_ids:
+        OutboundEmail.objects.filter(id__in=sent_ids).update(
+            status='sent', sent_at=timezone.now(), locked_at=None, last_error='')
+    metrics.inc('mail_sent_total', len(sent_ids))
+    metrics.inc('mail_failed_total', failed)
+    return len(sent_ids), failed
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core import inventory, rollups
+import time
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the analytics rollups and inventory summary from the source tables'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rollups.rebuild()
+        inventory.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rollups rebuilt in {time.monotonic() - started:.2f}s'))
@@ -0,0 +1,79 @@
+import argparse
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from core import benchmarks
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, got {number}')
+    return number
+
+
+class Command(BaseCommand):
+    help = 'Time the hot API/frontend paths against synthetic datasets (in a throwaway test database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(map(str, benchmarks.DEFAULT_SIZES)),
+                            help='Comma-separated user counts (other tables scale with it)')
+        parser.add_argument('--repeat', type=positive_int, default=5, help='Timed runs per case')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--case', action='append', dest='cases', choices=[c.name for c in benchmarks.CASES],
+                            help='Only run this case (repeatable)')
+        parser.add_argument('--output', help='Write the JSON results to this file')
+        parser.add_argument('--baseline', help='Compare with a previous --output file')
+        parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown vs the baseline (0.25 = 25%%)')
+        parser.add_argument('--concurrency', type=positive_int,
+                            help='Instead: compare sync and async endpoints with this many requests in flight')
+        parser.add_argument('--requests', type=positive_int, default=200, help='Requests per endpoint with --concurrency')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        def progress(row):
+            if 'mode' in row:
+                self.stdout.write(f"{row['case']:<16} {row['mode']:<5} {row['size']:>8} {row['requests_per_second']:>8.1f} req/s "
+                                  f"{row['median_ms']:>9.2f}ms p50 {row['p95_ms']:>9.2f}ms p95  {row['status']}")
+                return
+            self.stdout.write(f"{row['case']:<22} {row['size']:>8} {row['median_ms']:>9.2f}ms "
+                              f"{row['queries']:>4} queries  {row['status']}")
+            for line in row['unindexed']:
+                self.stderr.write(f"  unindexed plan: {line}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # the run clears the cache between sizes; keep it off the shared one
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+                if options['concurrency']:
+                    results = benchmarks.run_concurrent(sizes=sizes, concurrency=options['concurrency'],
+                                                        total=options['requests'], seed=options['seed'], progress=progress)
+                else:
+                    results = benchmarks.run(sizes=sizes, repeat=options['repeat'], seed=options['seed'],
+                                             cases=options['cases'], progress=progress)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline is not None and not options['concurrency']:
+            problems = benchmarks.compare(results, baseline, threshold=options['threshold'])
+            if problems:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(problems))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
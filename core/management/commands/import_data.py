@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import imports
+
+
+class Command(BaseCommand):
+    help = 'Bulk import blood banks, inventory or donors from a CSV, JSON or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(imports.IMPORTERS), help='What the file contains')
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', choices=['csv', 'json', 'ndjson'], help='File format (default: from the extension)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows per transaction (default IMPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        def progress(rows, imported, seconds):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{rows} rows read, {imported} imported ({rows / seconds if seconds else rows:.0f} rows/s)')
+
+        try:
+            fmt = options['format'] or imports.format_for(options['path'])
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                result = imports.import_rows(options['kind'], imports.read_rows(stream, fmt),
+                                             chunk_size=options['chunk_size'], progress=progress)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for n, message in result.errors:
+            self.stderr.write(f'row {n}: {message}')
+        if result.failed > len(result.errors):
+            self.stderr.write(f'... and {result.failed - len(result.errors)} more')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} {options["kind"]} from {result.rows} rows, {result.failed} rejected '
+            f'in {result.seconds:.2f}s ({result.rate:.0f} rows/s)'
+        ))
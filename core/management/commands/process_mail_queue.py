@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from core import metrics
+from core.mailqueue import drain
+from core.notifications import expand_alerts
+import time
+
+
+class Command(BaseCommand):
+    help = 'Expand donor alerts and deliver queued outbound emails (run once, or keep polling with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages per batch (default MAIL_QUEUE_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls when the queue is empty')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        busy = 0.0
+        while True:
+            alert, queued = expand_alerts()
+            if alert:
+                self.stdout.write(f'Alert {alert.pk}: {queued} message(s) queued')
+            started = time.monotonic()
+            sent, failed = drain(batch_size=options['batch_size'])
+            metrics.refresh_gauges()
+            if alert and not (sent or failed):
+                continue
+            if sent or failed:
+                elapsed = time.monotonic() - started
+                busy += elapsed
+                total_sent += sent
+                total_failed += failed
+                rate = sent / elapsed if elapsed else sent
+                self.stdout.write(f'Batch: {sent} sent, {failed} failed ({rate:.0f} msg/s)')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        rate = total_sent / busy if busy else total_sent
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_sent} sent, {total_failed} failed ({rate:.0f} msg/s)'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from core import search
+import time
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the source tables (SQLite FTS5 only)'
+
+    def handle(self, *args, **options):
+        if search.backend() != 'fts5':
+            self.stdout.write(f'Nothing to rebuild: the {search.backend()} backend reads the tables directly')
+            return
+        started = time.monotonic()
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt in {time.monotonic() - started:.2f}s'))
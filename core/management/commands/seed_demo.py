@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from core import inventory
 from core.models import BloodBank, BloodInventory, DonationRequest, Donation, BLOOD_GROUPS
 from django.db import transaction
 import random
@@ -36,9 +37,12 @@ class Command(BaseCommand):
                 self.stdout.write('Blood banks exist')
 
             # inventory: ensure at least one row per bank per group
-            for b in banks:
-                for g, _ in BLOOD_GROUPS:
-                    inv, inv_created = BloodInventory.objects.get_or_create(blood_bank=b, blood_group=g, defaults={'units': random.randint(5, 20)})
+            # (one insert; existing rows are left alone, then the summary is rebuilt)
+            BloodInventory.objects.bulk_create(
+                [BloodInventory(blood_bank=b, blood_group=g, units=random.randint(5, 20)) for b in banks for g, _ in BLOOD_GROUPS],
+                ignore_conflicts=True,
+            )
+            inventory.rebuild()
             self.stdout.write('Ensured inventory rows')
 
             # donors: ensure at least 6 donors
@@ -0,0 +1,193 @@
+"""Donor matching: ABO/Rh compatibility plus city and grid-cell proximity.
+
+Users carry a precomputed ``city_key`` (see ``core.cities.normalize_city``) and,
+when coordinates are known, a ``geo_cell`` bucket, both indexed. Callers filter
+on the city with ``city_filter``.
+
+Matches are ranked by compatible group, then same city, then grid cell
+around the searched point (nearest ring first), then username. Sorting every candidate on
+computed ranks costs a full sort per page, so ``matching_donors`` splits the
+candidates into one bucket per rank instead: ``blood_group = g AND city_key
+= k`` and so on, each read in username order straight from an index
+(``user_group_*_name_idx``). ``DonorMatches`` walks the buckets in rank
+order, reading only as many rows as a page needs.
+"""
+import math
+from itertools import product
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from .cities import is_known_city, normalize_city
+from .pagination import KeysetPage, approximate_count, decode_cursor, encode_cursor
+
+# recipient group -> donor groups that can give to it, best match first
+COMPATIBLE_DONORS = {
+    'O-': ['O-'],
+    'O+': ['O+', 'O-'],
+    'A-': ['A-', 'O-'],
+    'A+': ['A+', 'A-', 'O+', 'O-'],
+    'B-': ['B-', 'O-'],
+    'B+': ['B+', 'B-', 'O+', 'O-'],
+    'AB-': ['AB-', 'A-', 'B-', 'O-'],
+    'AB+': ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'],
+}
+
+# size of a grid cell in degrees (~11km at the equator)
+GRID_SIZE = 0.1
+# cells up to this many rings around a searched point are ranked nearest ring
+# first; donors further away (or without coordinates) come after them
+NEARBY_RINGS = 1
+
+
+def compatible_groups(blood_group):
+    return COMPATIBLE_DONORS.get(blood_group, [blood_group] if blood_group else [])
+
+
+def geo_cell(lat, lon):
+    if lat is None or lon is None:
+        return ''
+    return f"{math.floor(lat / GRID_SIZE)}:{math.floor(lon / GRID_SIZE)}"
+
+
+def neighbour_cells(lat, lon, radius=1):
+    """The cell containing (lat, lon) and the cells around it."""
+    row, col = math.floor(lat / GRID_SIZE), math.floor(lon / GRID_SIZE)
+    return [f"{row + dr}:{col + dc}" for dr in range(-radius, radius + 1) for dc in range(-radius, radius + 1)]
+
+
+def city_filter(city):
+    """
+    ``city_key`` filter for ``city``: equality on ``city_key`` for a known city
+    (typed in any spelling or script), a prefix match otherwise, so partly
+    typed names still find something. Either way it is served by the index.
+    """
+    key = normalize_city(city)
+    if key and is_known_city(key):
+        return {'city_key': key}
+    return city_prefix_filter(city)
+
+
+def city_prefix_filter(city):
+    """Range filter on ``city_key`` equivalent to a prefix match but able to use the index."""
+    key = normalize_city(city)
+    if not key:
+        return {}
+    return {'city_key__gte': key, 'city_key__lt': key + '\U0010ffff'}
+
+
+class DonorMatches:
+    """
+    A ranked donor queryset stored as ``base`` (every candidate) plus
+    disjoint ``buckets`` (``Q`` objects, best rank first) that together cover
+    it. Iterating and paging (``keyset_page``) go bucket by bucket, each in
+    username order; counting and ``exists`` use ``base``. ``filter``,
+    ``exclude``, ``only`` and ``values_list`` apply to every bucket.
+    """
+
+    def __init__(self, base, buckets):
+        self.base = base
+        self.buckets = buckets
+
+    @property
+    def model(self):
+        return self.base.model
+
+    def filter(self, *args, **kwargs):
+        return DonorMatches(self.base.filter(*args, **kwargs), self.buckets)
+
+    def exclude(self, *args, **kwargs):
+        return DonorMatches(self.base.exclude(*args, **kwargs), self.buckets)
+
+    def only(self, *fields):
+        return DonorMatches(self.base.only(*fields), self.buckets)
+
+    def values_list(self, *fields, **kwargs):
+        return DonorMatches(self.base.values_list(*fields, **kwargs), self.buckets)
+
+    def bucket(self, i, descending=False):
+        return self.base.filter(self.buckets[i]).order_by('-username' if descending else 'username')
+
+    def __iter__(self):
+        for i in range(len(self.buckets)):
+            yield from self.bucket(i)
+
+    async def __aiter__(self):
+        for i in range(len(self.buckets)):
+            async for row in self.bucket(i):
+                yield row
+
+    def count(self):
+        return self.base.count()
+
+    def exists(self):
+        return self.base.exists()
+
+    def explain(self, **options):
+        return '\n'.join(self.bucket(i).explain(**options) for i in range(len(self.buckets)))
+
+    def approximate_count(self, cap=None):
+        return approximate_count(self.base, cap)
+
+    def keyset_page(self, after=None, before=None, size=20):
+        """Like ``core.pagination.keyset_page``; cursors are ``[bucket, username]``."""
+        cursor = decode_cursor(after or before) if (after or before) else None
+        if not (isinstance(cursor, list) and len(cursor) == 2 and isinstance(cursor[0], int)
+                and 0 <= cursor[0] < len(self.buckets)):
+            cursor = None
+        backwards = bool(cursor and not after)
+        start, name = cursor if cursor else (len(self.buckets) - 1 if backwards else 0, None)
+        order = range(start, -1, -1) if backwards else range(start, len(self.buckets))
+
+        rows = []  # (bucket, row)
+        for i in order:
+            qs = self.bucket(i, descending=backwards)
+            if i == start and name is not None:
+                qs = qs.filter(**{'username__lt' if backwards else 'username__gt': name})
+            rows += [(i, row) for row in qs[:size + 1 - len(rows)]]
+            if len(rows) > size:
+                break
+        more = len(rows) > size
+        rows = rows[:size]
+        if backwards:
+            rows.reverse()
+
+        page = KeysetPage(row for _, row in rows)
+        if rows:
+            has_next, has_previous = (True, more) if backwards else (more, cursor is not None)
+            if has_next:
+                page.next_cursor = encode_cursor([rows[-1][0], rows[-1][1].username])
+            if has_previous:
+                page.previous_cursor = encode_cursor([rows[0][0], rows[0][1].username])
+        return page
+
+
+def _cells(lat, lon):
+    """One ``Q`` per cell around (lat, lon), nearest ring first, then one for everyone else."""
+    cells = []
+    for radius in range(NEARBY_RINGS + 1):
+        cells += [c for c in neighbour_cells(lat, lon, radius) if c not in cells]
+    # a cell each rather than geo_cell IN (ring): equality is read from the index in username order
+    return [Q(geo_cell=c) for c in cells] + [~Q(geo_cell__in=cells)]
+
+
+def matching_donors(blood_group='', city='', lat=None, lon=None, exact=False):
+    """
+    Active donors able to give to ``blood_group``, as ``DonorMatches`` ranked
+    by compatibility (exact group first), same city, then the grid cell
+    around (``lat``, ``lon``) when given (nearest ring first), then username.
+    """
+    User = get_user_model()
+    qs = User.objects.filter(role='donor', is_active=True, is_superuser=False, is_staff=False)
+
+    groups = [blood_group] if exact and blood_group else compatible_groups(blood_group)
+    if groups:
+        qs = qs.filter(blood_group__in=groups)
+    by_group = [Q(blood_group=g) for g in groups] or [Q()]
+
+    city_key = normalize_city(city)
+    by_city = [Q(city_key=city_key), ~Q(city_key=city_key)] if city_key else [Q()]
+
+    by_cell = _cells(lat, lon) if lat is not None and lon is not None else [Q()]
+
+    return DonorMatches(qs, [g & c & n for g, c, n in product(by_group, by_city, by_cell)])
@@ -0,0 +1,256 @@
+"""Prometheus metrics without touching the database at scrape time.
+
+Counters, histograms and gauges are kept in memory per process and written
+every ``METRICS_FLUSH_INTERVAL`` seconds to a file of their own in
+``METRICS_DIR``. The ``/metrics`` view merges every process's file with its
+own live values: counters and histograms are summed, and for gauges the most
+recently set value wins. That keeps gunicorn workers' numbers together
+without a shared server. Clear ``METRICS_DIR`` on deploy, the way you would
+for prometheus_client's multiprocess mode.
+
+Request counts and latencies come from ``MetricsMiddleware``. Business
+counters are bumped where the events happen: requests raised and approved,
+donations approved, alerts queued. Gauges (pending requests, mail queue depth,
+inventory per group) are set by code that already computes those numbers:
+the admin stats endpoint, ``inventory_totals`` and the mail worker
+(``refresh_gauges``).
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .conf import setting, view_name
+from .models import DonationRequest, OutboundEmail
+
+# name -> (type, help)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by view, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by view.'),
+    'donation_requests_created_total': ('counter', 'Blood requests raised.'),
+    'donation_requests_processed_total': ('counter', 'Blood requests approved or rejected.'),
+    'donations_approved_total': ('counter', 'Donations approved and credited to inventory.'),
+    'mail_enqueued_total': ('counter', 'Messages added to the outbound mail queue.'),
+    'mail_sent_total': ('counter', 'Messages delivered by the mail worker.'),
+    'mail_failed_total': ('counter', 'Delivery attempts that failed.'),
+    'mail_queue_depth': ('gauge', 'Outbound messages by status.'),
+    'donation_requests_pending': ('gauge', 'Blood requests waiting for a decision.'),
+    'inventory_units': ('gauge', 'Units in stock nationwide by blood group.'),
+}
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Store:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.counters = defaultdict(float)
+        self.histograms = {}  # key -> [bucket counts..., +Inf count, sum]
+        self.gauges = {}  # key -> (value, set at)
+        self.path = None
+        self.flushed = 0.0
+
+    def _check_fork(self):
+        # a forked worker starts from zero; the parent's numbers are in the parent's file
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def update(self, fn):
+        with self.lock:
+            self._check_fork()
+            fn()
+            due = time.monotonic() - self.flushed >= setting('METRICS_FLUSH_INTERVAL', 5)
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            self._check_fork()
+            return {
+                'counters': [[n, dict(l), v] for (n, l), v in self.counters.items()],
+                'histograms': [[n, dict(l), v] for (n, l), v in self.histograms.items()],
+                'gauges': [[n, dict(l), v, t] for (n, l), (v, t) in self.gauges.items()],
+            }
+
+    def flush(self):
+        directory = metrics_dir()
+        data = self.snapshot()
+        with self.lock:
+            if self.path is None:
+                self.path = os.path.join(directory, f'{self.pid}-{uuid.uuid4().hex[:8]}.json')
+            path = self.path
+            self.flushed = time.monotonic()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # metrics must never break a request
+
+
+_store = _Store()
+atexit.register(_store.flush)
+
+
+def metrics_dir():
+    return str(setting('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'blood-management-metrics')))
+
+
+def inc(name, amount=1, **labels):
+    def fn():
+        _store.counters[_key(name, labels)] += amount
+    _store.update(fn)
+
+
+def observe(name, value, **labels):
+    def fn():
+        h = _store.histograms.setdefault(_key(name, labels), [0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h[i] += 1
+        h[-2] += 1
+        h[-1] += value
+    _store.update(fn)
+
+
+def set_gauge(name, value, **labels):
+    def fn():
+        _store.gauges[_key(name, labels)] = (value, time.time())
+    _store.update(fn)
+
+
+def _load():
+    """Every process's values, this process's taken live rather than from its file."""
+    own = _store.path
+    yield _store.snapshot()
+    try:
+        names = os.listdir(metrics_dir())
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(metrics_dir(), name)
+        if not name.endswith('.json') or path == own:
+            continue
+        try:
+            with open(path) as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def collect():
+    counters, histograms, gauges = defaultdict(float), {}, {}
+    for data in _load():
+        for name, labels, value in data['counters']:
+            counters[_key(name, labels)] += value
+        for name, labels, values in data['histograms']:
+            key = _key(name, labels)
+            total = histograms.setdefault(key, [0] * len(values))
+            histograms[key] = [a + b for a, b in zip(total, values)]
+        for name, labels, value, at in data['gauges']:
+            key = _key(name, labels)
+            if key not in gauges or at > gauges[key][1]:
+                gauges[key] = (value, at)
+    return counters, histograms, {k: v for k, (v, _) in gauges.items()}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """The merged metrics in the Prometheus text format."""
+    counters, histograms, gauges = collect()
+    by_name = defaultdict(list)
+    for series in (counters, histograms, gauges):
+        for (name, labels), value in series.items():
+            by_name[name].append((labels, value))
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = METRICS.get(name, ('untyped', ''))
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+            if kind == 'histogram':
+                for bound, count in zip(BUCKETS, value):
+                    lines.append(f'{name}_bucket{_labels(labels, le=bound)} {count}')
+                lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {value[-2]}')
+                lines.append(f'{name}_count{_labels(labels)} {value[-2]}')
+                lines.append(f'{name}_sum{_labels(labels)} {value[-1]}')
+            else:
+                lines.append(f'{name}{_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """``GET /metrics``. Needs ``Authorization: Bearer <METRICS_TOKEN>`` when that setting is set."""
+    token = setting('METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsMiddleware:
+    """Counts requests and observes their latency per view."""
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        started = time.perf_counter()
+        return self.finish(request, self.get_response(request), started)
+
+    async def _acall(self, request):
+        started = time.perf_counter()
+        return self.finish(request, await self.get_response(request), started)
+
+    def finish(self, request, response, started):
+        view = view_name(request)
+        if view != 'metrics':
+            inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+            observe('http_request_duration_seconds', time.perf_counter() - started, view=view)
+        return response
+
+
+def refresh_gauges():
+    """Set the queue, pending-request and inventory gauges (the mail worker calls this between batches)."""
+    from .inventory import inventory_totals
+
+    depth = dict(OutboundEmail.objects.exclude(status='sent').values_list('status').annotate(n=Count('id')).order_by())
+    for status in ('pending', 'sending', 'dead'):
+        set_gauge('mail_queue_depth', depth.get(status, 0), status=status)
+    set_gauge('donation_requests_pending', DonationRequest.objects.filter(status='pending').count())
+    set_inventory(inventory_totals())
+
+
+def set_inventory(totals):
+    for row in totals:
+        set_gauge('inventory_units', row['total_units'], blood_group=row['blood_group'])
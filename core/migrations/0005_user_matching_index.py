@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+import math
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# frozen copy of core.cities.normalize_city as of this migration (0011 rekeys
+# with the later version), so editing the live helper cannot change history
+def normalize_city(value):
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKC', value).casefold()
+    value = re.sub(r"[^\w\s]+", '', value)
+    return re.sub(r"\s+", ' ', value).strip()
+
+
+# frozen copy of core.matching.geo_cell
+def geo_cell(lat, lon):
+    if lat is None or lon is None:
+        return ''
+    return f"{math.floor(lat / 0.1)}:{math.floor(lon / 0.1)}"
+
+
+def populate_matching_index(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    qs = User.objects.only('id', 'city', 'latitude', 'longitude').order_by('pk')
+    last = 0
+    while True:
+        batch = list(qs.filter(pk__gt=last)[:1000])
+        if not batch:
+            break
+        for u in batch:
+            u.city_key = normalize_city(u.city)
+            u.geo_cell = geo_cell(u.latitude, u.longitude)
+        User.objects.bulk_update(batch, ['city_key', 'geo_cell'])
+        last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='city_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='geo_cell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(populate_matching_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0005_user_matching_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['-date'], name='donation_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['approved', '-date'], name='donation_approved_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['donor', 'approved', '-date'], name='donation_donor_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['-created_at'], name='request_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['status', '-created_at'], name='request_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['requester', 'status'], name='request_requester_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['requester', '-created_at'], name='request_requester_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-created_at'], name='request_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'blood_group', 'city_key'], name='user_role_group_city_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+# core.cities.normalize_city as it was when this migration was written
+def normalize_city(value):
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKC', value).casefold()
+    value = re.sub(r"[^\w\s]+", '', value)
+    return re.sub(r"\s+", ' ', value).strip()
+
+
+def populate_summary(apps, schema_editor):
+    BloodBank = apps.get_model('core', 'BloodBank')
+    BloodInventory = apps.get_model('core', 'BloodInventory')
+    InventorySummary = apps.get_model('core', 'InventorySummary')
+    banks = list(BloodBank.objects.only('id', 'city'))
+    for b in banks:
+        b.city_key = normalize_city(b.city)
+    BloodBank.objects.bulk_update(banks, ['city_key'], batch_size=1000)
+
+    rows = defaultdict(int)
+    for row in BloodInventory.objects.values('blood_group', 'blood_bank__city_key').annotate(total=Sum('units')):
+        rows[(row['blood_group'], row['blood_bank__city_key'])] += row['total']
+        rows[(row['blood_group'], '*')] += row['total']
+    InventorySummary.objects.bulk_create(
+        [InventorySummary(blood_group=g, city_key=c, units=u) for (g, c), u in rows.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodbank',
+            name='city_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city_key', models.CharField(max_length=100)),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3)),
+                ('units', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('city_key', 'blood_group')},
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
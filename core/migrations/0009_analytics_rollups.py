@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def populate_rollups(apps, schema_editor):
+    # same as core.rollups.rebuild(), against the historical models
+    tz = timezone.get_current_timezone()
+    Donation = apps.get_model('core', 'Donation')
+    DonationRequest = apps.get_model('core', 'DonationRequest')
+    User = apps.get_model('core', 'User')
+    apps.get_model('core', 'DailyDonationRollup').objects.bulk_create([
+        apps.get_model('core', 'DailyDonationRollup')(
+            day=r['day'], blood_group=r['blood_group'], blood_bank_id=r['blood_bank_id'], donations=r['n'], units=r['u'])
+        for r in Donation.objects.filter(approved=True).annotate(day=TruncDate('date', tzinfo=tz))
+        .values('day', 'blood_group', 'blood_bank_id').annotate(n=Count('id'), u=Sum('units')).order_by()
+    ], batch_size=1000)
+    apps.get_model('core', 'DailyRequestRollup').objects.bulk_create([
+        apps.get_model('core', 'DailyRequestRollup')(day=r['day'], status=r['status'], requests=r['n'])
+        for r in DonationRequest.objects.annotate(day=TruncDate('created_at', tzinfo=tz))
+        .values('day', 'status').annotate(n=Count('id')).order_by()
+    ], batch_size=1000)
+    apps.get_model('core', 'DonorRollup').objects.bulk_create([
+        apps.get_model('core', 'DonorRollup')(blood_group=r['blood_group'] or '', city_key=r['city_key'], donors=r['n'])
+        for r in User.objects.filter(role='donor').values('blood_group', 'city_key').annotate(n=Count('id')).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_inventoryreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRequestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], max_length=20)),
+                ('requests', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('day', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DonorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(blank=True, max_length=3)),
+                ('city_key', models.CharField(blank=True, max_length=100)),
+                ('donors', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('blood_group', 'city_key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyDonationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3)),
+                ('donations', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('blood_bank', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.bloodbank')),
+            ],
+            options={
+                'unique_together': {('day', 'blood_group', 'blood_bank')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
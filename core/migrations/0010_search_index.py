@@ -0,0 +1,52 @@
+from django.db import migrations, transaction
+from django.db.utils import OperationalError
+
+# table -> indexed columns; mirrors core.search.FIELDS
+INDEXED = {
+    'core_user': ('username', 'first_name', 'last_name', 'city', 'phone'),
+    'core_bloodbank': ('name', 'city'),
+    'core_donationrequest': ('city',),
+}
+
+
+def create_index(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for source, columns in INDEXED.items():
+            for column in columns:
+                schema_editor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {source}_{column}_trgm ON {source} USING gin (UPPER({column}::text) gin_trgm_ops)'
+                )
+    elif conn.vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=conn.alias):
+                for source, columns in INDEXED.items():
+                    schema_editor.execute(f"CREATE VIRTUAL TABLE {source}_search USING fts5({', '.join(columns)}, tokenize='trigram')")
+        except OperationalError:
+            return  # SQLite without FTS5 / the trigram tokenizer (3.34+): search falls back to icontains
+        # same as core.search.rebuild()
+        for source, columns in INDEXED.items():
+            values = ', '.join(f"COALESCE({c}, '')" for c in columns)
+            schema_editor.execute(f"INSERT INTO {source}_search (rowid, {', '.join(columns)}) SELECT id, {values} FROM {source}")
+
+
+def drop_index(apps, schema_editor):
+    conn = schema_editor.connection
+    for source, columns in INDEXED.items():
+        if conn.vendor == 'postgresql':
+            for column in columns:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {source}_{column}_trgm')
+        elif conn.vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS {source}_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,229 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:45
+
+import unicodedata
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+# core.cities.normalize_city as it was when this migration was written: the
+# key must not change with later edits to core.cities
+
+# canonical name, Bangla name, other spellings in use
+CITIES = [
+    # Dhaka division
+    ('Dhaka', 'ঢাকা', ('Dacca',)),
+    ('Gazipur', 'গাজীপুর', ()),
+    ('Narayanganj', 'নারায়ণগঞ্জ', ('Narayangonj',)),
+    ('Narsingdi', 'নরসিংদী', ('Narsingdhi',)),
+    ('Manikganj', 'মানিকগঞ্জ', ('Manikgonj',)),
+    ('Munshiganj', 'মুন্সীগঞ্জ', ('Munshigonj',)),
+    ('Tangail', 'টাঙ্গাইল', ()),
+    ('Kishoreganj', 'কিশোরগঞ্জ', ('Kishorgonj', 'Kishoregonj')),
+    ('Faridpur', 'ফরিদপুর', ()),
+    ('Gopalganj', 'গোপালগঞ্জ', ('Gopalgonj',)),
+    ('Madaripur', 'মাদারীপুর', ()),
+    ('Rajbari', 'রাজবাড়ী', ()),
+    ('Shariatpur', 'শরীয়তপুর', ()),
+    # Chattogram division
+    ('Chattogram', 'চট্টগ্রাম', ('Chittagong', 'Chottogram')),
+    ("Cox's Bazar", 'কক্সবাজার', ()),
+    ('Cumilla', 'কুমিল্লা', ('Comilla',)),
+    ('Feni', 'ফেনী', ()),
+    ('Noakhali', 'নোয়াখালী', ()),
+    ('Lakshmipur', 'লক্ষ্মীপুর', ('Laxmipur', 'Lakshipur')),
+    ('Chandpur', 'চাঁদপুর', ()),
+    ('Brahmanbaria', 'ব্রাহ্মণবাড়িয়া', ()),
+    ('Rangamati', 'রাঙ্গামাটি', ()),
+    ('Khagrachhari', 'খাগড়াছড়ি', ('Khagrachari',)),
+    ('Bandarban', 'বান্দরবান', ()),
+    # Rajshahi division
+    ('Rajshahi', 'রাজশাহী', ()),
+    ('Bogura', 'বগুড়া', ('Bogra',)),
+    ('Pabna', 'পাবনা', ()),
+    ('Sirajganj', 'সিরাজগঞ্জ', ('Sirajgonj',)),
+    ('Natore', 'নাটোর', ()),
+    ('Naogaon', 'নওগাঁ', ()),
+    ('Chapainawabganj', 'চাঁপাইনবাবগঞ্জ', ('Chapai Nawabganj', 'Nawabganj')),
+    ('Joypurhat', 'জয়পুরহাট', ('Jaipurhat',)),
+    # Khulna division
+    ('Khulna', 'খুলনা', ()),
+    ('Jashore', 'যশোর', ('Jessore',)),
+    ('Satkhira', 'সাতক্ষীরা', ()),
+    ('Bagerhat', 'বাগেরহাট', ()),
+    ('Kushtia', 'কুষ্টিয়া', ()),
+    ('Jhenaidah', 'ঝিনাইদহ', ('Jhenaida',)),
+    ('Magura', 'মাগুরা', ()),
+    ('Narail', 'নড়াইল', ()),
+    ('Chuadanga', 'চুয়াডাঙ্গা', ()),
+    ('Meherpur', 'মেহেরপুর', ()),
+    # Barishal division
+    ('Barishal', 'বরিশাল', ('Barisal',)),
+    ('Patuakhali', 'পটুয়াখালী', ()),
+    ('Bhola', 'ভোলা', ()),
+    ('Pirojpur', 'পিরোজপুর', ()),
+    ('Jhalokati', 'ঝালকাঠি', ('Jhalakathi', 'Jhalokathi')),
+    ('Barguna', 'বরগুনা', ()),
+    # Sylhet division
+    ('Sylhet', 'সিলেট', ()),
+    ('Moulvibazar', 'মৌলভীবাজার', ('Maulvibazar', 'Moulvi Bazar')),
+    ('Habiganj', 'হবিগঞ্জ', ('Habigonj',)),
+    ('Sunamganj', 'সুনামগঞ্জ', ('Sunamgonj',)),
+    # Rangpur division
+    ('Rangpur', 'রংপুর', ()),
+    ('Dinajpur', 'দিনাজপুর', ()),
+    ('Kurigram', 'কুড়িগ্রাম', ()),
+    ('Gaibandha', 'গাইবান্ধা', ()),
+    ('Nilphamari', 'নীলফামারী', ()),
+    ('Lalmonirhat', 'লালমনিরহাট', ()),
+    ('Thakurgaon', 'ঠাকুরগাঁও', ()),
+    ('Panchagarh', 'পঞ্চগড়', ()),
+    # Mymensingh division
+    ('Mymensingh', 'ময়মনসিংহ', ()),
+    ('Jamalpur', 'জামালপুর', ()),
+    ('Sherpur', 'শেরপুর', ()),
+    ('Netrokona', 'নেত্রকোণা', ('Netrakona',)),
+]
+
+# romanization of Bangla script
+_CONSONANTS = {
+    'ক': 'k', 'খ': 'kh', 'গ': 'g', 'ঘ': 'gh', 'ঙ': 'ng', 'চ': 'ch', 'ছ': 'chh', 'জ': 'j', 'ঝ': 'jh', 'ঞ': 'n',
+    'ট': 't', 'ঠ': 'th', 'ড': 'd', 'ঢ': 'dh', 'ণ': 'n', 'ত': 't', 'থ': 'th', 'দ': 'd', 'ধ': 'dh', 'ন': 'n',
+    'প': 'p', 'ফ': 'f', 'ব': 'b', 'ভ': 'bh', 'ম': 'm', 'য': 'j', 'র': 'r', 'ল': 'l', 'শ': 'sh', 'ষ': 'sh',
+    'স': 's', 'হ': 'h', '\u09dc': 'r', '\u09dd': 'rh', '\u09df': 'y',  # ড় ঢ় য়
+}
+_VOWELS = {'অ': 'a', 'আ': 'a', 'ই': 'i', 'ঈ': 'i', 'উ': 'u', 'ঊ': 'u', 'ঋ': 'ri', 'এ': 'e', 'ঐ': 'oi', 'ও': 'o', 'ঔ': 'ou'}
+_VOWEL_SIGNS = {'া': 'a', 'ি': 'i', 'ী': 'i', 'ু': 'u', 'ূ': 'u', 'ৃ': 'ri', 'ে': 'e', 'ৈ': 'oi', 'ো': 'o', 'ৌ': 'ou'}
+_SIGNS = {'ং': 'ng', 'ঃ': 'h', 'ঁ': '', 'ৎ': 't'}
+_HASANTA = '্'
+# NFKC splits these into letter + nukta
+_NUKTA = {'\u09a1\u09bc': '\u09dc', '\u09a2\u09bc': '\u09dd', '\u09af\u09bc': '\u09df'}
+
+
+def _clean(value):
+    """NFKC + casefold, punctuation and symbols dropped, whitespace collapsed."""
+    value = unicodedata.normalize('NFKC', value).casefold()
+    # by category, so Bangla vowel signs and hasanta (combining marks) survive
+    value = ''.join(c for c in value if unicodedata.category(c)[0] not in 'PS')
+    return ' '.join(value.split())
+
+
+def _has_bangla(value):
+    return any('ঀ' <= c <= '৿' for c in value)
+
+
+def _inherent_vowel(text, i, after_vowel):
+    """Whether the consonant at ``text[i]`` is pronounced with its inherent 'a'."""
+    nxt = text[i + 1] if i + 1 < len(text) else ''
+    if nxt in _VOWEL_SIGNS or nxt == _HASANTA:
+        return False
+    if nxt in _SIGNS:
+        return nxt != 'ৎ'
+    if nxt in _VOWELS:
+        return True
+    if nxt not in _CONSONANTS:
+        return False  # end of word
+    starts_cluster = i + 2 < len(text) and text[i + 2] == _HASANTA
+    # dropped between a vowel and a single consonant: খুলনা -> khulna
+    return i == 0 or text[i - 1] == ' ' or starts_cluster or not after_vowel
+
+
+def transliterate(value):
+    """Romanize Bangla script in ``value`` (approximately); anything else is kept."""
+    for pair, letter in _NUKTA.items():
+        value = value.replace(pair, letter)
+    out = []
+    for i, c in enumerate(value):
+        if c in _CONSONANTS:
+            after_vowel = bool(out) and out[-1][-1:] in ('a', 'e', 'i', 'o', 'u')
+            out.append(_CONSONANTS[c] + ('a' if _inherent_vowel(value, i, after_vowel) else ''))
+        elif c in _VOWEL_SIGNS:
+            out.append(_VOWEL_SIGNS[c])
+        elif c in _VOWELS:
+            out.append(_VOWELS[c])
+        elif c in _SIGNS:
+            out.append(_SIGNS[c])
+        elif c == _HASANTA:
+            pass
+        elif c.isdigit():
+            out.append(str(unicodedata.digit(c)))  # ০-৯
+        else:
+            out.append(c)
+    return ''.join(out)
+
+
+def _build_index():
+    index = {}
+    for name, bangla, spellings in CITIES:
+        key = _clean(name)
+        for variant in (name, bangla, transliterate(_clean(bangla)), *spellings):
+            variant = _clean(variant)
+            index[variant] = index[variant.replace(' ', '')] = key
+    return index
+
+
+# every known spelling (and its spaceless form) -> canonical key
+_INDEX = _build_index()
+
+
+def normalize_city(value: str) -> str:
+    """
+    Reduce a free-text city to a key that can be compared with ``=``.
+    - unicode NFKC + casefold, so 'DHAKA' and 'Dhaka' collapse
+    - punctuation dropped and whitespace collapsed ("Cox's  Bazar" -> "coxs bazar")
+    - known cities in any listed spelling or in Bangla -> their canonical key
+      ('Chittagong', 'চট্টগ্রাম' -> 'chattogram')
+    - other Bangla romanized
+    """
+    if not value:
+        return ''
+    key = _clean(value)
+    if _has_bangla(key):
+        key = _INDEX.get(key) or _clean(transliterate(key))
+    return _INDEX.get(key) or _INDEX.get(key.replace(' ', '')) or key
+
+
+def rekey_cities(apps, schema_editor):
+    # normalize_city now maps spellings and Bangla names to one key: recompute
+    # every stored key, then the tables grouped by it
+    for name in ('User', 'BloodBank', 'DonationRequest'):
+        model = apps.get_model('core', name)
+        qs = model.objects.only('id', 'city', 'city_key').order_by('pk')
+        last = 0
+        while batch := list(qs.filter(pk__gt=last)[:1000]):
+            changed = [o for o in batch if o.city_key != normalize_city(o.city)]
+            for o in changed:
+                o.city_key = normalize_city(o.city)
+            model.objects.bulk_update(changed, ['city_key'])
+            last = batch[-1].pk
+
+    InventorySummary = apps.get_model('core', 'InventorySummary')
+    InventorySummary.objects.exclude(city_key='*').delete()
+    InventorySummary.objects.bulk_create([
+        InventorySummary(blood_group=r['blood_group'], city_key=r['blood_bank__city_key'], units=r['total'])
+        for r in apps.get_model('core', 'BloodInventory').objects
+        .values('blood_group', 'blood_bank__city_key').annotate(total=Sum('units')).order_by()
+    ], batch_size=1000)
+
+    DonorRollup = apps.get_model('core', 'DonorRollup')
+    DonorRollup.objects.all().delete()
+    DonorRollup.objects.bulk_create([
+        DonorRollup(blood_group=r['blood_group'] or '', city_key=r['city_key'], donors=r['n'])
+        for r in apps.get_model('core', 'User').objects.filter(role='donor')
+        .values('blood_group', 'city_key').annotate(n=Count('id')).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donationrequest',
+            name='city_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(rekey_cities, migrations.RunPython.noop),
+    ]
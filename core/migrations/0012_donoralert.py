@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_city_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonorAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('from_email', models.CharField(blank=True, max_length=254)),
+                ('cursor', models.TextField(blank=True)),
+                ('queued', models.PositiveIntegerField(default=0)),
+                ('done', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='donor_alerts', to='core.donationrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['done', 'id'], name='core_donora_done_426e02_idx')],
+            },
+        ),
+    ]
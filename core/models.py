@@ -1,6 +1,11 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
+from .cities import normalize_city
+from .matching import geo_cell
+
 BLOOD_GROUPS = [('A+','A+'),('A-','A-'),('B+','B+'),('B-','B-'),('AB+','AB+'),('AB-','AB-'),('O+','O+'),('O-','O-')]
 ROLE_CHOICES = [('admin','Admin'),('donor','Donor'),('hospital','Hospital')]
 
@@ -13,15 +18,61 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     # track whether user has confirmed their email address
     email_confirmed = models.BooleanField(default=False)
+    # matching index (see core.matching): normalized city and optional location bucket
+    city_key = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geo_cell = models.CharField(max_length=32, blank=True, db_index=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so signals can keep the donor rollup in step
+        loaded = dict(zip(field_names, values))
+        if {'role', 'blood_group', 'city_key'} <= loaded.keys():
+            instance._loaded_donor_key = (loaded['role'], loaded['blood_group'], loaded['city_key'])
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.city_key = normalize_city(self.city)
+        self.geo_cell = geo_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ({'city', 'latitude', 'longitude'} & set(update_fields)):
+            kwargs['update_fields'] = set(update_fields) | {'city_key', 'geo_cell'}
+        super().save(*args, **kwargs)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # donor matching (core.matching): each rank bucket is read in username order
+            models.Index(fields=['role','blood_group','city_key','username'], name='user_group_city_name_idx'),
+            models.Index(fields=['role','blood_group','geo_cell','username'], name='user_group_cell_name_idx'),
+            models.Index(fields=['role','blood_group','username'], name='user_group_name_idx'),
+        ]
 
 class BloodBank(models.Model):
     name = models.CharField(max_length=255)
     city = models.CharField(max_length=100)
     address = models.TextField(blank=True)
     contact = models.CharField(max_length=50, blank=True)
+    city_key = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
     def __str__(self):
         return f"{self.name} ({self.city})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so signals can tell when a bank moves city
+        if 'city_key' in field_names:
+            instance._loaded_city_key = values[field_names.index('city_key')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.city_key = normalize_city(self.city)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'city' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'city_key'}
+        super().save(*args, **kwargs)
+
 class BloodInventory(models.Model):
     blood_bank = models.ForeignKey(BloodBank, on_delete=models.CASCADE, related_name='inventory')
     blood_group = models.CharField(max_length=3, choices=BLOOD_GROUPS)
@@ -29,6 +80,28 @@ class BloodInventory(models.Model):
     class Meta:
         unique_together = ('blood_bank','blood_group')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so signals can apply the delta to InventorySummary
+        loaded = dict(zip(field_names, values))
+        if {'blood_bank_id', 'blood_group', 'units'} <= loaded.keys():
+            instance._loaded = (loaded['blood_bank_id'], loaded['blood_group'], loaded['units'])
+        return instance
+
+class InventorySummary(models.Model):
+    """
+    Units per blood group, nationwide (city_key == ALL) and per city.
+    Maintained incrementally from BloodInventory changes by core.inventory;
+    per-bank figures are the BloodInventory rows themselves.
+    """
+    ALL = '*'
+    city_key = models.CharField(max_length=100)
+    blood_group = models.CharField(max_length=3, choices=BLOOD_GROUPS)
+    units = models.IntegerField(default=0)
+    class Meta:
+        unique_together = ('city_key','blood_group')
+
 class DonationRequest(models.Model):
     STATUS_CHOICES = [('pending','Pending'),('approved','Approved'),('rejected','Rejected')]
     requester = models.ForeignKey(User, on_delete=models.CASCADE, related_name='requests')
@@ -38,6 +111,42 @@ class DonationRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     approved_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='approved_requests')
+    # normalized city (core.cities), for exact indexed city filters
+    city_key = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so signals can keep the daily rollup in step
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.city_key = normalize_city(self.city)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'city' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'city_key'}
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='request_created_idx'),
+            models.Index(fields=['status','-created_at'], name='request_status_created_idx'),
+            # "already has a pending request" check and per-user listings
+            models.Index(fields=['requester','status'], name='request_requester_status_idx'),
+            models.Index(fields=['requester','-created_at'], name='request_requester_created_idx'),
+            # the pending queue is small compared to the full history
+            models.Index(fields=['-created_at'], condition=Q(status='pending'), name='request_pending_idx'),
+        ]
+
+class InventoryReservation(models.Model):
+    """Units taken from a bank's inventory to fulfil an approved request."""
+    request = models.ForeignKey(DonationRequest, on_delete=models.CASCADE, related_name='reservations')
+    blood_bank = models.ForeignKey(BloodBank, on_delete=models.SET_NULL, null=True, related_name='reservations')
+    blood_group = models.CharField(max_length=3, choices=BLOOD_GROUPS)
+    units = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
 
 class Donation(models.Model):
     donor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='donations')
@@ -47,3 +156,93 @@ class Donation(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     approved = models.BooleanField(default=False)
     approved_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='donation_approvals')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so signals can keep the daily rollup in step
+        loaded = dict(zip(field_names, values))
+        keys = ('approved', 'date', 'blood_group', 'blood_bank_id', 'units')
+        if set(keys) <= loaded.keys():
+            instance._loaded_rollup_key = tuple(loaded[k] for k in keys)
+        return instance
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date'], name='donation_date_idx'),
+            models.Index(fields=['approved','-date'], name='donation_approved_date_idx'),
+            models.Index(fields=['donor','approved','-date'], name='donation_donor_approved_idx'),
+        ]
+
+# Analytics rollups, maintained incrementally by core.rollups
+
+class DailyDonationRollup(models.Model):
+    """Approved donations per local day, blood group and bank."""
+    day = models.DateField()
+    blood_group = models.CharField(max_length=3, choices=BLOOD_GROUPS)
+    blood_bank = models.ForeignKey(BloodBank, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    donations = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    class Meta:
+        unique_together = ('day','blood_group','blood_bank')
+
+class DailyRequestRollup(models.Model):
+    """Requests per local day of creation and current status."""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=DonationRequest.STATUS_CHOICES)
+    requests = models.IntegerField(default=0)
+    class Meta:
+        unique_together = ('day','status')
+
+class DonorRollup(models.Model):
+    """Donors per blood group ('' when unknown) and city."""
+    blood_group = models.CharField(max_length=3, blank=True)
+    city_key = models.CharField(max_length=100, blank=True)
+    donors = models.IntegerField(default=0)
+    class Meta:
+        unique_together = ('blood_group','city_key')
+
+class OutboundEmail(models.Model):
+    """A queued email, delivered out of band by the ``process_mail_queue`` command."""
+    STATUS_CHOICES = [('pending','Pending'),('sending','Sending'),('sent','Sent'),('dead','Dead')]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    # comma separated list of addresses
+    recipients = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status','next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipients[:50]}"
+
+
+class DonorAlert(models.Model):
+    """
+    A donor alert waiting to be fanned out. The request path queues one of
+    these; ``process_mail_queue`` expands it into one OutboundEmail per donor,
+    a chunk at a time, remembering where it stopped in ``cursor``.
+    """
+    request = models.ForeignKey(DonationRequest, on_delete=models.CASCADE, related_name='donor_alerts')
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    # keyset cursor (core.pagination) after the last donor queued
+    cursor = models.TextField(blank=True)
+    queued = models.PositiveIntegerField(default=0)
+    done = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['done', 'id'])]
+
+    def __str__(self):
+        return f"{self.subject} ({self.queued} queued)"
@@ -0,0 +1,57 @@
+"""Donor alerts for new requests.
+
+``alert_donors`` only records a ``DonorAlert``, so creating a request costs one
+insert however many donors match. ``process_mail_queue`` calls
+``expand_alerts``, which walks the matching donors with a keyset cursor and
+queues one message per donor, a chunk per call, same-city donors first.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .conf import setting
+from .mailqueue import fan_out
+from .matching import matching_donors
+from .models import DonorAlert
+from .pagination import keyset_page
+
+
+def _chunk_size():
+    return setting('DONOR_ALERT_CHUNK_SIZE', 1000)
+
+
+def donor_alert_recipients(dr):
+    """Compatible donors with an address, in alert order (same city first)."""
+    return matching_donors(dr.blood_group, dr.city).exclude(email='').only('username', 'email')
+
+
+def alert_donors(dr, body):
+    """Queue a donor alert for a new request; its messages are written by ``expand_alerts``."""
+    return DonorAlert.objects.create(
+        request=dr,
+        subject=f"Donor Alert: {dr.blood_group} needed"[:255],
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def expand_alerts(chunk_size=None):
+    """
+    Queue the next chunk of recipients of the oldest unfinished alert.
+    Returns ``(alert, messages queued)``, or ``(None, 0)`` when no alert is waiting.
+    """
+    chunk_size = chunk_size or _chunk_size()
+    with transaction.atomic():
+        qs = DonorAlert.objects.filter(done=False).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        alert = qs.first()
+        if alert is None:
+            return None, 0
+        page = keyset_page(donor_alert_recipients(alert.request), after=alert.cursor or None, size=chunk_size)
+        result = fan_out(alert.subject, alert.body, (donor.email for donor in page), alert.from_email,
+                         chunk_size=chunk_size)
+        alert.queued += result.recipients
+        alert.cursor = page.next_cursor or ''
+        alert.done = page.next_cursor is None
+        alert.save(update_fields=['queued', 'cursor', 'done'])
+    return alert, result.recipients
@@ -0,0 +1,160 @@
+"""Keyset (cursor) pagination.
+
+Pages are selected with ``WHERE (ordering columns) > (last row seen)`` rather
+than ``OFFSET``, so every page costs the same as the first one as long as the
+ordering is backed by an index. No ``COUNT(*)`` is issued unless the client
+asks for one, and even then it is capped (see ``approximate_count``).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+COUNT_CAP = getattr(settings, 'PAGINATION_COUNT_CAP', 10000)
+
+
+def approximate_count(queryset, cap=None):
+    """
+    Count rows, but never scan more than ``cap`` of them.
+    Returns ``(count, is_estimate)``. On PostgreSQL an unfiltered table uses the
+    planner's row estimate instead.
+    """
+    if hasattr(queryset, 'approximate_count'):
+        return queryset.approximate_count(cap)  # e.g. core.matching.DonorMatches
+    cap = cap or COUNT_CAP
+    query = queryset.query
+    if connections[queryset.db].vendor == 'postgresql' and not query.where:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > cap:
+            return row[0], True
+    n = queryset.order_by()[:cap + 1].count()
+    return (cap, True) if n > cap else (n, False)
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination for the API viewsets; add ``?count=1`` for a (capped) total."""
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get('count') in ('1', 'true'):
+            self.count = approximate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            body['count'], body['count_is_estimate'] = self.count
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {'type': 'integer', 'nullable': True}
+        schema['properties']['count_is_estimate'] = {'type': 'boolean', 'nullable': True}
+        return schema
+
+
+class CreatedAtPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class DatePagination(KeysetPagination):
+    ordering = ('-date', '-id')
+
+
+class UsernamePagination(KeysetPagination):
+    ordering = 'username'
+
+
+def _seek(fields, values, backwards, descending=()):
+    """``(f1, f2, ...) > (v1, v2, ...)`` (or ``<``) spelled out for the ORM; descending fields compare the other way."""
+    q = Q()
+    for i, field in enumerate(fields):
+        op = 'lt' if backwards != (field in descending) else 'gt'
+        cond = Q(**{f'{field}__{op}': values[i]})
+        for j in range(i):
+            cond &= Q(**{fields[j]: values[j]})
+        q |= cond
+    return q
+
+
+def encode_cursor(values):
+    return signing.dumps(list(values), salt='keyset', compress=True)
+
+
+def decode_cursor(cursor):
+    try:
+        return signing.loads(cursor, salt='keyset')
+    except signing.BadSignature:
+        return None
+
+
+class KeysetPage(list):
+    next_cursor = None
+    previous_cursor = None
+
+
+def _keyset_query(queryset, after, before, size):
+    """The slice to fetch for a keyset page, and what ``_keyset_result`` needs to finish it."""
+    ordering = [f for f in queryset.query.order_by if isinstance(f, str)]
+    if len(ordering) != len(queryset.query.order_by):
+        raise ValueError('keyset_page needs an order_by of plain names')
+    fields = [f.lstrip('-') for f in ordering]
+    descending = {f[1:] for f in ordering if f.startswith('-')}
+
+    backwards = seeked = False
+    if after and (values := decode_cursor(after)) and len(values) == len(fields):
+        queryset = queryset.filter(_seek(fields, values, False, descending))
+        seeked = True
+    elif before and (values := decode_cursor(before)) and len(values) == len(fields):
+        queryset = queryset.filter(_seek(fields, values, True, descending)).reverse()
+        backwards = seeked = True
+    return queryset[:size + 1], (fields, size, backwards, seeked)
+
+
+def _keyset_result(rows, state):
+    fields, size, backwards, seeked = state
+    more = len(rows) > size
+    rows = rows[:size]
+    if backwards:
+        rows.reverse()
+
+    page = KeysetPage(rows)
+    if rows:
+        # going forwards there is a previous page if we started from a cursor,
+        # going backwards there is always a next page
+        has_next, has_previous = (seeked, more) if backwards else (more, seeked)
+        if has_next:
+            page.next_cursor = encode_cursor(getattr(rows[-1], f) for f in fields)
+        if has_previous:
+            page.previous_cursor = encode_cursor(getattr(rows[0], f) for f in fields)
+    return page
+
+
+def keyset_page(queryset, after=None, before=None, size=20):
+    """
+    One page of ``queryset`` after (or before) a cursor from a previous page.
+
+    The queryset's ``order_by`` must be field or annotation names (``-`` for
+    descending) ending with a unique column, and the values must survive JSON.
+    """
+    if hasattr(queryset, 'keyset_page'):
+        return queryset.keyset_page(after, before, size)  # pages itself, e.g. core.matching.DonorMatches
+    query, state = _keyset_query(queryset, after, before, size)
+    return _keyset_result(list(query), state)
+
+
+async def akeyset_page(queryset, after=None, before=None, size=20):
+    """``keyset_page`` for async views."""
+    if hasattr(queryset, 'keyset_page'):
+        return await sync_to_async(queryset.keyset_page)(after, before, size)
+    query, state = _keyset_query(queryset, after, before, size)
+    return _keyset_result([row async for row in query], state)
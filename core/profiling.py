@@ -0,0 +1,173 @@
+"""Per-request performance instrumentation.
+
+``PerformanceMiddleware`` times every request and, through
+``connection.execute_wrapper``, every SQL statement the request runs. Each
+request becomes a sample for its view: wall time, query count, SQL time,
+duplicate queries (the same statement with the same parameters run more than
+once) and the slowest statement. ``view_stats`` aggregates the recent samples
+into percentiles for the ``admin/perf/`` endpoint.
+
+Samples live in memory, per process, in a bounded window per view. When
+``PERF_TRACE_SAMPLE_RATE`` is set, a fraction of requests (and every request
+slower than ``PERF_SLOW_REQUEST_MS``) is also written as a JSON trace to the
+``core.perf`` logger; settings.py points that logger at ``PERF_TRACE_FILE``.
+
+Streaming responses are timed until the view returns, not until the last
+chunk is sent. Under ASGI the middleware runs async. The statement hooks then
+go on the connections of the request's database thread, which is where Django
+runs the ORM calls of async views too.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .conf import setting, view_name
+
+logger = logging.getLogger('core.perf')
+
+
+_lock = threading.Lock()
+# view -> recent samples: (wall ms, queries, sql ms, duplicates, slowest ms, slowest sql)
+_samples = defaultdict(lambda: deque(maxlen=setting('PERF_SAMPLE_SIZE', 1000)))
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook that times each statement."""
+
+    def __init__(self):
+        self.queries = []  # (sql, ms)
+        self.seen = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+            try:
+                self.seen[(sql, repr(params))] += 1
+            except Exception:  # unprintable params: count the statement alone
+                self.seen[(sql, None)] += 1
+
+    @property
+    def sql_ms(self):
+        return sum(ms for _, ms in self.queries)
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self.seen.values())
+
+    @property
+    def slowest(self):
+        return max(self.queries, key=lambda q: q[1], default=(None, 0.0))
+
+
+def record(view, wall_ms, recorder):
+    sql, ms = recorder.slowest
+    sample = (wall_ms, len(recorder.queries), recorder.sql_ms, recorder.duplicates, ms, sql)
+    with _lock:
+        _samples[view].append(sample)
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def view_stats():
+    """``{view: {...}}`` over the samples currently held, slowest p95 first."""
+    with _lock:
+        snapshot = {view: list(samples) for view, samples in _samples.items()}
+    stats = {}
+    for view, samples in snapshot.items():
+        walls = sorted(s[0] for s in samples)
+        slowest = max(samples, key=lambda s: s[4])
+        stats[view] = {
+            'requests': len(samples),
+            'p50_ms': round(_percentile(walls, 50), 2),
+            'p95_ms': round(_percentile(walls, 95), 2),
+            'p99_ms': round(_percentile(walls, 99), 2),
+            'max_ms': round(walls[-1], 2),
+            'avg_queries': round(sum(s[1] for s in samples) / len(samples), 1),
+            'max_queries': max(s[1] for s in samples),
+            'avg_sql_ms': round(sum(s[2] for s in samples) / len(samples), 2),
+            'max_duplicates': max(s[3] for s in samples),
+            'slowest_query_ms': round(slowest[4], 2),
+            'slowest_query': (slowest[5] or '')[:500],
+        }
+    return dict(sorted(stats.items(), key=lambda item: -item[1]['p95_ms']))
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+def _install(stack, recorder):
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(recorder))
+
+
+class PerformanceMiddleware:
+    """Records wall time and SQL work per view; see the module docstring."""
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        if not setting('PERF_INSTRUMENTATION', True):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            _install(stack, recorder)
+            response = self.get_response(request)
+        return self.finish(request, response, started, recorder)
+
+    async def _acall(self, request):
+        if not setting('PERF_INSTRUMENTATION', True):
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(_install)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, started, recorder)
+
+    def finish(self, request, response, started, recorder):
+        wall_ms = (time.perf_counter() - started) * 1000
+        view = view_name(request)
+        record(view, wall_ms, recorder)
+
+        if setting('PERF_SERVER_TIMING', settings.DEBUG):
+            response['Server-Timing'] = f'app;dur={wall_ms:.1f}, db;dur={recorder.sql_ms:.1f};desc="{len(recorder.queries)} queries"'
+        rate = setting('PERF_TRACE_SAMPLE_RATE', 0.0)
+        slow = setting('PERF_SLOW_REQUEST_MS', None)
+        if (rate and random.random() < rate) or (slow is not None and wall_ms >= slow):
+            self.trace(request, response, view, wall_ms, recorder)
+        return response
+
+    def trace(self, request, response, view, wall_ms, recorder):
+        logger.info(json.dumps({
+            'view': view, 'method': request.method, 'path': request.path, 'status': response.status_code,
+            'wall_ms': round(wall_ms, 2), 'sql_ms': round(recorder.sql_ms, 2),
+            'queries': len(recorder.queries), 'duplicates': recorder.duplicates,
+            'sql': [{'sql': sql[:1000], 'ms': round(ms, 2)} for sql, ms in recorder.queries[:50]],
+        }))
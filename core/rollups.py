@@ -0,0 +1,125 @@
+"""Daily analytics rollups.
+
+The analytics dashboard reads only these tables. They are updated
+incrementally: model saves and deletes go through ``core.signals``, and code
+that changes rows with ``QuerySet.update`` (approvals in ``core.allocation``)
+calls the functions here itself. ``manage.py backfill_rollups`` rebuilds
+everything from the source tables.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyDonationRollup, DailyRequestRollup, Donation, DonationRequest, DonorRollup
+
+
+def _day(dt):
+    return timezone.localdate(dt) if timezone.is_aware(dt) else dt.date()
+
+
+def _bump(model, lookup, **deltas):
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    updated = model.objects.filter(**lookup).update(**{k: F(k) + v for k, v in deltas.items()})
+    if not updated:
+        obj, created = model.objects.get_or_create(**lookup, defaults=deltas)
+        if not created:
+            model.objects.filter(pk=obj.pk).update(**{k: F(k) + v for k, v in deltas.items()})
+
+
+def add_donations(rows, sign=1):
+    """Count approved donations given as ``(date, blood_group, blood_bank_id, units)``."""
+    totals = defaultdict(lambda: [0, 0])
+    for date, group, bank_id, units in rows:
+        key = (_day(date), group, bank_id)
+        totals[key][0] += sign
+        totals[key][1] += sign * units
+    with transaction.atomic():
+        for (day, group, bank_id), (count, units) in totals.items():
+            _bump(DailyDonationRollup, {'day': day, 'blood_group': group, 'blood_bank_id': bank_id},
+                  donations=count, units=units)
+
+
+def move_requests(changes):
+    """Apply ``(created_at, old_status, new_status)`` changes; None means created / deleted."""
+    totals = defaultdict(int)
+    for created_at, old, new in changes:
+        day = _day(created_at)
+        if old:
+            totals[(day, old)] -= 1
+        if new:
+            totals[(day, new)] += 1
+    with transaction.atomic():
+        for (day, status), delta in totals.items():
+            _bump(DailyRequestRollup, {'day': day, 'status': status}, requests=delta)
+
+
+def move_donor(old_key, new_key):
+    """Move one donor between ``(blood_group, city_key)`` buckets; None means not a donor."""
+    if old_key == new_key:
+        return
+    with transaction.atomic():
+        if old_key:
+            _bump(DonorRollup, {'blood_group': old_key[0] or '', 'city_key': old_key[1] or ''}, donors=-1)
+        if new_key:
+            _bump(DonorRollup, {'blood_group': new_key[0] or '', 'city_key': new_key[1] or ''}, donors=1)
+
+
+def rebuild():
+    """Recompute every rollup from the source tables."""
+    tz = timezone.get_current_timezone()
+    with transaction.atomic():
+        DailyDonationRollup.objects.all().delete()
+        DailyDonationRollup.objects.bulk_create([
+            DailyDonationRollup(day=r['day'], blood_group=r['blood_group'], blood_bank_id=r['blood_bank_id'],
+                                donations=r['n'], units=r['u'])
+            for r in Donation.objects.filter(approved=True)
+            .annotate(day=TruncDate('date', tzinfo=tz))
+            .values('day', 'blood_group', 'blood_bank_id').annotate(n=Count('id'), u=Sum('units')).order_by()
+        ], batch_size=1000)
+
+        DailyRequestRollup.objects.all().delete()
+        DailyRequestRollup.objects.bulk_create([
+            DailyRequestRollup(day=r['day'], status=r['status'], requests=r['n'])
+            for r in DonationRequest.objects.annotate(day=TruncDate('created_at', tzinfo=tz))
+            .values('day', 'status').annotate(n=Count('id')).order_by()
+        ], batch_size=1000)
+
+        rebuild_donors()
+
+
+def rebuild_donors():
+    """Recompute the donor buckets only (after a bulk donor import)."""
+    User = get_user_model()
+    with transaction.atomic():
+        DonorRollup.objects.all().delete()
+        DonorRollup.objects.bulk_create([
+            DonorRollup(blood_group=r['blood_group'] or '', city_key=r['city_key'], donors=r['n'])
+            for r in User.objects.filter(role='donor').values('blood_group', 'city_key').annotate(n=Count('id')).order_by()
+        ], batch_size=1000)
+
+
+# readers used by the analytics dashboard
+
+def donation_trend(days=30):
+    since = timezone.localdate() - timedelta(days=days)
+    return list(
+        DailyDonationRollup.objects.filter(day__gte=since)
+        .values('day').annotate(count=Sum('donations')).order_by('day')
+    )
+
+
+def donor_distribution():
+    return list(DonorRollup.objects.values('blood_group').annotate(count=Sum('donors'))
+                .filter(count__gt=0).order_by('blood_group'))
+
+
+def request_status_totals():
+    return list(DailyRequestRollup.objects.values('status').annotate(count=Sum('requests'))
+                .filter(count__gt=0).order_by('status'))
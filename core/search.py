@@ -0,0 +1,224 @@
+"""Search index for free-text lookups: the API's ``?search=`` and donor search's ``q``.
+
+Indexed columns (``FIELDS``): user name, city and phone, bank name and city,
+and request city. Searches on other columns fall back to ``icontains``.
+
+Backends, picked from the database connection:
+
+* SQLite: one FTS5 table per model (``core_user_search`` and so on) using the
+  trigram tokenizer, with rowid = the row's pk. ``core.signals`` keeps them in
+  step. Bulk writers call ``index`` or ``rebuild`` themselves, and
+  ``manage.py rebuild_search_index`` rebuilds them all.
+* PostgreSQL: migration 0010 adds pg_trgm GIN indexes on ``UPPER(column)``,
+  which is exactly what ``icontains`` queries, so nothing else has to stay in
+  sync.
+* Anything else, or SQLite built without FTS5: plain ``icontains``.
+
+Every term of three or more characters matches as a case-insensitive
+substring. If no row matches a term that way, rows that contain a
+trigram-similar word match instead, so "dhakka" still finds Dhaka. On SQLite
+the threshold is ``SEARCH_SIMILARITY``; PostgreSQL uses pg_trgm's own word
+similarity threshold. Shorter terms use ``icontains``.
+"""
+import operator
+import re
+import unicodedata
+from functools import reduce
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import CharField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Upper
+from rest_framework.filters import SearchFilter
+
+from .conf import setting
+from .models import BloodBank, DonationRequest
+
+User = get_user_model()
+
+# model -> indexed columns
+FIELDS = {
+    User: ('username', 'first_name', 'last_name', 'city', 'phone'),
+    BloodBank: ('name', 'city'),
+    DonationRequest: ('city',),
+}
+MIN_TERM = 3  # trigram indexes cannot answer shorter terms
+_WORD = re.compile(r'\w+', re.UNICODE)
+_backends = {}
+
+
+def table(model):
+    return f'{model._meta.db_table}_search'
+
+
+def backend(using=DEFAULT_DB_ALIAS):
+    """'fts5', 'trigram' or 'like'."""
+    if using not in _backends:
+        conn = connections[using]
+        if conn.vendor == 'postgresql':
+            _backends[using] = 'trigram'
+        elif conn.vendor == 'sqlite' and table(User) in conn.introspection.table_names():
+            _backends[using] = 'fts5'
+        else:
+            # not remembered on SQLite: the tables may just not be migrated yet
+            return 'like'
+    return _backends[using]
+
+
+# keeping the FTS5 tables in step
+
+def _row(obj):
+    return [obj.pk] + [getattr(obj, f) or '' for f in FIELDS[type(obj)]]
+
+
+def index(objs):
+    """(Re)index saved instances of one model; a no-op unless the backend is FTS5."""
+    objs = list(objs)
+    if not objs or backend() != 'fts5':
+        return
+    model = type(objs[0])
+    if any(obj.pk is None for obj in objs):  # bulk_create could not return pks
+        return rebuild(model)
+    columns = FIELDS[model]
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {table(model)} WHERE rowid = %s', [[obj.pk] for obj in objs])
+        cursor.executemany(
+            f'INSERT INTO {table(model)} (rowid, {", ".join(columns)}) VALUES ({", ".join(["%s"] * (len(columns) + 1))})',
+            [_row(obj) for obj in objs],
+        )
+
+
+def unindex(model, pks):
+    if backend() != 'fts5':
+        return
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {table(model)} WHERE rowid = %s', [[pk] for pk in pks])
+
+
+def rebuild(*models):
+    """Refill the FTS5 tables for ``models`` (all of them by default) from the source tables."""
+    if backend() != 'fts5':
+        return
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        for model in models or FIELDS:
+            columns = FIELDS[model]
+            cursor.execute(f'DELETE FROM {table(model)}')
+            values = ', '.join(f"COALESCE({c}, '')" for c in columns)
+            cursor.execute(f'INSERT INTO {table(model)} (rowid, {", ".join(columns)}) '
+                           f'SELECT {model._meta.pk.column}, {values} FROM {model._meta.db_table}')
+
+
+# matching
+
+def _trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    """pg_trgm-style similarity of two words: shared trigrams over all trigrams."""
+    x, y = _trigrams(a), _trigrams(b)
+    return len(x & y) / len(x | y) if x | y else 0.0
+
+
+def _words(value):
+    return _WORD.findall(unicodedata.normalize('NFKC', value).casefold())
+
+
+def _phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _fts5_exact(model, columns, term):
+    query = '{%s} : %s' % (' '.join(columns), _phrase(term))
+    return RawSQL(f'SELECT rowid FROM {table(model)} WHERE {table(model)} MATCH %s', [query])
+
+
+def _fts5_similar(model, columns, term):
+    # candidates share at least one trigram; the best ranked are checked word by word
+    word = term.casefold()
+    grams = {word[i:i + 3] for i in range(len(word) - 2)}
+    query = '{%s} : (%s)' % (' '.join(columns), ' OR '.join(_phrase(g) for g in sorted(grams)))
+    threshold = setting('SEARCH_SIMILARITY', 0.3)
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, {", ".join(columns)} FROM {table(model)} WHERE {table(model)} MATCH %s ORDER BY rank LIMIT %s',
+            [query, setting('SEARCH_CANDIDATES', 200)],
+        )
+        return [pk for pk, *values in cursor.fetchall()
+                if any(similarity(word, w) >= threshold for v in values for w in _words(v))]
+
+
+def register_lookups():
+    """Add ``__trigram_word_similar`` to CharField when a PostgreSQL database is configured (``CoreConfig.ready``)."""
+    if any(connections[alias].vendor == 'postgresql' for alias in connections):
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+
+        CharField.register_lookup(TrigramWordSimilar)
+
+
+def _trigram_similar(model, columns, term):
+    # compared upper-cased so the GIN indexes on UPPER(column) apply
+    upper = {f'_search_{c}': Upper(c) for c in columns}
+    return model.objects.alias(**upper).filter(
+        reduce(operator.or_, [Q(**{f'{name}__trigram_word_similar': term.upper()}) for name in upper])
+    ).values('pk')
+
+
+def _groups(model, fields):
+    """``(prefix, related model, [column])`` per relation the search fields go through."""
+    groups = {}
+    for path in fields:
+        *relations, column = path.split('__')
+        target = model
+        for name in relations:
+            target = target._meta.get_field(name).related_model
+        prefix = ''.join(f'{name}__' for name in relations)
+        groups.setdefault((prefix, target), []).append(column)
+    return [(prefix, target, columns) for (prefix, target), columns in groups.items()]
+
+
+def _term_q(model, fields, term, fuzzy=False):
+    kind = backend() if len(term) >= MIN_TERM else 'like'
+    conditions = []
+    for prefix, target, columns in _groups(model, fields):
+        indexed = [c for c in columns if c in FIELDS.get(target, ())] if kind != 'like' else []
+        if fuzzy:
+            if indexed:
+                ids = _fts5_similar(target, indexed, term) if kind == 'fts5' else _trigram_similar(target, indexed, term)
+                conditions.append(Q(**{f'{prefix}pk__in': ids}))
+            continue
+        # on PostgreSQL icontains itself uses the trigram indexes
+        conditions += [Q(**{f'{prefix}{c}__icontains': term}) for c in columns if c not in indexed or kind == 'trigram']
+        if indexed and kind == 'fts5':
+            conditions.append(Q(**{f'{prefix}pk__in': _fts5_exact(target, indexed, term)}))
+    return reduce(operator.or_, conditions) if conditions else None
+
+
+def filter_queryset(qs, terms, fields):
+    """
+    Rows of ``qs`` where every term matches at least one of ``fields`` (field
+    names or ``relation__field`` paths), the way DRF's ``SearchFilter`` does.
+    """
+    for term in terms:
+        condition = _term_q(qs.model, fields, term)
+        if condition is None:
+            continue
+        if backend() != 'like' and len(term) >= MIN_TERM and not qs.filter(condition).exists():
+            condition = _term_q(qs.model, fields, term, fuzzy=True) or condition
+        qs = qs.filter(condition)
+    return qs
+
+
+class IndexedSearchFilter(SearchFilter):
+    """``SearchFilter`` answered from the search index; prefixed fields ('^name') behave as before."""
+
+    def filter_queryset(self, request, queryset, view):
+        fields = self.get_search_fields(view, request)
+        terms = self.get_search_terms(request)
+        if not fields or not terms:
+            return queryset
+        if any(f[0] in self.lookup_prefixes for f in fields):
+            return super().filter_queryset(request, queryset, view)
+        return filter_queryset(queryset, terms, fields)
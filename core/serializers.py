@@ -8,7 +8,7 @@ class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=6)
     class Meta:
         model = User
-        fields = ('id','username','email','password','first_name','last_name','role','phone','city','blood_group','profile_photo')
+        fields = ('id','username','email','password','first_name','last_name','role','phone','city','blood_group','profile_photo','latitude','longitude')
     def create(self, validated_data):
         password = validated_data.pop('password')
         user = User(**validated_data)
@@ -0,0 +1,160 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import allocation, caching, inventory, live, metrics, rollups, search
+from .models import BloodBank, BloodInventory, Donation, DonationRequest
+
+User = get_user_model()
+
+
+def _city_key_for(instance):
+    # use the cached bank when the caller already loaded it
+    if BloodInventory.blood_bank.is_cached(instance):
+        return instance.blood_bank.city_key
+    return inventory.bank_city_key(instance.blood_bank_id)
+
+
+@receiver(post_save, sender=BloodInventory)
+def inventory_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = defaultdict(int)
+    old_bank, old_group, old_units = getattr(instance, '_loaded', (None, None, None))
+    city_key = _city_key_for(instance)
+    if not created and old_group is not None:
+        old_city = city_key if old_bank == instance.blood_bank_id else inventory.bank_city_key(old_bank)
+        deltas[(old_group, old_city)] -= old_units or 0
+    deltas[(instance.blood_group, city_key)] += instance.units
+    inventory.apply_deltas(deltas)
+    instance._loaded = (instance.blood_bank_id, instance.blood_group, instance.units)
+
+
+@receiver(post_delete, sender=BloodInventory)
+def inventory_deleted(sender, instance, **kwargs):
+    bank_id, group, units = getattr(instance, '_loaded', (instance.blood_bank_id, instance.blood_group, instance.units))
+    inventory.apply_deltas({(group, inventory.bank_city_key(bank_id)): -(units or 0)})
+
+
+@receiver(post_save, sender=BloodBank)
+def bank_saved(sender, instance, created, raw=False, **kwargs):
+    old_city = getattr(instance, '_loaded_city_key', None)
+    instance._loaded_city_key = instance.city_key
+    if raw or created or old_city is None or old_city == instance.city_key:
+        return
+    # bank moved city: move its stock between the per-city rows
+    deltas = defaultdict(int)
+    for group, units in instance.inventory.values_list('blood_group', 'units'):
+        deltas[(group, old_city)] -= units
+        deltas[(group, instance.city_key)] += units
+    inventory.apply_deltas(deltas)
+
+
+# analytics rollups
+
+@receiver(post_save, sender=DonationRequest)
+def request_saved(sender, instance, created, raw=False, **kwargs):
+    old = None if created else getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if created and not raw:
+        metrics.inc('donation_requests_created_total')
+    if raw or (not created and old is None) or old == instance.status:
+        return
+    rollups.move_requests([(instance.created_at, old, instance.status)])
+    live.publish('request', live.request_event(instance, old))
+
+
+@receiver(pre_delete, sender=DonationRequest)
+def release_reserved_units(sender, instance, **kwargs):
+    # the reservations would cascade away with the request, units and all
+    if getattr(instance, '_loaded_status', instance.status) == 'approved':
+        allocation.release(instance)
+
+
+@receiver(post_delete, sender=DonationRequest)
+def request_deleted(sender, instance, **kwargs):
+    rollups.move_requests([(instance.created_at, getattr(instance, '_loaded_status', instance.status), None)])
+
+
+def _donation_key(d):
+    return (d.approved, d.date, d.blood_group, d.blood_bank_id, d.units)
+
+
+@receiver(post_save, sender=Donation)
+def donation_saved(sender, instance, created, raw=False, **kwargs):
+    old = None if created else getattr(instance, '_loaded_rollup_key', None)
+    new = _donation_key(instance)
+    instance._loaded_rollup_key = new
+    if raw or (not created and old is None) or old == new:
+        return
+    if old and old[0]:
+        rollups.add_donations([old[1:]], sign=-1)
+    if new[0]:
+        rollups.add_donations([new[1:]])
+
+
+@receiver(post_delete, sender=Donation)
+def donation_deleted(sender, instance, **kwargs):
+    key = getattr(instance, '_loaded_rollup_key', _donation_key(instance))
+    if key[0]:
+        rollups.add_donations([key[1:]], sign=-1)
+
+
+def _donor_key(role, blood_group, city_key):
+    return (blood_group, city_key) if role == 'donor' else None
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    loaded = None if created else getattr(instance, '_loaded_donor_key', None)
+    current = (instance.role, instance.blood_group, instance.city_key)
+    instance._loaded_donor_key = current
+    if raw or (not created and loaded is None):
+        return
+    rollups.move_donor(_donor_key(*loaded) if loaded else None, _donor_key(*current))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_donor_key', (instance.role, instance.blood_group, instance.city_key))
+    rollups.move_donor(_donor_key(*loaded), None)
+
+
+# search index (core.search)
+
+@receiver(post_save, sender=BloodBank)
+@receiver(post_save, sender=DonationRequest)
+@receiver(post_save, sender=User)
+def index_for_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & set(search.FIELDS[sender]):
+        return
+    search.index([instance])
+
+
+@receiver(post_delete, sender=BloodBank)
+@receiver(post_delete, sender=DonationRequest)
+@receiver(post_delete, sender=User)
+def unindex_for_search(sender, instance, **kwargs):
+    search.unindex(sender, [instance.pk])
+
+
+# cache version stamps (core.caching)
+
+# explicit senders: a catch-all post_delete receiver would stop Django fast-deleting every model
+@receiver(post_save, sender=BloodBank)
+@receiver(post_save, sender=BloodInventory)
+@receiver(post_save, sender=Donation)
+@receiver(post_save, sender=DonationRequest)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=BloodBank)
+@receiver(post_delete, sender=BloodInventory)
+@receiver(post_delete, sender=Donation)
+@receiver(post_delete, sender=DonationRequest)
+@receiver(post_delete, sender=User)
+def bump_cache_version(sender, update_fields=None, raw=False, **kwargs):
+    # logging in saves last_login; nothing cached shows it
+    if raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    caching.bump(sender)
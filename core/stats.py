@@ -0,0 +1,163 @@
+"""Dashboard counters in two queries, cached with stale-while-revalidate.
+
+``dashboard_stats()`` returns a ``DashboardStats`` shared by the admin stats
+endpoint (sync and async), the admin dashboard and the analytics page. Request
+counts by status come from one conditional aggregate over
+``DailyRequestRollup``. Donor counts by blood group come from one over
+``DonorRollup``. Both tables are small and kept exact by ``core.rollups``, so
+neither query scans the source tables. Inventory comes from the cached
+``inventory_totals``.
+
+The cache key carries the version stamps (``core.caching``) of the models the
+counts are built from. Any write to them, bulk writes included, bumps a stamp
+when it commits, so the next caller computes fresh stats instead of reading
+ones that predate the write.
+
+Between writes the result is cached for ``STATS_TTL`` seconds. For ``STATS_STALE_TTL``
+seconds after that the stale value is still served, and one caller (whoever
+takes the refresh lock) recomputes it in a background thread. Only a cold
+cache makes a request wait for the queries.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Q, Sum
+
+from . import caching, metrics
+from .conf import setting
+from .inventory import inventory_totals
+from .models import BLOOD_GROUPS, BloodInventory, DailyRequestRollup, DonationRequest, DonorRollup, User
+
+CACHE_PREFIX = 'stats:dashboard'
+LOCK_KEY = 'stats:dashboard:refreshing'
+STATUSES = [s for s, _ in DonationRequest.STATUS_CHOICES]
+GROUPS = [g for g, _ in BLOOD_GROUPS]
+# what the rollups and inventory totals are derived from
+SOURCES = (BloodInventory, DonationRequest, User)
+
+
+@dataclass(frozen=True)
+class DashboardStats:
+    total_donors: int
+    donors_by_group: dict  # blood group ('' when unknown) -> donors
+    total_requests: int
+    requests_by_status: dict  # status -> requests
+    inventory: list  # [{'blood_group', 'total_units'}]
+    computed_at: float = field(default_factory=time.time)
+
+    @property
+    def pending_requests(self):
+        return self.requests_by_status.get('pending', 0)
+
+    def api(self):
+        """The ``GET /api/admin/stats/`` body."""
+        return {
+            'total_donors': self.total_donors,
+            'total_requests': self.total_requests,
+            'pending_requests': self.pending_requests,
+            'inventory': self.inventory,
+        }
+
+    def donor_distribution(self):
+        return [{'blood_group': g, 'count': n} for g, n in sorted(self.donors_by_group.items()) if n]
+
+    def request_status_totals(self):
+        return [{'status': s, 'count': n} for s, n in sorted(self.requests_by_status.items()) if n]
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _request_sums():
+    sums = {s: Sum('requests', filter=Q(status=s)) for s in STATUSES}
+    return {'total': Sum('requests'), **sums}
+
+
+def _donor_sums():
+    sums = {f'g{i}': Sum('donors', filter=Q(blood_group=g)) for i, g in enumerate([''] + GROUPS)}
+    return {'total': Sum('donors'), **sums}
+
+
+def _build(requests, donors, inventory):
+    groups = [''] + GROUPS
+    return DashboardStats(
+        total_donors=donors['total'] or 0,
+        donors_by_group={g: donors[f'g{i}'] or 0 for i, g in enumerate(groups)},
+        total_requests=requests['total'] or 0,
+        requests_by_status={s: requests[s] or 0 for s in STATUSES},
+        inventory=inventory,
+    )
+
+
+def compute():
+    """Fresh stats, bypassing the cache."""
+    return _build(DailyRequestRollup.objects.aggregate(**_request_sums()),
+                  DonorRollup.objects.aggregate(**_donor_sums()), inventory_totals())
+
+
+async def acompute():
+    """``compute`` for async views."""
+    requests, donors, inventory = await asyncio.gather(
+        DailyRequestRollup.objects.aaggregate(**_request_sums()),
+        DonorRollup.objects.aaggregate(**_donor_sums()),
+        sync_to_async(inventory_totals)(),
+    )
+    return _build(requests, donors, inventory)
+
+
+def _cache_key():
+    return f'{CACHE_PREFIX}:{caching.versions(*SOURCES)}'
+
+
+def _store(key, stats):
+    ttl = setting('STATS_TTL', 30)
+    cache.set(key, (stats, time.time() + ttl), ttl + setting('STATS_STALE_TTL', 300))
+    metrics.set_gauge('donation_requests_pending', stats.pending_requests)
+    return stats
+
+
+def _refresh(key):
+    try:
+        _store(key, compute())
+    finally:
+        cache.delete(LOCK_KEY)
+        close_old_connections()
+
+
+def _revalidate(key):
+    # one refresh at a time across processes; the lock expires if a refresher dies
+    if not cache.add(LOCK_KEY, 1, 60):
+        return
+    if setting('STATS_BACKGROUND_REFRESH', True):
+        threading.Thread(target=_refresh, args=(key,), name='stats-refresh', daemon=True).start()
+    else:
+        _refresh(key)
+
+
+def dashboard_stats():
+    """Cached ``DashboardStats``; see the module docstring."""
+    key = _cache_key()
+    entry = cache.get(key)
+    if entry is None:
+        return _store(key, compute())
+    stats, fresh_until = entry
+    if time.time() >= fresh_until:
+        _revalidate(key)
+    return stats
+
+
+async def adashboard_stats():
+    """``dashboard_stats`` for async views."""
+    key = await sync_to_async(_cache_key)()
+    entry = await cache.aget(key)
+    if entry is None:
+        return await sync_to_async(_store)(key, await acompute())
+    stats, fresh_until = entry
+    if time.time() >= fresh_until:
+        await sync_to_async(_revalidate)(key)
+    return stats
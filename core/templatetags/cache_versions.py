@@ -0,0 +1,19 @@
+from django import template
+from django.apps import apps
+from django.utils.translation import get_language
+
+from core import caching
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment_version(context, *models):
+    """
+    A vary-on value for ``{% cache %}``: the version stamps of ``models``
+    ('core.Donation', ...), the user and the active language. Saving any of
+    the models changes it, so the fragment re-renders on its next view.
+    """
+    user = context.get('user')
+    stamps = caching.versions(*[apps.get_model(m) for m in models])
+    return f'{stamps}:{getattr(user, "pk", None)}:{get_language()}'
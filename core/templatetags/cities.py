@@ -0,0 +1,12 @@
+from django import template
+from django.utils.translation import get_language
+
+from core.cities import city_name
+
+register = template.Library()
+
+
+@register.filter
+def local_city(value):
+    """A known city's name in the active language ("ঢাকা" under bn); other values unchanged."""
+    return city_name(value, (get_language() or 'en')[:2]) if value else value
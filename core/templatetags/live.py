@@ -0,0 +1,11 @@
+from django import template
+
+from core.conf import setting
+
+register = template.Library()
+
+
+@register.simple_tag
+def live_updates_enabled():
+    """Whether pages should open the ``/live/`` stream (``LIVE_UPDATES``, ASGI deployments only)."""
+    return setting('LIVE_UPDATES', False)
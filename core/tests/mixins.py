@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import BLOOD_GROUPS, BloodBank, BloodInventory
+
+User = get_user_model()
+GROUPS = [g for g, _ in BLOOD_GROUPS]
+
+
+class ConstantQueriesMixin:
+    """
+    ``assertConstantQueries`` requests a page, grows the data 100-fold and
+    requests it again, expecting the same number of queries. ``grow`` adds
+    donors and banks with stock; ``add_rows(users)`` adds a test case's own
+    rows per new donor.
+    """
+    growth = 990
+
+    def add_rows(self, users):
+        pass
+
+    def grow(self, n):
+        start = User.objects.count()
+        users = User.objects.bulk_create([
+            User(username=f'u{i:05d}', email=f'u{i}@example.com', role='donor', blood_group=GROUPS[i % 8], city='Dhaka')
+            for i in range(start, start + n)
+        ])
+        self.add_rows(users)
+        banks = BloodBank.objects.bulk_create([BloodBank(name=f'Bank {u.pk}', city='Dhaka') for u in users])
+        BloodInventory.objects.bulk_create([BloodInventory(blood_bank=b, blood_group='A+', units=3) for b in banks])
+        cache.clear()  # bulk_create skips the signals that bump cache versions
+
+    def assertConstantQueries(self, url, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.grow(self.growth)
+        with self.assertNumQueries(len(small)):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp
@@ -0,0 +1,46 @@
+import unittest
+
+from django.core.cache import cache
+from django.test.runner import DiscoverRunner, ParallelTestSuite, RemoteTestResult, RemoteTestRunner
+from django.test.utils import override_settings
+
+# per-process and empty at start, whatever cache the settings point at
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class CacheIsolatedResultMixin:
+    def startTest(self, test):
+        # test transactions roll back, cached values built from them would not
+        cache.clear()
+        super().startTest(test)
+
+
+def cache_isolated(resultclass):
+    """``resultclass`` with the cache cleared before every test."""
+    return type(f'CacheIsolated{resultclass.__name__}', (CacheIsolatedResultMixin, resultclass), {})
+
+
+class CacheIsolatedRemoteRunner(RemoteTestRunner):
+    resultclass = cache_isolated(RemoteTestResult)
+
+
+class CacheIsolatedParallelSuite(ParallelTestSuite):
+    runner_class = CacheIsolatedRemoteRunner
+
+
+class CacheIsolatedRunner(DiscoverRunner):
+    """Runs the tests against a local-memory cache, cleared before every test."""
+    parallel_test_suite = CacheIsolatedParallelSuite
+
+    def setup_test_environment(self, **kwargs):
+        self._caches = override_settings(CACHES=TEST_CACHES)
+        self._caches.enable()
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self._caches.disable()
+
+    def get_resultclass(self):
+        # mixed into --debug-sql / --pdb results too
+        return cache_isolated(super().get_resultclass() or unittest.TextTestResult)
@@ -0,0 +1,165 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import allocation
+from core.models import BloodBank, BloodInventory, Donation, DonationRequest, InventorySummary, OutboundEmail
+
+User = get_user_model()
+
+
+class AllocationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.hospital = User.objects.create_user(username='h', email='h@example.com', password='x', role='hospital')
+        self.dhaka = BloodBank.objects.create(name='Dhaka', city='Dhaka')
+        self.sylhet = BloodBank.objects.create(name='Sylhet', city='Sylhet')
+
+    def stock(self, bank, group):
+        return BloodInventory.objects.get(blood_bank=bank, blood_group=group).units
+
+    def request(self, group, units, city='Dhaka'):
+        return DonationRequest.objects.create(requester=self.hospital, blood_group=group, units=units, city=city)
+
+    def test_same_city_then_compatible_groups(self):
+        BloodInventory.objects.create(blood_bank=self.sylhet, blood_group='A+', units=10)
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='A+', units=2)
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='O-', units=2)
+        dr = self.request('A+', 5)
+        reservations = allocation.approve(dr, self.admin)
+        self.assertEqual([(r.blood_bank_id, r.blood_group, r.units) for r in reservations],
+                         [(self.dhaka.pk, 'A+', 2), (self.dhaka.pk, 'O-', 2), (self.sylhet.pk, 'A+', 1)])
+        self.assertEqual(self.stock(self.sylhet, 'A+'), 9)
+        dr.refresh_from_db()
+        self.assertEqual((dr.status, dr.approved_by), ('approved', self.admin))
+        self.assertEqual(InventorySummary.objects.get(city_key=InventorySummary.ALL, blood_group='A+').units, 9)
+
+    def test_insufficient_stock_rolls_back(self):
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='B+', units=2)
+        dr = self.request('B+', 3)
+        with self.assertRaises(allocation.InsufficientInventory):
+            allocation.approve(dr, self.admin)
+        self.assertEqual(self.stock(self.dhaka, 'B+'), 2)
+        dr.refresh_from_db()
+        self.assertEqual(dr.status, 'pending')
+        self.assertFalse(dr.reservations.exists())
+
+    def test_second_approval_is_refused(self):
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='O+', units=5)
+        dr = self.request('O+', 2)
+        allocation.approve(dr, self.admin)
+        with self.assertRaises(allocation.AlreadyProcessed):
+            allocation.approve(DonationRequest.objects.get(pk=dr.pk), self.admin)
+        self.assertEqual(self.stock(self.dhaka, 'O+'), 3)
+
+    def test_rejecting_approved_request_releases_units(self):
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='O+', units=5)
+        dr = self.request('O+', 2)
+        allocation.approve(dr, self.admin)
+        allocation.reject(dr, self.admin)
+        self.assertEqual(self.stock(self.dhaka, 'O+'), 5)
+        self.assertEqual(InventorySummary.objects.get(city_key='dhaka', blood_group='O+').units, 5)
+
+    def test_deleting_approved_request_releases_units(self):
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='O+', units=5)
+        allocation.approve(self.request('O+', 2), self.admin)
+        allocation.approve(self.request('O+', 1), self.admin)
+        DonationRequest.objects.get(units=2).delete()
+        self.assertEqual(self.stock(self.dhaka, 'O+'), 4)
+        self.hospital.delete()  # cascades to the remaining request
+        self.assertEqual(self.stock(self.dhaka, 'O+'), 5)
+        self.assertEqual(InventorySummary.objects.get(city_key='dhaka', blood_group='O+').units, 5)
+
+    def test_api_approve_conflict_without_stock(self):
+        dr = self.request('AB-', 1)
+        self.client.force_login(self.admin)
+        resp = self.client.post(f'/api/requests/{dr.pk}/approve/')
+        self.assertEqual(resp.status_code, 409)
+
+
+class DonationApprovalTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.donor = User.objects.create_user(username='d', email='d@example.com', password='x', role='donor', blood_group='A+')
+        self.dhaka = BloodBank.objects.create(name='Dhaka', city='Dhaka')
+        self.other = BloodBank.objects.create(name='Dhaka 2', city='Dhaka')
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='A+', units=1)
+
+    def donations(self, n, bank):
+        return Donation.objects.bulk_create([Donation(donor=self.donor, blood_bank=bank, blood_group='A+', units=1) for _ in range(n)])
+
+    def test_bulk_approve_credits_inventory_in_few_queries(self):
+        ids = [d.pk for d in self.donations(300, self.dhaka) + self.donations(200, self.other)]
+        with CaptureQueriesContext(connection) as ctx:
+            result = allocation.approve_donations(ids, self.admin)
+        # one UPDATE per bank/group, independent of the number of donations
+        # (the mail queue insert is batched by the backend's parameter limit,
+        # the rollups are bumped once per day/bank/group in their own savepoint)
+        self.assertLessEqual(len([q for q in ctx.captured_queries
+                                  if not any(s in q['sql'] for s in ('core_outboundemail', 'rollup', 'SAVEPOINT'))]), 11)
+        self.assertEqual(len(result['approved']), 500)
+        self.assertEqual(BloodInventory.objects.get(blood_bank=self.dhaka, blood_group='A+').units, 301)
+        self.assertEqual(BloodInventory.objects.get(blood_bank=self.other, blood_group='A+').units, 200)
+        self.assertEqual(InventorySummary.objects.get(city_key='dhaka', blood_group='A+').units, 501)
+        self.assertEqual(Donation.objects.filter(approved=True, approved_by=self.admin).count(), 500)
+        self.assertEqual(OutboundEmail.objects.count(), 500)
+
+    def test_already_approved_are_skipped(self):
+        ids = [d.pk for d in self.donations(2, self.dhaka)]
+        allocation.approve_donations(ids[:1], self.admin)
+        result = allocation.approve_donations(ids + [999999], self.admin)
+        self.assertEqual(result, {'approved': [ids[1]], 'skipped': [ids[0], 999999]})
+        self.assertEqual(BloodInventory.objects.get(blood_bank=self.dhaka, blood_group='A+').units, 3)
+
+    def test_bulk_approve_endpoint(self):
+        ids = [d.pk for d in self.donations(3, self.dhaka)]
+        self.client.force_login(self.admin)
+        resp = self.client.post('/api/donations/bulk-approve/', {'ids': ids}, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['approved'], 3)
+        resp = self.client.post(f'/api/donations/{ids[0]}/approve/')
+        self.assertEqual(resp.status_code, 400)
+
+
+class BulkRequestTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.hospital = User.objects.create_user(username='h', email='h@example.com', password='x', role='hospital')
+        self.bank = BloodBank.objects.create(name='Dhaka', city='Dhaka')
+        BloodInventory.objects.create(blood_bank=self.bank, blood_group='A+', units=3)
+        self.reqs = DonationRequest.objects.bulk_create([
+            DonationRequest(requester=self.hospital, blood_group='A+', units=2, city='Dhaka') for _ in range(3)
+        ])
+        self.ids = [r.pk for r in self.reqs]
+
+    def test_bulk_approve_reserves_until_stock_runs_out(self):
+        result = allocation.approve_requests(self.ids + [999999], self.admin)
+        self.assertEqual(result['approved'], self.ids[:1])
+        self.assertEqual(result['insufficient'], self.ids[1:])
+        self.assertEqual(result['skipped'], [999999])
+        self.assertEqual(BloodInventory.objects.get(blood_bank=self.bank).units, 1)
+        self.assertEqual(DonationRequest.objects.filter(status='pending').count(), 2)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_bulk_reject_single_update(self):
+        allocation.approve(self.reqs[0], self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            result = allocation.reject_requests(self.ids, self.admin)
+        self.assertEqual(result, {'rejected': self.ids[1:], 'skipped': self.ids[:1]})
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "core_donationrequest"')]), 1)
+        self.assertEqual(DonationRequest.objects.filter(status='rejected').count(), 2)
+
+    def test_frontend_bulk_form(self):
+        self.client.force_login(self.admin)
+        resp = self.client.post(reverse('bulk-update-requests'), {'action': 'reject', 'ids': [str(i) for i in self.ids]})
+        self.assertRedirects(resp, reverse('manage-requests'))
+        self.assertEqual(DonationRequest.objects.filter(status='rejected').count(), 3)
+
+    def test_api_bulk_endpoints(self):
+        self.client.force_login(self.admin)
+        resp = self.client.post('/api/requests/bulk-reject/', {'ids': self.ids[:2]}, content_type='application/json')
+        self.assertEqual(resp.json()['rejected'], 2)
+        resp = self.client.post('/api/requests/bulk-approve/', {'ids': 'nope'}, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
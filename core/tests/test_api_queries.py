@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import BloodBank, Donation, DonationRequest
+from core.tests.mixins import ConstantQueriesMixin
+
+User = get_user_model()
+
+
+class ApiQueryCountTests(ConstantQueriesMixin, TestCase):
+    """List and detail endpoints must not issue per-row queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        cls.bank = BloodBank.objects.create(name='Central', city='Dhaka')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.grow(10)
+
+    def add_rows(self, users):
+        DonationRequest.objects.bulk_create([
+            DonationRequest(requester=u, blood_group=u.blood_group, units=1, approved_by=self.admin) for u in users
+        ])
+        DonationRequest.objects.bulk_create([
+            DonationRequest(requester=self.admin, blood_group=u.blood_group, units=1) for u in users
+        ])
+        Donation.objects.bulk_create([
+            Donation(donor=u, blood_bank=self.bank, blood_group=u.blood_group, approved_by=self.admin) for u in users
+        ])
+
+    def test_users_list(self):
+        self.assertConstantQueries('/api/users/')
+
+    def test_blood_banks_list(self):
+        self.assertConstantQueries('/api/blood-banks/')
+
+    def test_inventory_list(self):
+        self.assertConstantQueries('/api/inventory/')
+
+    def test_requests_list(self):
+        self.assertConstantQueries('/api/requests/')
+
+    def test_my_requests(self):
+        self.assertConstantQueries('/api/requests/mine/')
+
+    def test_donations_list(self):
+        self.assertConstantQueries('/api/donations/')
+
+    def test_detail_endpoints(self):
+        request = DonationRequest.objects.first()
+        donation = Donation.objects.first()
+        for url in (f'/api/requests/{request.pk}/', f'/api/donations/{donation.pk}/',
+                    f'/api/users/{self.admin.pk}/', f'/api/blood-banks/{self.bank.pk}/'):
+            with self.subTest(url=url), self.assertNumQueries(3):
+                self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import profiling
+from core.matching import matching_donors
+from core.models import DonationRequest
+
+User = get_user_model()
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        cls.hospital = User.objects.create_user(username='h', email='h@example.com', password='x', role='hospital')
+        for i in range(25):
+            User.objects.create_user(username=f'd{i:02d}', email=f'd{i}@example.com', password='x', role='donor',
+                                     blood_group='O-' if i % 2 else 'A+', city='Dhaka' if i % 3 else 'Sylhet')
+        DonationRequest.objects.create(requester=cls.hospital, blood_group='A+', units=2)
+        DonationRequest.objects.create(requester=cls.admin, blood_group='O-', units=1, status='approved')
+
+    async def test_admin_stats_matches_the_sync_endpoint(self):
+        await self.async_client.aforce_login(self.admin)
+        resp = await self.async_client.get(reverse('async-admin-stats'))
+        self.assertEqual(resp.status_code, 200)
+        sync = await self.async_client.get(reverse('admin-stats'))
+        self.assertEqual(resp.json(), sync.json())
+        self.assertEqual((resp.json()['total_requests'], resp.json()['pending_requests']), (2, 1))
+
+    async def test_auth_and_roles(self):
+        url = reverse('async-admin-stats')
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        token = str(AccessToken.for_user(self.hospital))
+        resp = await self.async_client.get(url, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(resp.status_code, 403)
+        resp = await self.async_client.get(url, headers={'Authorization': 'Bearer nonsense'})
+        self.assertEqual(resp.status_code, 401)
+        token = str(AccessToken.for_user(self.admin))
+        resp = await self.async_client.get(url, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((await self.async_client.post(url)).status_code, 405)
+
+    async def test_search_pages_in_match_order(self):
+        await self.async_client.aforce_login(self.hospital)
+        expected = [u.username async for u in matching_donors('A+', 'Dhaka').filter(city_key__startswith='dhaka')]
+        url = reverse('async-search-donors')
+        first = (await self.async_client.get(url, {'blood_group': 'A+', 'city': 'Dhaka'})).json()
+        self.assertEqual(len(first['results']), 16)
+        self.assertEqual([d['username'] for d in first['results']], expected)
+        self.assertEqual(set(first['results'][0]), {'id', 'username', 'blood_group', 'city', 'email'})
+
+        everyone = (await self.async_client.get(url)).json()
+        rest = (await self.async_client.get(url, {'after': everyone['next']})).json()
+        self.assertEqual(len(everyone['results']) + len(rest['results']), 25)
+        self.assertIsNone(rest['next'])
+
+    async def test_my_requests_are_only_mine(self):
+        await self.async_client.aforce_login(self.hospital)
+        resp = (await self.async_client.get(reverse('async-my-requests'))).json()
+        self.assertEqual([(r['blood_group'], r['requester']['username']) for r in resp['results']], [('A+', 'h')])
+
+    async def test_analytics(self):
+        await self.async_client.aforce_login(self.admin)
+        resp = (await self.async_client.get(reverse('async-analytics'))).json()
+        self.assertEqual({r['status']: r['count'] for r in resp['request_status']}, {'pending': 1, 'approved': 1})
+
+    async def test_middleware_records_async_views(self):
+        profiling.reset()
+        await self.async_client.aforce_login(self.admin)
+        await self.async_client.get(reverse('async-admin-stats'))
+        stats = profiling.view_stats()['async-admin-stats']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['max_queries'], 0)
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core import benchmarks
+
+User = get_user_model()
+
+
+class BenchmarkTests(TestCase):
+    def test_every_case_runs_and_data_is_rolled_back(self):
+        results = benchmarks.run(sizes=[30], repeat=1)
+        self.assertEqual([r['case'] for r in results['results']], [c.name for c in benchmarks.CASES])
+        for row in results['results']:
+            self.assertLess(row['status'], 300, row['case'])
+            self.assertGreater(row['queries'], 0)
+            self.assertEqual(row['unindexed'], [], row['case'])
+        self.assertFalse(User.objects.exists())
+
+    def test_concurrent_run_covers_sync_and_async(self):
+        results = benchmarks.run_concurrent(sizes=[40], concurrency=4, total=8)
+        self.assertEqual([(r['case'], r['mode']) for r in results['results']],
+                         [(c.name, m) for c in benchmarks.ASYNC_CASES for m in ('sync', 'async')])
+        self.assertTrue(all(r['status'] == 200 and r['requests_per_second'] > 0 for r in results['results']))
+        self.assertFalse(User.objects.exists())
+
+    def test_compare_flags_extra_queries_and_slowdowns(self):
+        def result(**rows):
+            return {'results': [{'case': k, 'size': 10, 'status': 200, 'queries': q, 'median_ms': ms} for k, (q, ms) in rows.items()]}
+        baseline = result(a=(3, 10.0), b=(3, 10.0), c=(3, 1.0), d=(3, 10.0))
+        current = result(a=(4, 10.0), b=(3, 20.0), c=(3, 2.5), d=(2, 5.0), e=(9, 99.0))
+        self.assertEqual(benchmarks.compare(current, baseline), ['a @ 10: 3 -> 4 queries', 'b @ 10: 10.0ms -> 20.0ms'])
+
+    def test_plans_are_checked_for_scans_and_sorts(self):
+        self.assertEqual(benchmarks.unindexed(User.objects.filter(username='x')), [])
+        self.assertTrue(benchmarks.unindexed(User.objects.order_by('last_login')))
+        current = {'results': [{'case': 'a', 'size': 10, 'status': 200, 'queries': 1, 'median_ms': 1.0,
+                                'unindexed': ['SCAN core_user']}]}
+        self.assertEqual(benchmarks.compare(current, {'results': []}), ['a @ 10: unindexed plan: SCAN core_user'])
+
+    def test_command_needs_at_least_one_run(self):
+        for args in (['--repeat', '0'], ['--concurrency', '0'], ['--concurrency', '2', '--requests', '-1']):
+            with self.subTest(args=args), self.assertRaisesMessage(CommandError, 'must be at least 1'):
+                call_command('benchmark', *args)
+        with self.assertRaises(ValueError):
+            benchmarks.time_case(benchmarks.CASES[0], None, 0)
@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import caching, imports
+from core.models import BloodBank, Donation
+
+User = get_user_model()
+
+
+class VersionTests(TestCase):
+    def test_save_bumps_the_model_version_on_commit(self):
+        before = caching.versions(BloodBank)
+        with self.captureOnCommitCallbacks(execute=True):
+            bank = BloodBank.objects.create(name='Central', city='Dhaka')
+            self.assertEqual(caching.versions(BloodBank), before)
+        after = caching.versions(BloodBank)
+        self.assertNotEqual(after, before)
+        self.assertEqual(caching.versions(User), caching.versions(User))
+        with self.captureOnCommitCallbacks(execute=True):
+            bank.delete()
+        self.assertNotEqual(caching.versions(BloodBank), after)
+
+    def test_login_does_not_bump_users(self):
+        user = User.objects.create_user(username='d', email='d@example.com', password='x', role='donor')
+        before = caching.versions(User)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(user)
+        self.assertEqual(caching.versions(User), before)
+
+    def test_bulk_import_bumps(self):
+        before = caching.versions(BloodBank)
+        with self.captureOnCommitCallbacks(execute=True):
+            imports.import_rows('banks', [{'name': 'Central', 'city': 'Dhaka'}])
+        self.assertNotEqual(caching.versions(BloodBank), before)
+
+
+class CachedViewTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.client.force_login(self.admin)
+
+    def test_bank_list_is_cached_until_a_bank_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BloodBank.objects.create(name='Central', city='Dhaka')
+        self.client.get('/api/blood-banks/')
+        with self.assertNumQueries(2):  # session and user only
+            resp = self.client.get('/api/blood-banks/')
+        self.assertEqual(len(resp.json()['results']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            BloodBank.objects.create(name='South', city='Khulna')
+        self.assertEqual(len(self.client.get('/api/blood-banks/').json()['results']), 2)
+
+    def test_search_results_are_cached_until_a_user_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            donor = User.objects.create_user(username='a', email='a@example.com', password='x', role='donor',
+                                             blood_group='O-', city='Dhaka')
+        url = reverse('search-donors') + '?blood_group=O-&city=Dhaka'
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            resp = self.client.get(url)
+        self.assertEqual([d.username for d in resp.context['donors']], ['a'])
+        self.assertNotIn('password', resp.context['donors'][0].__dict__)
+        with self.captureOnCommitCallbacks(execute=True):
+            donor.city = 'Sylhet'
+            donor.save()
+        self.assertEqual(list(self.client.get(url).context['donors']), [])
+
+    def test_cached_view_skips_pending_messages(self):
+        calls = []
+
+        @caching.cached_view()
+        def view(request):
+            calls.append(1)
+            return HttpResponse(f'call {len(calls)}')
+
+        request = RequestFactory().get('/')
+        request.user = self.admin
+        request.session = self.client.session
+        request._messages = FallbackStorage(request)
+        self.assertEqual(view(request).content, b'call 1')
+        self.assertEqual(view(request).content, b'call 1')
+        request._messages.add(20, 'saved')
+        self.assertEqual(view(request).content, b'call 2')
+        self.assertEqual([str(m) for m in get_messages(request)], ['saved'])
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        self.bank = BloodBank.objects.create(name='Central', city='Dhaka')
+        self.donor = User.objects.create_user(username='d', email='d@example.com', password='x', role='donor', blood_group='O+')
+        self.client.force_login(self.donor)
+
+    def donate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Donation.objects.create(donor=self.donor, blood_bank=self.bank, blood_group='O+', approved=True)
+
+    def test_donor_dashboard_sections_come_from_cache(self):
+        self.donate()
+        url = reverse('donor-dashboard')
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as second:
+            resp = self.client.get(url)
+        self.assertLess(len(second), len(first))
+        self.assertFalse([q for q in second if 'core_donation' in q['sql']])
+        self.assertContains(resp, 'Central')
+
+        self.donate()
+        resp = self.client.get(url)
+        self.assertContains(resp, '<strong>2</strong>', html=True)
+
+    def test_fragments_are_per_user(self):
+        self.donate()
+        self.client.get(reverse('donor-dashboard'))
+        other = User.objects.create_user(username='e', email='e@example.com', password='x', role='donor')
+        self.client.force_login(other)
+        resp = self.client.get(reverse('donor-dashboard'))
+        self.assertContains(resp, 'No donations yet.')
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import translation
+
+from core.cities import canonical_city, city_name, normalize_city, transliterate
+from core.forms import AdminUserForm, BloodBankForm, DonationRequestForm
+from core.matching import city_filter
+from core.models import DonationRequest
+from core.templatetags.cities import local_city
+
+User = get_user_model()
+
+
+class NormalizeCityTests(TestCase):
+    def test_spellings_and_scripts_share_a_key(self):
+        for typed in ('Dhaka', ' dhaka ', 'DHAKA', 'ঢাকা', 'Dacca'):
+            self.assertEqual(normalize_city(typed), 'dhaka', typed)
+        for typed in ('Chattogram', 'Chittagong', 'চট্টগ্রাম'):
+            self.assertEqual(normalize_city(typed), 'chattogram', typed)
+        self.assertEqual(normalize_city("Cox's  Bazar"), normalize_city('Coxsbazar'))
+        self.assertEqual(normalize_city('কক্সবাজার'), 'coxs bazar')
+        self.assertEqual(normalize_city('ম\u09af\u09bcমনসিংহ'), normalize_city('ম\u09dfমনসিংহ'))  # য় in either form
+
+    def test_unknown_bangla_is_romanized(self):
+        self.assertEqual(transliterate('খুলনা'), 'khulna')
+        self.assertEqual(normalize_city('গোবিন্দগঞ্জ'), normalize_city('Gobindaganj'))
+        self.assertEqual(normalize_city('Uttara'), 'uttara')
+        self.assertEqual(normalize_city(''), '')
+
+    def test_display_names(self):
+        self.assertEqual(canonical_city('  comilla '), 'Cumilla')
+        self.assertEqual(canonical_city('কুমিল্লা'), 'Cumilla')
+        self.assertEqual(canonical_city(' Uttara  West '), 'Uttara West')
+        self.assertEqual(city_name('Cumilla', 'bn'), 'কুমিল্লা')
+        with translation.override('bn'):
+            self.assertEqual(local_city('Sylhet'), 'সিলেট')
+        with translation.override('en'):
+            self.assertEqual(local_city('সিলেট'), 'Sylhet')
+
+
+class CityKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        cls.donor = User.objects.create_user(username='d', email='d@example.com', password='x', role='donor',
+                                             blood_group='A+', city='Chittagong')
+
+    def test_forms_store_the_canonical_name(self):
+        form = DonationRequestForm(data={'blood_group': 'A+', 'units': 1, 'city': ' ঢাকা '})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['city'], 'Dhaka')
+        form = BloodBankForm(data={'name': 'Central', 'city': 'bogra'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().city, 'Bogura')
+
+    def test_requests_store_the_key(self):
+        dr = DonationRequest.objects.create(requester=self.admin, blood_group='A+', units=1, city='যশোর')
+        self.assertEqual(dr.city_key, 'jashore')
+        dr.city = 'Khulna'
+        dr.save(update_fields=['city'])
+        dr.refresh_from_db()
+        self.assertEqual(dr.city_key, 'khulna')
+
+    def test_city_filter_is_exact_for_known_cities(self):
+        self.assertEqual(city_filter('চট্টগ্রাম'), {'city_key': 'chattogram'})
+        self.assertIn('city_key__gte', city_filter('chatto'))
+        self.assertEqual(list(User.objects.filter(**city_filter('চট্টগ্রাম'))), [self.donor])
+
+    def test_api_city_filters(self):
+        DonationRequest.objects.create(requester=self.donor, blood_group='A+', units=1, city='Sylhet')
+        self.client.force_login(self.admin)
+        users = self.client.get(reverse('user-list'), {'city': 'চট্টগ্রাম'}).json()['results']
+        self.assertEqual([u['username'] for u in users], ['d'])
+        requests = self.client.get(reverse('request-list'), {'requester__city': 'chittagong', 'city': 'সিলেট'}).json()
+        self.assertEqual(len(requests['results']), 1)
+
+    def test_donor_search_in_bangla(self):
+        self.client.force_login(self.admin)
+        resp = self.client.get(reverse('search-donors'), {'blood_group': 'A+', 'city': 'চট্টগ্রাম'})
+        self.assertEqual([d.username for d in resp.context['donors']], ['d'])
+
+    def test_admin_edits_keep_the_city_as_typed(self):
+        form = AdminUserForm(data={'username': 'd', 'email': 'd@example.com', 'role': 'donor', 'blood_group': 'A+',
+                                   'city': 'chittagong'}, instance=self.donor)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().city, 'chittagong')
+        self.assertEqual(self.donor.city_key, 'chattogram')
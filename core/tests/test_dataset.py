@@ -0,0 +1,65 @@
+import io
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import dataset
+from core.models import BloodBank, BloodInventory, DailyDonationRollup, Donation, DonationRequest, InventorySummary
+
+User = get_user_model()
+UNTIL = timezone.make_aware(datetime(2025, 1, 1))
+
+
+class DatasetTests(TestCase):
+    def snapshot(self):
+        return (
+            list(User.objects.order_by('username').values_list('username', 'role', 'blood_group', 'city_key', 'geo_cell', 'date_joined')),
+            list(BloodInventory.objects.order_by('blood_bank__name', 'blood_group').values_list('blood_bank__name', 'blood_group', 'units')),
+            list(Donation.objects.order_by('date', 'donor__username').values_list('donor__username', 'blood_bank__name', 'date', 'approved')),
+            list(DonationRequest.objects.order_by('created_at').values_list('requester__username', 'blood_group', 'status', 'created_at')),
+        )
+
+    def test_same_seed_same_rows(self):
+        sizes = dict(users=60, banks=5, donations=120, requests=30, until=UNTIL, chunk_size=25)
+        counts = dataset.generate(seed=7, **sizes)
+        self.assertEqual(counts, {'banks': 5, 'inventory': 40, 'users': 61, 'requests': 30, 'donations': 120})
+        first = self.snapshot()
+        User.objects.all().delete()
+        BloodBank.objects.all().delete()
+        dataset.generate(seed=7, **sizes)
+        self.assertEqual(self.snapshot(), first)
+        User.objects.all().delete()
+        BloodBank.objects.all().delete()
+        dataset.generate(seed=8, **sizes)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_rows_are_consistent_with_summaries(self):
+        dataset.generate(users=200, banks=10, donations=300, requests=50, until=UNTIL)
+        self.assertTrue(all(timezone.localtime(d) <= UNTIL for d in Donation.objects.values_list('date', flat=True)))
+        self.assertTrue(all(timezone.localtime(d) <= UNTIL for d in DonationRequest.objects.values_list('created_at', flat=True)))
+        self.assertFalse(Donation.objects.filter(donor__role='hospital').exists())
+        self.assertEqual(sum(InventorySummary.objects.filter(city_key=InventorySummary.ALL).values_list('units', flat=True)),
+                         sum(BloodInventory.objects.values_list('units', flat=True)))
+        self.assertEqual(sum(DailyDonationRollup.objects.values_list('donations', flat=True)),
+                         Donation.objects.filter(approved=True).count())
+        self.assertTrue(User.objects.get(username='gen-0').check_password(dataset.PASSWORD))
+
+    def test_timestamps_are_written_by_the_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            dataset.generate(users=20, banks=2, donations=30, requests=10, until=UNTIL)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "core_donation')])
+        self.assertEqual(Donation.objects.filter(date__gt=UNTIL).count(), 0)
+        self.assertTrue(Donation._meta.get_field('date').auto_now_add)
+        self.assertTrue(DonationRequest._meta.get_field('created_at').auto_now_add)
+
+    def test_command_refuses_a_second_run(self):
+        out = io.StringIO()
+        call_command('generate_dataset', '--users', '10', '--banks', '2', '--donations', '5', '--requests', '5', stdout=out)
+        self.assertIn('Generated 2 banks', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', stdout=out)
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import BloodBank, BloodInventory, Donation, DonationRequest
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        cls.bank = BloodBank.objects.create(name='Central', city='Dhaka')
+        donors = User.objects.bulk_create([
+            User(username=f'd{i}', email=f'd{i}@example.com', role='donor', blood_group='A+' if i % 2 else 'O-', city='Dhaka')
+            for i in range(6)
+        ])
+        DonationRequest.objects.bulk_create([
+            DonationRequest(requester=d, blood_group=d.blood_group, units=2, city='Dhaka', status='pending' if i % 3 else 'approved')
+            for i, d in enumerate(donors)
+        ])
+        Donation.objects.bulk_create([Donation(donor=d, blood_bank=cls.bank, blood_group=d.blood_group) for d in donors])
+        BloodInventory.objects.create(blood_bank=cls.bank, blood_group='A+', units=7)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def fetch(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        return b''.join(resp.streaming_content).decode()
+
+    def test_requests_csv_honours_filters(self):
+        rows = list(csv.DictReader(io.StringIO(self.fetch('/api/requests/export.csv/?status=pending&blood_group=A%2B'))))
+        self.assertEqual({r['status'] for r in rows}, {'pending'})
+        self.assertEqual({r['blood_group'] for r in rows}, {'A+'})
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['requester_username'], 'd1')
+
+    def test_donations_ndjson(self):
+        rows = [json.loads(line) for line in self.fetch('/api/donations/export.ndjson/').splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['blood_bank_name'], 'Central')
+        self.assertIs(rows[0]['approved'], False)
+
+    def test_inventory_and_donors(self):
+        rows = list(csv.DictReader(io.StringIO(self.fetch('/api/inventory/export.csv/'))))
+        self.assertEqual([(r['blood_group'], r['units']) for r in rows], [('A+', '7')])
+        rows = list(csv.DictReader(io.StringIO(self.fetch('/api/users/donors.csv/?blood_group=O-'))))
+        self.assertEqual([r['username'] for r in rows], ['d0', 'd2', 'd4'])
+
+    def test_one_query_for_the_rows(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.fetch('/api/requests/export.ndjson/')
+        self.assertEqual(len([q for q in ctx.captured_queries if 'core_donationrequest' in q['sql']]), 1)
+
+    def test_admin_only(self):
+        self.client.force_login(User.objects.get(username='d0'))
+        self.assertEqual(self.client.get('/api/requests/export.csv/').status_code, 403)
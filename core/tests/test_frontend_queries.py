@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from core import rollups
+from core.models import BloodBank, Donation, DonationRequest
+from core.tests.mixins import ConstantQueriesMixin
+
+User = get_user_model()
+
+
+class FrontendQueryCountTests(ConstantQueriesMixin, TestCase):
+    """Frontend pages must not issue per-row queries or load unbounded lists."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        cls.donor = User.objects.create_user(username='donor', email='donor@example.com', password='x',
+                                             role='donor', blood_group='O+', city='Dhaka')
+        cls.hospital = User.objects.create_user(username='hospital', email='h@example.com', password='x', role='hospital')
+        cls.bank = BloodBank.objects.create(name='Central', city='Dhaka')
+
+    def setUp(self):
+        self.grow(10)
+
+    def add_rows(self, users):
+        DonationRequest.objects.bulk_create(
+            [DonationRequest(requester=u, blood_group=u.blood_group, units=1) for u in users]
+            + [DonationRequest(requester=r, blood_group='O+', units=1, status='approved')
+               for r in (self.donor, self.hospital) for _ in users]
+        )
+        Donation.objects.bulk_create([
+            Donation(donor=self.donor, blood_bank=self.bank, blood_group='O+', approved=True) for _ in users
+        ])
+        rollups.rebuild()  # bulk_create skips the signals that keep rollups current
+
+    def test_donor_dashboard(self):
+        resp = self.assertConstantQueries(reverse('donor-dashboard'), self.donor)
+        self.assertEqual(len(resp.context['donations']), 20)
+        self.assertContains(resp, '<strong>1000</strong>', html=True)
+
+    def test_hospital_dashboard(self):
+        resp = self.assertConstantQueries(reverse('hospital-dashboard'), self.hospital)
+        self.assertEqual(len(resp.context['requests']), 20)
+
+    def test_admin_dashboard(self):
+        resp = self.assertConstantQueries(reverse('admin-dashboard'), self.admin)
+        self.assertEqual(len(resp.context['pending']), 20)
+        self.assertEqual(resp.context['pending_count'], 1000)
+
+    def test_manage_requests(self):
+        resp = self.assertConstantQueries(reverse('manage-requests'), self.admin)
+        self.assertEqual(len(resp.context['reqs']), 50)
+        self.assertTrue(resp.context['next_cursor'])
+
+    def test_manage_donors(self):
+        self.assertConstantQueries(reverse('manage-donors'), self.admin)
+
+    def test_manage_banks(self):
+        self.assertConstantQueries(reverse('manage-banks'), self.admin)
+
+    def test_my_requests(self):
+        self.assertConstantQueries(reverse('my-requests'), self.hospital)
+
+    def test_search_donors(self):
+        self.assertConstantQueries(reverse('search-donors') + '?blood_group=O-&city=Dhaka', self.admin)
+
+    def test_analytics(self):
+        self.assertConstantQueries(reverse('analytics-dashboard'), self.admin)
+
+
+class ListPagingTests(TestCase):
+    def test_manage_requests_pages_newest_first(self):
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        DonationRequest.objects.bulk_create([DonationRequest(requester=admin, blood_group='O+', units=i + 1) for i in range(60)])
+        self.client.force_login(admin)
+        first = self.client.get(reverse('manage-requests'))
+        units = [r.units for r in first.context['reqs']]
+        self.assertEqual(units, list(range(60, 10, -1)))
+        second = self.client.get(reverse('manage-requests'), {'after': first.context['next_cursor']})
+        self.assertEqual([r.units for r in second.context['reqs']], list(range(10, 0, -1)))
+        self.assertContains(second, 'before=')
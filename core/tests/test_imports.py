@@ -0,0 +1,98 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import imports
+from core.models import BloodBank, BloodInventory, DonorRollup, InventorySummary
+
+User = get_user_model()
+
+
+class ImportTests(TestCase):
+    def test_banks_update_existing_and_create_new(self):
+        bank = BloodBank.objects.create(name='Central', city='Dhaka', contact='old')
+        result = imports.import_rows('banks', [
+            {'name': 'Central', 'city': ' dhaka ', 'contact': 'new'},
+            {'name': 'North', 'city': 'Sylhet'},
+            {'name': '', 'city': 'Sylhet'},
+        ])
+        self.assertEqual((result.rows, result.imported, result.failed), (3, 2, 1))
+        self.assertEqual(result.errors, [(3, 'name and city are required')])
+        bank.refresh_from_db()
+        self.assertEqual(bank.contact, 'new')
+        self.assertEqual(BloodBank.objects.get(name='North').city_key, 'sylhet')
+
+    def test_inventory_upserts_and_rebuilds_summary(self):
+        bank = BloodBank.objects.create(name='Central', city='Dhaka')
+        BloodInventory.objects.create(blood_bank=bank, blood_group='A+', units=3)
+        result = imports.import_rows('inventory', [
+            {'blood_bank': bank.pk, 'blood_group': 'A+', 'units': 10},
+            {'bank_name': 'Central', 'bank_city': 'DHAKA', 'blood_group': 'o-', 'units': '4'},
+            {'blood_bank': 9999, 'blood_group': 'B+', 'units': 1},
+            {'blood_bank': bank.pk, 'blood_group': 'C+', 'units': 1},
+        ])
+        self.assertEqual((result.imported, result.failed), (2, 2))
+        self.assertEqual(dict(bank.inventory.values_list('blood_group', 'units')), {'A+': 10, 'O-': 4})
+        self.assertEqual(InventorySummary.objects.get(city_key=InventorySummary.ALL, blood_group='A+').units, 10)
+
+    def test_donors_normalize_and_reject_conflicts(self):
+        User.objects.create_user(username='staff', email='staff@example.com', password='x', role='admin')
+        User.objects.create_user(username='old', email='old@example.com', password='x', role='donor', phone='8801700000000')
+        result = imports.import_rows('donors', [
+            {'username': 'd1', 'email': 'D1@example.com', 'phone': '017-1111 1111', 'blood_group': 'a+', 'city': 'Dhaka'},
+            {'username': 'old', 'email': 'old@example.com', 'city': 'Khulna'},
+            {'username': 'staff', 'email': 'staff@example.com'},
+            {'username': 'd2', 'email': 'd2@example.com', 'phone': '01700000000'},
+            {'username': 'd3', 'email': 'not-an-email'},
+        ])
+        self.assertEqual((result.imported, result.failed), (2, 3))
+        self.assertEqual([n for n, _ in result.errors], [3, 4, 5])
+        d1 = User.objects.get(username='d1')
+        self.assertEqual((d1.email, d1.phone, d1.blood_group, d1.city_key, d1.role), ('d1@example.com', '8801711111111', 'A+', 'dhaka', 'donor'))
+        self.assertFalse(d1.has_usable_password())
+        old = User.objects.get(username='old')
+        self.assertEqual((old.city_key, old.phone), ('khulna', '8801700000000'))
+        self.assertTrue(old.check_password('x'))
+        self.assertEqual(DonorRollup.objects.get(blood_group='A+', city_key='dhaka').donors, 1)
+
+    def test_queries_per_chunk_do_not_grow_with_rows(self):
+        def rows(n):
+            return [{'username': f'u{i}', 'email': f'u{i}@example.com', 'blood_group': 'O+'} for i in range(n)]
+        with CaptureQueriesContext(connection) as small:
+            imports.import_rows('donors', rows(5))
+        with CaptureQueriesContext(connection) as large:
+            imports.import_rows('donors', rows(500))
+        # (inserts are batched by the backend's parameter limit)
+        self.assertEqual(len([q for q in small if not q['sql'].startswith('INSERT')]),
+                         len([q for q in large if not q['sql'].startswith('INSERT')]))
+        self.assertEqual(User.objects.filter(role='donor').count(), 500)
+
+    def test_command_reads_csv(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('name,city,address\nCentral,Dhaka,Road 1\nSouth,Khulna,\n')
+        self.addCleanup(os.unlink, f.name)
+        out = io.StringIO()
+        call_command('import_data', 'banks', f.name, '--chunk-size', '1', stdout=out)
+        self.assertIn('Imported 2 banks from 2 rows', out.getvalue())
+        self.assertEqual(BloodBank.objects.count(), 2)
+
+    def test_api_upload_and_json_body(self):
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('banks.ndjson', b'{"name": "Central", "city": "Dhaka"}\n')
+        resp = self.client.post('/api/admin/import/banks/', {'file': upload})
+        self.assertEqual(resp.json()['imported'], 1)
+        resp = self.client.post('/api/admin/import/donors/', json.dumps([{'username': 'd1', 'email': 'd1@example.com'}]),
+                                content_type='application/json')
+        self.assertEqual(resp.json()['imported'], 1)
+        resp = self.client.post('/api/admin/import/donors/', {'file': SimpleUploadedFile('d.txt', b'x')})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.client.post('/api/admin/import/users/', '[]', content_type='application/json').status_code, 404)
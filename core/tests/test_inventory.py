@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import inventory
+from core.models import BloodBank, BloodInventory, InventorySummary
+
+
+class InventorySummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dhaka = BloodBank.objects.create(name='Dhaka Central', city='Dhaka')
+        self.sylhet = BloodBank.objects.create(name='Sylhet Central', city='Sylhet')
+
+    def summary(self, group, city_key=InventorySummary.ALL):
+        return InventorySummary.objects.filter(blood_group=group, city_key=city_key).values_list('units', flat=True).first()
+
+    def test_create_update_delete_maintain_totals(self):
+        a = BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='A+', units=5)
+        BloodInventory.objects.create(blood_bank=self.sylhet, blood_group='A+', units=3)
+        self.assertEqual(self.summary('A+'), 8)
+        self.assertEqual(self.summary('A+', 'dhaka'), 5)
+
+        a = BloodInventory.objects.get(pk=a.pk)
+        a.units = 2
+        a.save()
+        self.assertEqual(self.summary('A+'), 5)
+
+        a.blood_group = 'B+'
+        a.save()
+        self.assertEqual(self.summary('A+'), 3)
+        self.assertEqual(self.summary('B+'), 2)
+
+        a.delete()
+        self.assertEqual(self.summary('B+'), 0)
+        self.assertEqual(self.summary('B+', 'dhaka'), 0)
+
+    def test_bank_city_change_moves_stock(self):
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='O+', units=4)
+        bank = BloodBank.objects.get(pk=self.dhaka.pk)
+        bank.city = 'Khulna'
+        bank.save()
+        self.assertEqual(self.summary('O+', 'dhaka'), 0)
+        self.assertEqual(self.summary('O+', 'khulna'), 4)
+        self.assertEqual(self.summary('O+'), 4)
+
+    def test_totals_are_cached_and_invalidated(self):
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='A+', units=5)
+        self.assertEqual(inventory.inventory_totals(), [{'blood_group': 'A+', 'total_units': 5}])
+        with self.assertNumQueries(0):
+            inventory.inventory_totals()
+        with self.captureOnCommitCallbacks(execute=True):
+            BloodInventory.objects.create(blood_bank=self.sylhet, blood_group='A+', units=1)
+        self.assertEqual(inventory.inventory_totals(), [{'blood_group': 'A+', 'total_units': 6}])
+
+    def test_rebuild_matches_incremental(self):
+        BloodInventory.objects.create(blood_bank=self.dhaka, blood_group='A+', units=5)
+        BloodInventory.objects.filter(blood_bank=self.dhaka).update(units=9)
+        inventory.rebuild()
+        self.assertEqual(self.summary('A+'), 9)
+        self.assertEqual(self.summary('A+', 'dhaka'), 9)
@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import allocation, live
+from core.models import BloodBank, BloodInventory, DonationRequest
+
+User = get_user_model()
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+
+
+class PublishTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.hospital = User.objects.create_user(username='h', email='h@example.com', password='x', role='hospital')
+        self.other = User.objects.create_user(username='o', email='o@example.com', password='x', role='hospital')
+        self.recorder = Recorder()
+        patcher = mock.patch.object(live, 'broker', return_value=self.recorder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def events(self, kind):
+        return [e['data'] for e in self.recorder.events if e['type'] == kind]
+
+    def test_new_request_is_published_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            dr = DonationRequest.objects.create(requester=self.hospital, blood_group='A+', units=2, city='Dhaka')
+            self.assertEqual(self.recorder.events, [])
+        [data] = self.events('request')
+        self.assertEqual((data['id'], data['status'], data['previous'], data['requester']), (dr.pk, 'pending', None, 'h'))
+        event = self.recorder.events[0]
+        self.assertTrue(live.visible(event, self.admin))
+        self.assertTrue(live.visible(event, self.hospital))
+        self.assertFalse(live.visible(event, self.other))
+
+    def test_bulk_approval_publishes_status_and_inventory(self):
+        bank = BloodBank.objects.create(name='Central', city='Dhaka')
+        BloodInventory.objects.create(blood_bank=bank, blood_group='A+', units=10)
+        drs = [DonationRequest.objects.create(requester=u, blood_group='A+', units=2) for u in (self.hospital, self.other)]
+        self.recorder.events.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            allocation.approve_requests([dr.pk for dr in drs], self.admin)
+        self.assertEqual(sorted((d['id'], d['previous'], d['status']) for d in self.events('request')),
+                         sorted((dr.pk, 'pending', 'approved') for dr in drs))
+        self.assertEqual(self.events('inventory'), [{'A+': -4}])
+
+    def test_reject_publishes_the_change(self):
+        dr = DonationRequest.objects.create(requester=self.hospital, blood_group='A+', units=2)
+        self.recorder.events.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            allocation.reject(dr, self.admin)
+        self.assertEqual([(d['previous'], d['status']) for d in self.events('request')], [('pending', 'rejected')])
+
+
+class BrokerTests(TestCase):
+    async def test_local_broker_fans_out(self):
+        broker = live.LocalBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        broker.publish({'type': 'inventory', 'data': {'A+': 1}})
+        self.assertEqual(await first.next(1), {'type': 'inventory', 'data': {'A+': 1}})
+        self.assertEqual((await second.next(1))['data'], {'A+': 1})
+        self.assertIsNone(await first.next(0.01))
+        first.close()
+        second.close()
+        self.assertEqual(broker.subscribers, set())
+
+    @override_settings(LIVE_POLL_INTERVAL=0.01)
+    async def test_cache_broker(self):
+        broker = live.CacheBroker()
+        broker.publish({'type': 'inventory', 'data': {'O-': 2}})  # before subscribing: not replayed
+        sub = broker.subscribe()
+        self.assertIsNone(await sub.next(0.05))
+        broker.publish({'type': 'inventory', 'data': {'O-': 3}})
+        self.assertEqual((await sub.next(1))['data'], {'O-': 3})
+
+
+@override_settings(LIVE_KEEPALIVE=0.01, LIVE_UPDATES=True)
+class FeedViewTests(TestCase):
+    async def test_requires_login(self):
+        resp = await self.async_client.get(reverse('live-feed'))
+        self.assertEqual(resp.status_code, 401)
+
+    async def test_streams_events_for_the_user(self):
+        user = await User.objects.acreate(username='h', email='h@example.com', role='hospital')
+        await self.async_client.aforce_login(user)
+        broker = live.LocalBroker()
+        with mock.patch.object(live, 'broker', return_value=broker):
+            resp = await self.async_client.get(reverse('live-feed'))
+            self.assertEqual(resp['Content-Type'], 'text/event-stream')
+            stream = aiter(resp.streaming_content)
+            self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+            self.assertEqual(await anext(stream), b': keepalive\n\n')
+            broker.publish({'type': 'request', 'data': {'id': 1, 'requester_id': user.pk + 1}})
+            broker.publish({'type': 'request', 'data': {'id': 2, 'requester_id': user.pk}})
+            chunk = await anext(stream)
+            while chunk.startswith(b':'):
+                chunk = await anext(stream)
+            self.assertEqual(chunk, b'event: request\ndata: {"id": 2, "requester_id": %d}\n\n' % user.pk)
+            await resp.streaming_content.aclose()
+
+    def test_wsgi_gets_no_content(self):
+        # iterated the way a WSGI server does: must finish instead of streaming forever
+        environ = RequestFactory().get(reverse('live-feed'), HTTP_ACCEPT='text/event-stream').environ
+        started = []
+        body = b''.join(WSGIHandler()(environ, lambda status, headers: started.append(status)))
+        self.assertEqual((started, body), (['204 No Content'], b''))
+
+    async def test_off_unless_enabled(self):
+        user = await User.objects.acreate(username='h', email='h@example.com', role='hospital')
+        await self.async_client.aforce_login(user)
+        with self.settings(LIVE_UPDATES=False):
+            resp = await self.async_client.get(reverse('live-feed'))
+        self.assertEqual(resp.status_code, 204)
+
+
+class LiveScriptTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin'))
+
+    def test_dashboards_only_open_the_stream_when_enabled(self):
+        self.assertNotContains(self.client.get(reverse('admin-dashboard')), 'js/live.js')
+        with self.settings(LIVE_UPDATES=True):
+            self.assertContains(self.client.get(reverse('admin-dashboard')), 'js/live.js')
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.mailqueue import drain, enqueue_mail, fan_out
+from django.core.management import call_command
+
+from core.models import DonationRequest, DonorAlert, OutboundEmail
+from core.notifications import alert_donors, expand_alerts
+
+User = get_user_model()
+
+
+class MailQueueTests(TestCase):
+    def test_enqueue_does_not_send(self):
+        enqueue_mail('Hello', 'Body', ['a@example.com', '', 'b@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        item = OutboundEmail.objects.get()
+        self.assertEqual(item.recipients, 'a@example.com,b@example.com')
+        self.assertEqual(item.status, 'pending')
+
+    def test_enqueue_without_recipients_is_noop(self):
+        self.assertIsNone(enqueue_mail('Hello', 'Body', ['']))
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_drain_sends_batch(self):
+        for i in range(3):
+            enqueue_mail(f'Subject {i}', 'Body', [f'user{i}@example.com'])
+        sent, failed = drain(batch_size=2)
+        self.assertEqual((sent, failed), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        sent, failed = drain(batch_size=2)
+        self.assertEqual((sent, failed), (1, 0))
+        self.assertEqual(OutboundEmail.objects.filter(status='sent').count(), 3)
+        self.assertEqual(drain(), (0, 0))
+
+    def test_rows_claimed_by_another_worker_are_skipped(self):
+        for i in range(3):
+            enqueue_mail(f'Subject {i}', 'Body', [f'user{i}@example.com'])
+        values_list = QuerySet.values_list
+
+        def raced(qs, *args, **kwargs):
+            # another worker claims the first row between our select and update
+            ids = list(values_list(qs, *args, **kwargs))
+            OutboundEmail.objects.filter(id=ids[0]).update(status='sending', locked_at=timezone.now())
+            return ids
+
+        with mock.patch.object(QuerySet, 'values_list', raced):
+            self.assertEqual(drain(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(OutboundEmail.objects.filter(status='sending').count(), 1)
+
+    @override_settings(MAIL_QUEUE_MAX_ATTEMPTS=2, MAIL_QUEUE_RETRY_DELAY=30)
+    def test_failures_back_off_then_dead_letter(self):
+        item = enqueue_mail('Hello', 'Body', ['a@example.com'])
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('smtp down')):
+            self.assertEqual(drain(), (0, 1))
+            item.refresh_from_db()
+            self.assertEqual(item.status, 'pending')
+            self.assertEqual(item.attempts, 1)
+            self.assertGreater(item.next_attempt_at, timezone.now() + timedelta(seconds=20))
+            # not due yet
+            self.assertEqual(drain(), (0, 0))
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(drain(), (0, 1))
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'dead')
+        self.assertIn('smtp down', item.last_error)
+
+
+class DonorAlertFanoutTests(TestCase):
+    def test_fan_out_queues_one_message_per_recipient_in_chunks(self):
+        result = fan_out('Alert', 'Body', iter(['a@example.com', '', 'b@example.com', 'c@example.com']), chunk_size=2)
+        self.assertEqual(result.recipients, 3)
+        self.assertEqual(result.chunks, 2)
+        self.assertEqual(
+            sorted(OutboundEmail.objects.values_list('recipients', flat=True)),
+            ['a@example.com', 'b@example.com', 'c@example.com'],
+        )
+
+    def test_alert_donors_targets_same_group_donors(self):
+        User.objects.create_user(username='d1', email='d1@example.com', password='x', role='donor', blood_group='A+')
+        User.objects.create_user(username='d2', email='d2@example.com', password='x', role='donor', blood_group='B+')
+        requester = User.objects.create_user(username='h', email='h@example.com', password='x', role='hospital')
+        dr = DonationRequest.objects.create(requester=requester, blood_group='A+', units=1)
+        with self.assertNumQueries(1):
+            alert = alert_donors(dr, 'Body')
+        self.assertFalse(OutboundEmail.objects.exists())
+        self.assertEqual(expand_alerts(), (alert, 1))
+        self.assertEqual(OutboundEmail.objects.get().recipients, 'd1@example.com')
+        self.assertEqual(expand_alerts(), (None, 0))
+
+    def test_alerts_expand_in_chunks_same_city_first(self):
+        for i, city in enumerate(['Sylhet', 'Dhaka', 'Sylhet', 'Dhaka', 'Khulna']):
+            User.objects.create_user(username=f'd{i}', email=f'd{i}@example.com', password='x', role='donor',
+                                     blood_group='O-', city=city)
+        requester = User.objects.create_user(username='h', email='h@example.com', password='x', role='hospital')
+        dr = DonationRequest.objects.create(requester=requester, blood_group='O-', units=1, city='Dhaka')
+        alert = alert_donors(dr, 'Body')
+        self.assertEqual(expand_alerts(chunk_size=2)[1], 2)
+        self.assertEqual(sorted(OutboundEmail.objects.values_list('recipients', flat=True)),
+                         ['d1@example.com', 'd3@example.com'])
+        self.assertEqual(expand_alerts(chunk_size=2)[1], 2)
+        self.assertEqual(expand_alerts(chunk_size=2)[1], 1)
+        alert.refresh_from_db()
+        self.assertEqual((alert.queued, alert.done), (5, True))
+        self.assertEqual(OutboundEmail.objects.values('recipients').distinct().count(), 5)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_process_mail_queue_expands_and_delivers(self):
+        User.objects.create_user(username='d1', email='d1@example.com', password='x', role='donor', blood_group='A+')
+        requester = User.objects.create_user(username='h', email='h@example.com', password='x', role='hospital')
+        alert_donors(DonationRequest.objects.create(requester=requester, blood_group='A+', units=1), 'Body')
+        call_command('process_mail_queue', stdout=mock.Mock())
+        self.assertEqual([m.to for m in mail.outbox], [['d1@example.com']])
+        self.assertTrue(DonorAlert.objects.get().done)
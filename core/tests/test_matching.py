@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from core.cities import normalize_city
+from core.matching import COMPATIBLE_DONORS, geo_cell, matching_donors
+from core.pagination import approximate_count, keyset_page
+
+User = get_user_model()
+
+
+class MatchingIndexTests(TestCase):
+    def donor(self, username, group, city='', **extra):
+        return User.objects.create_user(username=username, email=f'{username}@example.com', password='x',
+                                        role='donor', blood_group=group, city=city, **extra)
+
+    def test_city_key_and_cell_maintained_on_save(self):
+        u = self.donor('d1', 'A+', city='  Cox\'s   BAZAR ', latitude=21.45, longitude=91.97)
+        self.assertEqual(u.city_key, 'coxs bazar')
+        self.assertEqual(u.geo_cell, geo_cell(21.45, 91.97))
+        u.city = 'Dhaka'
+        u.save(update_fields=['city'])
+        u.refresh_from_db()
+        self.assertEqual(u.city_key, normalize_city('Dhaka'))
+
+    def test_compatibility_table_covers_all_groups(self):
+        for group, donors in COMPATIBLE_DONORS.items():
+            self.assertEqual(donors[0], group)
+            self.assertIn('O-', donors)
+
+    def test_ranked_by_compatibility_then_city(self):
+        self.donor('o_neg_dhaka', 'O-', 'Dhaka')
+        self.donor('a_pos_sylhet', 'A+', 'Sylhet')
+        self.donor('a_pos_dhaka', 'A+', 'dhaka')
+        self.donor('b_pos_dhaka', 'B+', 'Dhaka')
+        names = list(matching_donors('A+', 'Dhaka').values_list('username', flat=True))
+        self.assertEqual(names, ['a_pos_dhaka', 'a_pos_sylhet', 'o_neg_dhaka'])
+        exact = list(matching_donors('A+', exact=True).values_list('username', flat=True))
+        self.assertEqual(exact, ['a_pos_dhaka', 'a_pos_sylhet'])
+
+    def test_nearest_first_when_coordinates_given(self):
+        self.donor('far', 'O+', latitude=24.0, longitude=90.0)
+        self.donor('near', 'O+', latitude=23.81, longitude=90.41)
+        self.donor('unknown', 'O+')
+        names = list(matching_donors('O+', lat=23.8, lon=90.4).values_list('username', flat=True))
+        self.assertEqual(names, ['near', 'far', 'unknown'])
+
+    def test_cells_around_the_point_first(self):
+        self.donor('z_near', 'O+', latitude=23.81, longitude=90.41)
+        self.donor('next_cell', 'O+', latitude=23.71, longitude=90.41)
+        self.donor('o_neg_near', 'O-', latitude=23.8, longitude=90.4)
+        self.donor('b_far', 'O+', latitude=22.3, longitude=91.8)
+        self.donor('a_unknown', 'O+')
+        names = list(matching_donors('O+', lat=23.8, lon=90.4).values_list('username', flat=True))
+        self.assertEqual(names, ['z_near', 'next_cell', 'a_unknown', 'b_far', 'o_neg_near'])
+        names = list(matching_donors('O+', lat=23.65, lon=90.4).values_list('username', flat=True))
+        self.assertEqual(names, ['next_cell', 'a_unknown', 'b_far', 'z_near', 'o_neg_near'])
+
+    def test_pages_walk_the_buckets_both_ways(self):
+        for i in range(7):
+            self.donor(f'dhaka{i}', 'A+' if i % 2 else 'O-', 'Dhaka')
+            self.donor(f'other{i}', 'A+' if i % 2 else 'O-', 'Sylhet')
+        matches = matching_donors('A+', 'Dhaka')
+        expected = [u.username for u in matches]
+        self.assertEqual(expected[:3], ['dhaka1', 'dhaka3', 'dhaka5'])
+        pages, after = [], None
+        while True:
+            page = keyset_page(matches, after=after, size=3)
+            pages.append([u.username for u in page])
+            if not (after := page.next_cursor):
+                break
+        self.assertEqual(sum(pages, []), expected)
+        back = keyset_page(matches, before=keyset_page(matches, after=keyset_page(matches, size=3).next_cursor,
+                                                       size=3).previous_cursor, size=3)
+        self.assertEqual([u.username for u in back], pages[0])
+        self.assertIsNone(back.previous_cursor)
+        self.assertEqual(matches.count(), 14)
+        self.assertEqual(approximate_count(matches), (14, False))
+
+    def test_search_view_uses_city_prefix(self):
+        self.donor('a', 'A+', 'Dhaka')
+        self.donor('b', 'A+', 'Chattogram')
+        resp = self.client.get(reverse('search-donors'), {'blood_group': 'A+', 'city': 'dha'})
+        self.assertEqual([d.username for d in resp.context['donors']], ['a'])
@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core import metrics
+from core.mailqueue import enqueue_mail
+from core.models import BloodBank, BloodInventory, DonationRequest
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        override = override_settings(METRICS_DIR=self.dir, METRICS_FLUSH_INTERVAL=0, METRICS_TOKEN='')
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics._store._reset()
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+
+    def scrape(self, **headers):
+        resp = self.client.get('/metrics', **headers)
+        self.assertEqual(resp.status_code, 200)
+        return resp.content.decode()
+
+    def test_requests_and_latency_per_view(self):
+        self.client.force_login(self.admin)
+        self.client.get('/api/inventory/')
+        self.client.get('/api/inventory/')
+        text = self.scrape()
+        self.assertIn('http_requests_total{method="GET",status="200",view="inventory-list"} 2.0', text)
+        self.assertIn('http_request_duration_seconds_count{view="inventory-list"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="inventory-list",le="+Inf"} 2', text)
+        self.assertNotIn('view="metrics"', text)
+
+    def test_business_counters_and_gauges(self):
+        bank = BloodBank.objects.create(name='Central', city='Dhaka')
+        BloodInventory.objects.create(blood_bank=bank, blood_group='O-', units=4)
+        DonationRequest.objects.create(requester=self.admin, blood_group='O-', units=1)
+        enqueue_mail('hi', 'body', ['a@example.com'])
+        self.client.force_login(self.admin)
+        self.client.get('/api/admin/stats/')
+        text = self.scrape()
+        self.assertIn('donation_requests_created_total 1.0', text)
+        self.assertIn('mail_enqueued_total 1.0', text)
+        self.assertIn('donation_requests_pending 1', text)
+        self.assertIn('inventory_units{blood_group="O-"} 4', text)
+        self.assertIn('# TYPE donation_requests_pending gauge', text)
+
+    def test_merges_other_processes(self):
+        metrics.inc('mail_sent_total', 3)
+        metrics.set_gauge('donation_requests_pending', 5)
+        other = {
+            'counters': [['mail_sent_total', {}, 4]],
+            'histograms': [],
+            'gauges': [['donation_requests_pending', {}, 9, time.time() + 60], ['mail_queue_depth', {'status': 'dead'}, 1, 0]],
+        }
+        with open(os.path.join(self.dir, '99999-abc.json'), 'w') as f:
+            json.dump(other, f)
+        text = self.scrape()
+        self.assertIn('mail_sent_total 7.0', text)
+        self.assertIn('donation_requests_pending 9', text)
+        self.assertIn('mail_queue_depth{status="dead"} 1', text)
+
+    def test_flush_writes_own_file(self):
+        metrics.inc('mail_sent_total')
+        files = [f for f in os.listdir(self.dir) if f.endswith('.json')]
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(self.dir, files[0])) as f:
+            self.assertEqual(json.load(f)['counters'], [['mail_sent_total', {}, 1.0]])
+
+    def test_token(self):
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.scrape(HTTP_AUTHORIZATION='Bearer s3cret')
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from core.matching import matching_donors
+from core.models import DonationRequest
+from core.pagination import approximate_count, keyset_page
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([
+            User(username=f'donor{i:02d}', email=f'd{i}@example.com', role='donor',
+                 blood_group='A+' if i % 2 else 'O-', city_key='dhaka' if i % 3 else 'sylhet')
+            for i in range(25)
+        ])
+
+    def test_pages_cover_ranked_results_once(self):
+        qs = matching_donors('A+', 'Dhaka')
+        expected = [u.username for u in qs]
+        seen, after = [], None
+        while True:
+            page = keyset_page(qs, after=after, size=10)
+            seen += [u.username for u in page]
+            after = page.next_cursor
+            if not after:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_previous_page(self):
+        qs = User.objects.order_by('username')
+        first = keyset_page(qs, size=10)
+        self.assertIsNone(first.previous_cursor)
+        second = keyset_page(qs, after=first.next_cursor, size=10)
+        back = keyset_page(qs, before=second.previous_cursor, size=10)
+        self.assertEqual(list(back), list(first))
+        self.assertIsNone(back.previous_cursor)
+        self.assertEqual(back.next_cursor, first.next_cursor)
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        qs = User.objects.order_by('username')
+        self.assertEqual(list(keyset_page(qs, after='garbage', size=5)), list(qs[:5]))
+
+    def test_approximate_count_is_capped(self):
+        self.assertEqual(approximate_count(User.objects.all(), cap=10), (10, True))
+        self.assertEqual(approximate_count(User.objects.filter(blood_group='A+'), cap=100), (12, False))
+
+    def test_search_page_links(self):
+        resp = self.client.get(reverse('search-donors'), {'blood_group': 'A+'})
+        self.assertEqual(len(resp.context['donors']), 10)
+        resp = self.client.get(reverse('search-donors'), {'blood_group': 'A+', 'after': resp.context['next_cursor']})
+        self.assertEqual(len(resp.context['donors']), 10)
+        self.assertIsNotNone(resp.context['previous_cursor'])
+
+    def test_api_is_cursor_paginated(self):
+        admin = User.objects.create_user(username='zz-admin', email='a@example.com', password='x', role='admin')
+        DonationRequest.objects.bulk_create([DonationRequest(requester=admin, blood_group='A+', units=1) for _ in range(60)])
+        self.client.force_login(admin)
+        body = self.client.get('/api/requests/', {'count': '1'}).json()
+        self.assertEqual(len(body['results']), 50)
+        self.assertEqual((body['count'], body['count_is_estimate']), (60, False))
+        body = self.client.get(body['next']).json()
+        self.assertEqual(len(body['results']), 10)
+        self.assertIsNone(body['next'])
@@ -0,0 +1,59 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core import profiling
+from core.models import BloodBank
+
+User = get_user_model()
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profiling.reset()
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.client.force_login(self.admin)
+
+    def test_samples_per_view(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/inventory/').status_code, 200)
+        stats = profiling.view_stats()['inventory-list']
+        self.assertEqual(stats['requests'], 3)
+        self.assertGreater(stats['avg_queries'], 0)
+        self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertIn('SELECT', stats['slowest_query'])
+
+    def test_recorder_counts_duplicates(self):
+        recorder = profiling.QueryRecorder()
+        bank = BloodBank.objects.create(name='Central', city='Dhaka')
+        with connection.execute_wrapper(recorder):
+            for _ in range(3):
+                BloodBank.objects.get(pk=bank.pk)
+            BloodBank.objects.filter(pk=bank.pk + 1).first()
+        self.assertEqual(len(recorder.queries), 4)
+        self.assertEqual(recorder.duplicates, 2)
+
+    def test_endpoint_is_admin_only_and_resettable(self):
+        self.client.get('/api/inventory/')
+        resp = self.client.get('/api/admin/perf/')
+        self.assertIn('inventory-list', resp.json()['views'])
+        self.assertEqual(self.client.delete('/api/admin/perf/').status_code, 204)
+        self.assertNotIn('inventory-list', profiling.view_stats())
+        self.client.force_login(User.objects.create_user(username='d', email='d@example.com', password='x'))
+        self.assertEqual(self.client.get('/api/admin/perf/').status_code, 403)
+
+    @override_settings(PERF_TRACE_SAMPLE_RATE=1.0, PERF_SERVER_TIMING=True)
+    def test_sampled_trace_and_server_timing(self):
+        with self.assertLogs('core.perf', 'INFO') as logs:
+            resp = self.client.get('/api/inventory/')
+        self.assertIn('db;dur=', resp['Server-Timing'])
+        trace = json.loads(logs.records[0].getMessage())
+        self.assertEqual((trace['view'], trace['status']), ('inventory-list', 200))
+        self.assertEqual(len(trace['sql']), trace['queries'])
+
+    @override_settings(PERF_INSTRUMENTATION=False)
+    def test_can_be_disabled(self):
+        self.client.get('/api/inventory/')
+        self.assertEqual(profiling.view_stats(), {})
@@ -0,0 +1,63 @@
+import re
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from core.matching import city_filter, city_prefix_filter, matching_donors
+from core.models import Donation, DonationRequest
+
+User = get_user_model()
+
+# "SCAN core_donation" without "USING ... INDEX" is a full table scan
+_TABLE_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING)')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN checks are SQLite specific')
+class HotQueryPlanTests(TestCase):
+    """Every query on a hot path in views.py / frontend_views.py must be served by an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='u', email='u@example.com', password='x', role='donor', blood_group='A+')
+
+    def assertUsesIndex(self, qs):
+        plan = qs.explain()
+        scans = [t for t in _TABLE_SCAN.findall(plan) if t.startswith('core_')]
+        self.assertEqual(scans, [], f'full table scan in plan:\n{plan}\nfor query:\n{getattr(qs, "query", qs)}')
+
+    def test_search_donors(self):
+        self.assertUsesIndex(matching_donors('A+', 'Dhaka').filter(**city_prefix_filter('Dhaka')))
+        self.assertUsesIndex(matching_donors('A+', exact=True))
+        self.assertUsesIndex(matching_donors('A+').filter(**city_filter('ঢাকা')))
+        self.assertUsesIndex(matching_donors('A+', 'Dhaka', lat=23.8, lon=90.4))
+
+    def test_donor_matches_are_read_in_index_order(self):
+        # a temp b-tree sorts every candidate; buckets must come out of an index already ordered
+        for matches in (matching_donors('A+', 'Dhaka'), matching_donors('AB+'), matching_donors('O-', exact=True),
+                        matching_donors('AB+', 'Dhaka').filter(**city_filter('Dhaka'))):
+            for i in range(len(matches.buckets)):
+                plan = matches.bucket(i).explain()
+                self.assertNotIn('TEMP B-TREE', plan, f'bucket {i} of {matches.buckets} is sorted:\n{plan}')
+        self.assertUsesIndex(DonationRequest.objects.filter(**city_filter('Dhaka')))
+
+    def test_donor_counts(self):
+        self.assertUsesIndex(User.objects.filter(role='donor'))
+
+    def test_pending_request_check(self):
+        self.assertUsesIndex(DonationRequest.objects.filter(requester=self.user, status='pending'))
+
+    def test_request_listings(self):
+        self.assertUsesIndex(DonationRequest.objects.order_by('-created_at'))
+        self.assertUsesIndex(DonationRequest.objects.filter(status='pending').order_by('-created_at'))
+        self.assertUsesIndex(DonationRequest.objects.filter(status='approved').order_by('-created_at'))
+        self.assertUsesIndex(self.user.requests.order_by('-created_at'))
+
+    def test_donation_listings(self):
+        self.assertUsesIndex(Donation.objects.order_by('-date'))
+        self.assertUsesIndex(self.user.donations.filter(approved=True).order_by('-date'))
+        since = timezone.now() - timedelta(days=30)
+        self.assertUsesIndex(Donation.objects.filter(date__gte=since, approved=True))
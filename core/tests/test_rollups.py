@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core import allocation, rollups
+from core.models import BloodBank, DailyDonationRollup, DailyRequestRollup, Donation, DonationRequest, DonorRollup
+
+User = get_user_model()
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        self.bank = BloodBank.objects.create(name='Dhaka', city='Dhaka')
+
+    def snapshot(self):
+        return (
+            sorted(DailyDonationRollup.objects.values_list('day', 'blood_group', 'blood_bank_id', 'donations', 'units')),
+            sorted(DailyRequestRollup.objects.exclude(requests=0).values_list('day', 'status', 'requests')),
+            sorted(DonorRollup.objects.exclude(donors=0).values_list('blood_group', 'city_key', 'donors')),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        donor = User.objects.create_user(username='d', email='d@example.com', password='x', role='donor', blood_group='A+', city='Dhaka')
+        other = User.objects.create_user(username='e', email='e@example.com', password='x', role='donor', blood_group='B+')
+        other.city = 'Sylhet'
+        other.save()
+        User.objects.create_user(username='h', email='h@example.com', password='x', role='hospital')
+
+        reqs = [DonationRequest.objects.create(requester=donor, blood_group='A+', units=1) for _ in range(3)]
+        allocation.reject_requests([reqs[0].pk], self.admin)
+        allocation.reject(reqs[1], self.admin)
+        reqs[2].delete()
+
+        d1 = Donation.objects.create(donor=donor, blood_bank=self.bank, blood_group='A+', units=2)
+        Donation.objects.create(donor=donor, blood_bank=self.bank, blood_group='A+', units=1, approved=True)
+        allocation.approve_donations([d1.pk], self.admin)
+
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(rollups.request_status_totals(), [{'status': 'rejected', 'count': 2}])
+        today = timezone.localdate()
+        self.assertEqual(rollups.donation_trend(), [{'day': today, 'count': 2}])
+
+    def test_dashboard_reads_rollups_only(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(6):
+            # session, user, inventory summary + the three rollup reads
+            resp = self.client.get(reverse('analytics-dashboard'))
+        self.assertEqual(resp.status_code, 200)
@@ -0,0 +1,107 @@
+import re
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.db.models import CharField
+from django.test import TestCase
+from django.urls import reverse
+
+from core import imports, search
+from core.models import BloodBank, DonationRequest
+
+User = get_user_model()
+_TABLE_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING)')
+
+
+class SimilarityTests(TestCase):
+    def test_trigram_similarity(self):
+        self.assertEqual(search.similarity('dhaka', 'dhaka'), 1.0)
+        self.assertGreaterEqual(search.similarity('dhakka', 'dhaka'), 0.3)
+        self.assertLess(search.similarity('sylhet', 'dhaka'), 0.3)
+
+
+class LookupRegistrationTests(TestCase):
+    def test_trigram_lookup_only_registered_for_postgresql(self):
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+
+        search.register_lookups()
+        self.assertNotIn('trigram_word_similar', CharField.get_lookups())
+        with mock.patch.object(type(connections['default']), 'vendor', 'postgresql'):
+            search.register_lookups()
+        self.addCleanup(CharField._unregister_lookup, TrigramWordSimilar)
+        self.assertIs(CharField.get_lookups()['trigram_word_similar'], TrigramWordSimilar)
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        cls.rahim = User.objects.create_user(username='rahim', email='r@example.com', password='x', role='donor',
+                                             first_name='Rahim', last_name='Uddin', city='Dhaka', phone='01711000000',
+                                             blood_group='O+')
+        cls.karim = User.objects.create_user(username='karim', email='k@example.com', password='x', role='hospital', city='Sylhet')
+        cls.request = DonationRequest.objects.create(requester=cls.karim, blood_group='O+', units=1, city='Chattogram')
+
+    def find(self, model, text, fields=None):
+        return set(search.filter_queryset(model.objects.all(), text.split(), fields or search.FIELDS[model]))
+
+    def test_substring_prefix_and_phone(self):
+        self.assertEqual(self.find(User, 'ahi'), {self.rahim})
+        self.assertEqual(self.find(User, 'DHAK'), {self.rahim})
+        self.assertEqual(self.find(User, '017110'), {self.rahim})
+        self.assertEqual(self.find(User, 'rahim dhaka'), {self.rahim})
+        self.assertEqual(self.find(User, 'rahim sylhet'), set())
+
+    def test_typos_match_similar_words(self):
+        self.assertEqual(self.find(User, 'dhakka'), {self.rahim})
+        self.assertEqual(self.find(User, 'uddinn'), {self.rahim})
+        self.assertEqual(self.find(User, 'zzzzz'), set())
+
+    def test_short_terms_fall_back_to_icontains(self):
+        self.assertEqual(self.find(User, 'ka'), {self.rahim, self.karim})
+
+    def test_index_follows_saves_and_deletes(self):
+        self.rahim.city = 'Khulna'
+        self.rahim.save(update_fields=['city'])
+        self.assertEqual(self.find(User, 'khul'), {self.rahim})
+        self.assertEqual(self.find(User, 'dhaka', ['city']), set())
+        bank = BloodBank.objects.create(name='Central Blood Bank', city='Rajshahi')
+        self.assertEqual(self.find(BloodBank, 'centr'), {bank})
+        bank.delete()
+        self.assertEqual(self.find(BloodBank, 'centr'), set())
+
+    def test_related_fields(self):
+        fields = ['requester__username', 'city']
+        self.assertEqual(self.find(DonationRequest, 'kari', fields), {self.request})
+        self.assertEqual(self.find(DonationRequest, 'chatto', fields), {self.request})
+        self.assertEqual(self.find(DonationRequest, 'rahim', fields), set())
+
+    def test_bulk_imports_are_indexed(self):
+        result = imports.import_rows('donors', [{'username': 'salma', 'email': 's@example.com', 'city': 'Barishal'}])
+        self.assertEqual(result.imported, 1)
+        self.assertEqual({u.username for u in self.find(User, 'barish')}, {'salma'})
+        search.rebuild()
+        self.assertEqual({u.username for u in self.find(User, 'barish')}, {'salma'})
+
+    def test_api_search(self):
+        self.client.force_login(self.admin)
+        resp = self.client.get(reverse('request-list'), {'search': 'chattogrm'})
+        self.assertEqual([r['id'] for r in resp.json()['results']], [self.request.pk])
+        resp = self.client.get(reverse('bloodbank-list'), {'search': 'nowhere'})
+        self.assertEqual(resp.json()['results'], [])
+
+    def test_donor_search_page(self):
+        self.client.force_login(self.admin)
+        resp = self.client.get(reverse('search-donors'), {'q': 'uddin'})
+        self.assertEqual([d.username for d in resp.context['donors']], ['rahim'])
+        resp = self.client.get(reverse('search-donors'), {'q': 'karim'})
+        self.assertEqual(list(resp.context['donors']), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 is SQLite specific')
+    def test_searches_use_the_index(self):
+        self.assertEqual(search.backend(), 'fts5')
+        qs = search.filter_queryset(DonationRequest.objects.all(), ['karim'], ['requester__username', 'city'])
+        plan = qs.explain()
+        self.assertIn('VIRTUAL TABLE', plan)
+        self.assertEqual([t for t in _TABLE_SCAN.findall(plan) if not t.endswith('_search')], [], plan)
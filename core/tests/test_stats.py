@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import allocation, inventory, stats
+from core.models import BloodBank, BloodInventory, DonationRequest
+
+User = get_user_model()
+
+
+@override_settings(STATS_BACKGROUND_REFRESH=False)
+class DashboardStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', role='admin')
+        donors = [User.objects.create_user(username=f'd{i}', email=f'd{i}@example.com', password='x', role='donor',
+                                           blood_group=g, city='Dhaka') for i, g in enumerate(['A+', 'A+', 'O-', ''])]
+        reqs = [DonationRequest.objects.create(requester=donors[0], blood_group='A+', units=1) for _ in range(4)]
+        allocation.reject(reqs[0], cls.admin)
+
+    def test_counts_match_the_source_tables(self):
+        result = stats.compute()
+        self.assertEqual(result.total_donors, User.objects.filter(role='donor').count())
+        self.assertEqual(result.total_requests, DonationRequest.objects.count())
+        self.assertEqual(result.pending_requests, 3)
+        self.assertEqual(result.requests_by_status, {'pending': 3, 'approved': 0, 'rejected': 1})
+        self.assertEqual(result.donor_distribution(), [{'blood_group': '', 'count': 1}, {'blood_group': 'A+', 'count': 2},
+                                                       {'blood_group': 'O-', 'count': 1}])
+        self.assertEqual(result.request_status_totals(), [{'status': 'pending', 'count': 3}, {'status': 'rejected', 'count': 1}])
+
+    def test_two_queries_then_cached(self):
+        inventory.inventory_totals()
+        with self.assertNumQueries(2):
+            first = stats.dashboard_stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(stats.dashboard_stats(), first)
+
+    def test_stale_value_is_served_while_revalidating(self):
+        first = stats.dashboard_stats()
+        DonationRequest.objects.create(requester=self.admin, blood_group='B+', units=1)
+        with mock.patch('core.stats.time.time', return_value=first.computed_at + 31):
+            self.assertEqual(stats.dashboard_stats().total_requests, 4)  # stale, refreshed behind it
+        self.assertEqual(stats.dashboard_stats().total_requests, 5)
+
+    def test_one_revalidation_at_a_time(self):
+        first = stats.dashboard_stats()
+        with mock.patch('core.stats.time.time', return_value=first.computed_at + 31), \
+                mock.patch.object(stats, '_refresh') as refresh:
+            stats.dashboard_stats()
+            stats.dashboard_stats()
+        refresh.assert_called_once()
+
+    def test_endpoints_share_the_result(self):
+        self.client.force_login(self.admin)
+        body = self.client.get(reverse('admin-stats')).json()
+        self.assertEqual(body, {'total_donors': 4, 'total_requests': 4, 'pending_requests': 3, 'inventory': []})
+        resp = self.client.get(reverse('admin-dashboard'))
+        self.assertEqual((resp.context['total_donors'], resp.context['pending_count']), (4, 3))
+
+    def test_inventory_writes_reach_every_reader(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('admin-dashboard'))
+        self.assertEqual(self.client.get(reverse('admin-stats')).json()['inventory'], [])
+        bank = BloodBank.objects.create(name='Central', city='Dhaka')
+        with self.captureOnCommitCallbacks(execute=True):
+            BloodInventory.objects.create(blood_bank=bank, blood_group='A+', units=7)
+        expected = [{'blood_group': 'A+', 'total_units': 7}]
+        self.assertEqual(self.client.get(reverse('admin-stats')).json()['inventory'], expected)
+        self.assertEqual(self.client.get(reverse('async-admin-stats')).json()['inventory'], expected)
+        resp = self.client.get(reverse('admin-dashboard'))
+        self.assertEqual(resp.context['inventory'], expected)
+        self.assertContains(resp, '<span data-live-units="A+">7</span>', html=True)
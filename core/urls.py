@@ -2,9 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     BloodBankViewSet, BloodInventoryViewSet,
-    DonationRequestViewSet, DonationViewSet, UserViewSet, admin_stats
+    DonationRequestViewSet, DonationViewSet, UserViewSet, admin_import, admin_perf, admin_stats
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from . import async_views
 
 router = DefaultRouter()
 router.register('users', UserViewSet, basename='user')
@@ -18,4 +19,11 @@ urlpatterns = [
     path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('admin/stats/', admin_stats, name='admin-stats'),
+    path('admin/perf/', admin_perf, name='admin-perf'),
+    path('admin/import/<str:kind>/', admin_import, name='admin-import'),
+    # async variants for ASGI deployments
+    path('async/admin/stats/', async_views.admin_stats, name='async-admin-stats'),
+    path('async/analytics/', async_views.analytics, name='async-analytics'),
+    path('async/donors/search/', async_views.search_donors, name='async-search-donors'),
+    path('async/requests/mine/', async_views.my_requests, name='async-my-requests'),
 ]
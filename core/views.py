@@ -1,10 +1,10 @@
+import io
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum
 from django.contrib.auth import get_user_model
 
 from .models import BloodBank, BloodInventory, DonationRequest, Donation
@@ -13,65 +13,97 @@ from .serializers import (
     DonationRequestSerializer, DonationSerializer, UserSerializer
 )
 from .permissions import IsAdminUserRole
-from django.core.mail import send_mail
-from django.conf import settings
+from .search import IndexedSearchFilter
+from .filters import DonationRequestFilter, UserFilter
+from .pagination import CreatedAtPagination, DatePagination, UsernamePagination
+from .mailqueue import enqueue_mail
+from .notifications import alert_donors
+from .exports import FORMAT_PATTERN, export_response
+from . import allocation, caching, imports, profiling, stats
 
 User = get_user_model()
 
+BULK_IDS_ERROR = {'detail': 'ids must be a list of integers.'}
+
+def _id_list(request):
+    """The ``ids`` list of a bulk action body, or None if it is malformed."""
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return None
+    return ids
+
+class ExportMixin:
+    """``GET <list>/export.csv`` / ``export.ndjson``: the filtered list, streamed (admins only)."""
+    export_fields = ()
+
+    @action(detail=False, methods=['get'], url_path=r'export\.' + FORMAT_PATTERN, permission_classes=[IsAdminUserRole])
+    def export(self, request, fmt):
+        return export_response(self.filter_queryset(self.get_queryset()), self.export_fields, fmt, self.basename)
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = UsernamePagination
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
+    filterset_class = UserFilter
+    search_fields = ['username','city']
     http_method_names = ['get','post','put','patch','delete']
 
+    @action(detail=False, methods=['get'], url_path=r'donors\.' + FORMAT_PATTERN, permission_classes=[IsAdminUserRole])
+    def donors(self, request, fmt):
+        """Stream the (filtered) donor list as CSV or NDJSON."""
+        qs = self.filter_queryset(self.get_queryset()).filter(role='donor')
+        fields = ['id','username','email','phone','blood_group','city','email_confirmed','date_joined']
+        return export_response(qs, fields, fmt, 'donors')
+
 class BloodBankViewSet(viewsets.ModelViewSet):
     queryset = BloodBank.objects.all()
     serializer_class = BloodBankSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
     search_fields = ['name','city']
 
-class BloodInventoryViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        # same for every caller; the absolute URI keeps pagination links right
+        key = caching.make_key('api:banks', request.build_absolute_uri(), models=[BloodBank])
+        return Response(caching.get_or_compute(key, lambda: super(BloodBankViewSet, self).list(request, *args, **kwargs).data))
+
+class BloodInventoryViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = BloodInventory.objects.select_related('blood_bank').all()
     serializer_class = BloodInventorySerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['blood_group','blood_bank']
+    export_fields = ['id','blood_bank_id','blood_bank__name','blood_bank__city','blood_group','units']
 
-class DonationRequestViewSet(viewsets.ModelViewSet):
-    queryset = DonationRequest.objects.all().order_by('-created_at')
+class DonationRequestViewSet(ExportMixin, viewsets.ModelViewSet):
+    # requester is serialized inline; approved_by/blood_bank are plain pks
+    queryset = DonationRequest.objects.select_related('requester').order_by('-created_at')
     serializer_class = DonationRequestSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter]
-    filterset_fields = ['status','blood_group','requester__city']
+    pagination_class = CreatedAtPagination
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
+    filterset_class = DonationRequestFilter
     search_fields = ['requester__username','city']
+    export_fields = ['id','requester__username','blood_group','units','city','status','created_at','approved_by__username']
 
     def perform_create(self, serializer):
         dr: DonationRequest = serializer.save(requester=self.request.user)
         # Notify requester that the request was received
-        try:
-            subject = f"Your blood request: {dr.blood_group} x{dr.units} received"
-            body = (
-                f"Hi {self.request.user.username}, your request for {dr.units} unit(s) of {dr.blood_group}"
-                f" in {dr.city or 'your area'} has been received. We'll notify matching donors."
-            )
-            send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [self.request.user.email], fail_silently=True)
-        except Exception:
-            pass
-        # Notify donors of the same blood group
-        try:
-            donors = User.objects.filter(role='donor', blood_group=dr.blood_group).exclude(email='')
-            donor_emails = [d.email for d in donors if d.email]
-            if donor_emails:
-                subject = f"Donor Alert: {dr.blood_group} needed"
-                body = (
-                    f"A new blood request has been submitted by {self.request.user.username} for "
-                    f"{dr.units} unit(s) of {dr.blood_group} in {dr.city or 'their area'}."
-                )
-                send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, donor_emails, fail_silently=True)
-        except Exception:
-            pass
+        subject = f"Your blood request: {dr.blood_group} x{dr.units} received"
+        body = (
+            f"Hi {self.request.user.username}, your request for {dr.units} unit(s) of {dr.blood_group}"
+            f" in {dr.city or 'your area'} has been received. We'll notify matching donors."
+        )
+        enqueue_mail(subject, body, [self.request.user.email])
+        # Notify donors of the same blood group, one message each
+        body = (
+            f"A new blood request has been submitted by {self.request.user.username} for "
+            f"{dr.units} unit(s) of {dr.blood_group} in {dr.city or 'their area'}."
+        )
+        alert_donors(dr, body)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def mine(self, request):
         """Return only the authenticated user's requests ordered by newest first."""
-        qs = DonationRequest.objects.filter(requester=request.user).order_by('-created_at')
+        qs = self.get_queryset().filter(requester=request.user)
         page = self.paginate_queryset(qs)
         if page is not None:
             ser = self.get_serializer(page, many=True)
@@ -84,34 +116,57 @@ class DonationRequestViewSet(viewsets.ModelViewSet):
         req = self.get_object()
         if req.status != 'pending':
             return Response({'detail': 'Already processed.'}, status=status.HTTP_400_BAD_REQUEST)
-        req.status = 'approved'
-        req.approved_by = request.user
-        req.save()
-        # notify requester
         try:
-            send_mail(f'Request approved: {req.blood_group}', f'Your request for {req.units} unit(s) of {req.blood_group} has been approved.', settings.DEFAULT_FROM_EMAIL, [req.requester.email], fail_silently=True)
-        except Exception:
-            pass
+            allocation.approve(req, request.user)
+        except allocation.AlreadyProcessed as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except allocation.InsufficientInventory as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        # notify requester
+        enqueue_mail(f'Request approved: {req.blood_group}', f'Your request for {req.units} unit(s) of {req.blood_group} has been approved.', [req.requester.email])
         return Response(self.get_serializer(req).data)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUserRole])
     def reject(self, request, pk=None):
-        req = self.get_object()
-        req.status = 'rejected'
-        req.approved_by = request.user
-        req.save()
-        try:
-            send_mail(f'Request rejected: {req.blood_group}', f'Your request for {req.units} unit(s) of {req.blood_group} has been rejected.', settings.DEFAULT_FROM_EMAIL, [req.requester.email], fail_silently=True)
-        except Exception:
-            pass
+        req = allocation.reject(self.get_object(), request.user)
+        enqueue_mail(f'Request rejected: {req.blood_group}', f'Your request for {req.units} unit(s) of {req.blood_group} has been rejected.', [req.requester.email])
         return Response(self.get_serializer(req).data)
 
-class DonationViewSet(viewsets.ModelViewSet):
-    queryset = Donation.objects.all().order_by('-date')
+    @action(detail=False, methods=['post'], url_path='bulk-approve', permission_classes=[IsAdminUserRole])
+    def bulk_approve(self, request):
+        """Approve many pending requests: ``{"ids": [1, 2, ...]}``."""
+        ids = _id_list(request)
+        if ids is None:
+            return Response(BULK_IDS_ERROR, status=status.HTTP_400_BAD_REQUEST)
+        result = allocation.approve_requests(ids, request.user)
+        return Response({
+            'approved': len(result['approved']),
+            'approved_ids': result['approved'],
+            'insufficient_ids': result['insufficient'],
+            'skipped_ids': result['skipped'],
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-reject', permission_classes=[IsAdminUserRole])
+    def bulk_reject(self, request):
+        """Reject many pending requests: ``{"ids": [1, 2, ...]}``."""
+        ids = _id_list(request)
+        if ids is None:
+            return Response(BULK_IDS_ERROR, status=status.HTTP_400_BAD_REQUEST)
+        result = allocation.reject_requests(ids, request.user)
+        return Response({
+            'rejected': len(result['rejected']),
+            'rejected_ids': result['rejected'],
+            'skipped_ids': result['skipped'],
+        })
+
+class DonationViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = Donation.objects.select_related('donor').order_by('-date')
     serializer_class = DonationSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    pagination_class = DatePagination
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
     filterset_fields = ['donor__id','blood_group','approved']
     search_fields = ['donor__username','blood_bank__name']
+    export_fields = ['id','donor__username','blood_bank__name','blood_group','units','date','approved','approved_by__username']
 
     def perform_create(self, serializer):
         serializer.save(donor=self.request.user)
@@ -121,31 +176,59 @@ class DonationViewSet(viewsets.ModelViewSet):
         donation = self.get_object()
         if donation.approved:
             return Response({'detail': 'Donation already approved.'}, status=status.HTTP_400_BAD_REQUEST)
-        donation.approved = True
-        donation.approved_by = request.user
-        donation.save()
-        # Notify donor of approval
-        try:
-            subject = 'Your donation has been approved'
-            body = (
-                f"Hi {donation.donor.username}, your donation of {donation.units} unit(s) of {donation.blood_group} "
-                f"to {donation.blood_bank.name if donation.blood_bank else 'the selected blood bank'} has been approved."
-            )
-            send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [donation.donor.email], fail_silently=True)
-        except Exception:
-            pass
+        # credits inventory and notifies the donor
+        result = allocation.approve_donations([donation.pk], request.user)
+        if not result['approved']:
+            return Response({'detail': 'Donation already approved.'}, status=status.HTTP_400_BAD_REQUEST)
+        donation.refresh_from_db()
         return Response(self.get_serializer(donation).data)
 
+    @action(detail=False, methods=['post'], url_path='bulk-approve', permission_classes=[IsAdminUserRole])
+    def bulk_approve(self, request):
+        """Approve many donations at once: ``{"ids": [1, 2, ...]}``."""
+        ids = _id_list(request)
+        if ids is None:
+            return Response(BULK_IDS_ERROR, status=status.HTTP_400_BAD_REQUEST)
+        result = allocation.approve_donations(ids, request.user)
+        return Response({
+            'approved': len(result['approved']),
+            'approved_ids': result['approved'],
+            'skipped_ids': result['skipped'],
+        })
+
 @api_view(['GET'])
 @permission_classes([IsAdminUserRole])
 def admin_stats(request):
-    total_donors = User.objects.filter(role='donor').count()
-    total_requests = DonationRequest.objects.count()
-    pending_requests = DonationRequest.objects.filter(status='pending').count()
-    inventory = BloodInventory.objects.values('blood_group').annotate(total_units=Sum('units'))
-    return Response({
-        'total_donors': total_donors,
-        'total_requests': total_requests,
-        'pending_requests': pending_requests,
-        'inventory': list(inventory),
-    })
+    return Response(stats.dashboard_stats().api())
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUserRole])
+def admin_perf(request):
+    """Latency and SQL percentiles per view for this process; DELETE clears them."""
+    if request.method == 'DELETE':
+        profiling.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response({'views': profiling.view_stats()})
+
+@api_view(['POST'])
+@permission_classes([IsAdminUserRole])
+def admin_import(request, kind):
+    """
+    Bulk import ``banks``, ``inventory`` or ``donors``: upload a CSV/JSON/NDJSON
+    ``file`` (multipart), or post a JSON array of row objects.
+    """
+    if kind not in imports.IMPORTERS:
+        return Response({'detail': f'Unknown import {kind!r}.'}, status=status.HTTP_404_NOT_FOUND)
+    upload = request.FILES.get('file')
+    try:
+        if upload is not None:
+            fmt = imports.format_for(upload.name)
+            rows = imports.read_rows(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), fmt)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({'detail': 'Upload a file or post a JSON array of rows.'}, status=status.HTTP_400_BAD_REQUEST)
+        result = imports.import_rows(kind, rows)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result._asdict())
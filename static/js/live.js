@@ -0,0 +1,87 @@
+/* Live dashboard updates: applies the /live/ server-sent events (core/live.py) to the page.
+ *
+ * Hooks, all optional:
+ *   [data-live="pending-count"]       number of pending requests
+ *   [data-live-units="A+"]            nationwide units of a blood group
+ *   tbody[data-live-requests]         request rows (tr[data-request-id]); "pending" drops rows once decided.
+ *                                     A <template data-live-row> inside it is cloned for new requests:
+ *                                     [data-field] cells are filled, "/0/" in [data-href] links becomes the id.
+ *   [data-field="status"][data-badge] status cell rendered from <template data-live-status="...">
+ */
+(function () {
+  var script = document.currentScript;
+  if (!script || !window.EventSource) return;
+
+  function each(selector, fn) {
+    Array.prototype.forEach.call(document.querySelectorAll(selector), fn);
+  }
+
+  function addTo(el, delta) {
+    el.textContent = String((parseInt(el.textContent, 10) || 0) + delta);
+  }
+
+  function setStatus(cell, status) {
+    var badge = document.querySelector('template[data-live-status="' + status + '"]');
+    if (cell.hasAttribute('data-badge') && badge) {
+      cell.replaceChildren(badge.content.cloneNode(true));
+    } else {
+      cell.textContent = status;
+    }
+  }
+
+  function fill(row, data) {
+    row.setAttribute('data-request-id', data.id);
+    Array.prototype.forEach.call(row.querySelectorAll('[data-field]'), function (cell) {
+      var name = cell.getAttribute('data-field');
+      if (name === 'status') setStatus(cell, data.status);
+      else if (name === 'created_at') cell.textContent = data.created_at.slice(0, 16).replace('T', ' ');
+      else cell.textContent = data[name] == null ? '' : data[name];
+    });
+    Array.prototype.forEach.call(row.querySelectorAll('[data-href]'), function (link) {
+      link.href = link.getAttribute('data-href').replace('/0/', '/' + data.id + '/');
+    });
+  }
+
+  function onRequest(data) {
+    if (data.previous === null && data.status === 'pending') {
+      each('[data-live="pending-count"]', function (el) { addTo(el, 1); });
+    } else if (data.previous === 'pending' && data.status !== 'pending') {
+      each('[data-live="pending-count"]', function (el) { addTo(el, -1); });
+    }
+
+    each('tbody[data-live-requests]', function (body) {
+      var pendingOnly = body.getAttribute('data-live-requests') === 'pending';
+      var row = body.querySelector('tr[data-request-id="' + data.id + '"]');
+      if (row) {
+        if (pendingOnly && data.status !== 'pending') {
+          row.remove();
+        } else {
+          Array.prototype.forEach.call(row.querySelectorAll('[data-field="status"]'), function (cell) { setStatus(cell, data.status); });
+          if (data.status !== 'pending') {
+            Array.prototype.forEach.call(row.querySelectorAll('[data-pending-only]'), function (el) { el.remove(); });
+          }
+        }
+        return;
+      }
+      var template = body.querySelector('template[data-live-row]');
+      if (data.previous !== null || !template || (pendingOnly && data.status !== 'pending')) return;
+      var clone = template.content.firstElementChild.cloneNode(true);
+      fill(clone, data);
+      var empty = body.querySelector('[data-live-empty]');
+      if (empty) empty.remove();
+      // oldest-first tables (the admin pending list) append instead
+      if (body.hasAttribute('data-live-append')) body.appendChild(clone);
+      else body.insertBefore(clone, template.nextSibling);
+    });
+  }
+
+  function onInventory(deltas) {
+    Object.keys(deltas).forEach(function (group) {
+      each('[data-live-units="' + group + '"]', function (el) { addTo(el, deltas[group]); });
+    });
+  }
+
+  var source = new EventSource(script.getAttribute('data-live-url'));
+  source.addEventListener('request', function (e) { onRequest(JSON.parse(e.data)); });
+  source.addEventListener('inventory', function (e) { onInventory(JSON.parse(e.data)); });
+})();